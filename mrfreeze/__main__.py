@@ -10,7 +10,7 @@ bot = bot.MrFreeze(command_prefix=["!"])
 load_cogs = [
     # Silent(ish) bot functions.
     "mrfreeze.cogs.command_log",
-    "mrfreeze.cogs.inkcyclopedia",
+    "mrfreeze.cogs.inkcyclopedia.inkcyclopedia",
     "mrfreeze.cogs.error_handling",
     "mrfreeze.cogs.temp_converter",
     "mrfreeze.cogs.departures",
@@ -0,0 +1,132 @@
+"""
+Upload-once cache for the static images of the bot.
+
+Images such as the thumbnails of the About cog used to be read from disk
+and uploaded again every time they were posted. Instead every image is
+read once, uploaded once per server (or DM channel) and after that the
+URL Discord gave the attachment is reused in embeds.
+
+Discord signs attachment URLs with an expiry time (the ex parameter),
+once that's close the image is simply uploaded again. The URL also stops
+working if the message it was uploaded with is deleted, so the bot tells
+the cache about deleted messages and their uploads are forgotten.
+"""
+import io
+import os
+import time
+from typing import Any, Dict, Iterable, NamedTuple, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+import discord
+from discord import Embed, File
+
+# Upload again if a URL expires within this many seconds.
+EXPIRY_MARGIN = 3600
+
+
+def expires(url: str) -> Optional[float]:
+    """Get the expiry time of an attachment URL, None if it has none."""
+    values = parse_qs(urlparse(url).query).get("ex")
+    if not values:
+        return None
+    try:
+        return int(values[0], 16)
+    except ValueError:
+        return None
+
+
+class Upload(NamedTuple):
+    """An uploaded image and the message it was uploaded with."""
+
+    url:        str
+    message_id: int
+
+
+def destination_key(destination: Any) -> int:
+    """Get the ID of the server (or DM channel) something is sent to."""
+    guild = getattr(destination, "guild", None)
+    if guild is not None:
+        return guild.id
+    return getattr(destination, "channel", destination).id
+
+
+class AssetCache:
+    """The contents and uploaded URLs of the images in a directory."""
+
+    def __init__(self, directory: str = "images") -> None:
+        """Create an empty cache for the images in directory."""
+        self.directory = directory
+        self.contents: Dict[str, bytes] = dict()
+        # Upload of each image, by (server or channel ID, file name).
+        self.uploads: Dict[Tuple[int, str], Upload] = dict()
+        # The (server or channel ID, file name) uploaded with each message.
+        self.messages: Dict[int, Tuple[int, str]] = dict()
+
+    def read(self, name: str) -> bytes:
+        """Get the contents of an image, reading it the first time."""
+        content = self.contents.get(name)
+        if content is None:
+            with open(os.path.join(self.directory, name), "rb") as infile:
+                content = infile.read()
+            self.contents[name] = content
+        return content
+
+    def file(self, name: str) -> File:
+        """Create a discord.File of an image, without touching the disk."""
+        return File(io.BytesIO(self.read(name)), filename=name)
+
+    def url(self, key: int, name: str) -> Optional[str]:
+        """Get the uploaded URL of an image, unless it's (nearly) expired."""
+        upload = self.uploads.get((key, name))
+        if upload is None:
+            return None
+
+        expiry = expires(upload.url)
+        if expiry is not None and expiry - EXPIRY_MARGIN < time.time():
+            self.forget([upload.message_id])
+            return None
+        return upload.url
+
+    def remember(self, key: int, name: str, message: Any) -> None:
+        """Save the URL of the image uploaded with message."""
+        for attachment in message.attachments:
+            if attachment.filename == name:
+                previous = self.uploads.get((key, name))
+                if previous is not None:
+                    self.messages.pop(previous.message_id, None)
+                self.uploads[(key, name)] = Upload(attachment.url, message.id)
+                self.messages[message.id] = (key, name)
+                return
+
+    def forget(self, message_ids: Iterable[int]) -> None:
+        """Forget the images uploaded with messages that were deleted."""
+        for message_id in message_ids:
+            uploaded = self.messages.pop(message_id, None)
+            if uploaded is not None:
+                del self.uploads[uploaded]
+
+    async def send(self, destination: Any, content: Optional[str] = None, *,
+                   name: str, embed: Optional[Embed] = None,
+                   thumbnail: bool = False) -> discord.Message:
+        """
+        Send content and embed to destination with the image name in it.
+
+        The image becomes the image of the embed, or its thumbnail if
+        thumbnail is set. It's only uploaded if it hasn't been uploaded
+        to the same server before, or the URL has expired.
+        """
+        if embed is None:
+            embed = Embed()
+        set_image = embed.set_thumbnail if thumbnail else embed.set_image
+
+        key = destination_key(destination)
+        url = self.url(key, name)
+        if url is not None:
+            set_image(url=url)
+            return await destination.send(content, embed=embed)
+
+        set_image(url=f"attachment://{name}")
+        message = await destination.send(
+            content, embed=embed, file=self.file(name))
+        self.remember(key, name, message)
+        return message
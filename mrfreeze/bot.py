@@ -1,3 +1,4 @@
+import asyncio
 import datetime
 import os
 import sys
@@ -8,10 +9,12 @@ import discord
 from discord import Guild
 from discord import TextChannel
 from discord.ext import commands
+from discord.ext.commands.context import Context
+from discord.ext.commands.view import StringView
 
 # Importing MrFreeze submodules
-from mrfreeze import colors, greeting, paths
-from mrfreeze import dbfunctions, server_settings, time
+from mrfreeze import assets, colors, greeting, paths
+from mrfreeze import dbfunctions, dbservice, pipeline, server_settings, time
 
 
 # Usage note!
@@ -37,13 +40,23 @@ class MrFreeze(commands.Bot):
         super().__init__(*args, **kwargs)
         self.bg_tasks = dict()  # Background task manager
 
+        # Message pipeline, cogs register stages here instead of
+        # listening to on_message themselves.
+        self.pipeline = pipeline.MessagePipeline()
+
+        # Static images, uploaded once per server and reused after that.
+        self.assets = assets.AssetCache()
+
         # Setting up imported functions so they can be accessed by all cogs
         self.extract_time = time.extract_time
+        self.parse_duration = time.parse_duration
         self.parse_timedelta = time.parse_timedelta
+        self.parse_timedeltas = time.parse_timedeltas
         self.read_server_setting = server_settings.read_server_setting
         self.write_server_setting = server_settings.write_server_setting
         self.create_server_settings = server_settings.create_server_settings
         self.db_connect = dbfunctions.db_connect
+        self.db_transaction = dbfunctions.db_transaction
         self.db_create = dbfunctions.db_create
         self.db_time = dbfunctions.db_time
 
@@ -56,9 +69,20 @@ class MrFreeze(commands.Bot):
         self.db_prefix = "databases"
         paths.path_setup(self.db_prefix, "DB prefix")
 
+        # One long-lived connection per database file.
+        self.databases = dbfunctions.ConnectionManager(self.db_prefix)
+        # Worker threads running queries off the event loop, by database.
+        self.db_services = dbservice.DatabaseServices(self.databases)
+
         self.servers_prefix = "config/servers"
         paths.path_setup(self.servers_prefix, "Servers prefix")
 
+    async def close(self):
+        """Log out, then close the database connections."""
+        await super().close()
+        self.db_services.close()
+        self.databases.close()
+
     async def on_ready(self):
         # Set tuples up for all servers
         for server in self.guilds:
@@ -80,6 +104,74 @@ class MrFreeze(commands.Bot):
         # Signal to the terminal that the bot is ready.
         print(f"{colors.WHITE_B}READY WHEN YOU ARE CAP'N!{colors.RESET}\n")
 
+    async def on_message(self, message):
+        """
+        Build the context once and hand it to all message stages.
+
+        Overrides the default on_message, so commands are invoked from
+        here rather than through process_commands.
+        """
+        if message.author.bot:
+            return
+
+        prefixes = self.command_prefix
+        if isinstance(prefixes, str):
+            prefixes = (prefixes,)
+        elif isinstance(prefixes, (list, tuple)):
+            prefixes = tuple(prefixes)
+        else:
+            # Callable prefix, we can't know it in advance.
+            prefixes = None
+
+        bot_id = self.user.id if self.user is not None else None
+        features = pipeline.classify(message.content, prefixes, bot_id)
+
+        if pipeline.Feature.COMMAND in features:
+            ctx = await self.get_context(message)
+        else:
+            ctx = self.plain_context(message)
+
+        view = self.pipeline.build_view(message, ctx, features)
+        await asyncio.gather(
+            self.pipeline.dispatch(view),
+            self.invoke(ctx))
+
+    async def on_message_edit(self, before, after):
+        """
+        Run the message stages again when the content of a message changes.
+
+        Commands aren't invoked again. Stages get the old content in the
+        view so they can work out what the edit changed.
+        """
+        if after.author.bot or before.content == after.content:
+            return
+
+        bot_id = self.user.id if self.user is not None else None
+        # No prefixes, so the edit is never tagged as a command.
+        features = pipeline.classify(after.content, (), bot_id)
+
+        view = self.pipeline.build_view(
+            after, self.plain_context(after), features, before.content)
+        await self.pipeline.dispatch(view)
+
+    async def on_raw_message_delete(self, payload):
+        """Stop using the image URLs of a deleted message."""
+        self.assets.forget([payload.message_id])
+
+    async def on_raw_bulk_message_delete(self, payload):
+        """Stop using the image URLs of deleted messages."""
+        self.assets.forget(payload.message_ids)
+
+    def plain_context(self, message):
+        """
+        Create the context of a message that isn't a command.
+
+        This is what get_context returns when there's no prefix,
+        minus the prefix lookup.
+        """
+        view = StringView(message.content)
+        return Context(prefix=None, view=view, bot=self, message=message)
+
     def path_setup(self, path, trivial_name):
         """Create various directories which the bot needs."""
         if os.path.isdir(path):
@@ -119,6 +211,20 @@ class MrFreeze(commands.Bot):
         """
         self.bg_tasks[name] = self.loop.create_task(task)
 
+    def add_message_stage(self, name, stage, features=None):
+        """
+        Add a stage to the message pipeline.
+
+        The stage is a coroutine function taking a MessageView, and
+        is run once for every message not sent by a bot. If features
+        is given it's only run for messages tagged with those features.
+        """
+        self.pipeline.add_stage(name, stage, features)
+
+    def remove_message_stage(self, name):
+        """Remove a stage from the message pipeline."""
+        self.pipeline.remove_stage(name)
+
     def get_trash_channel(self, guild: Guild) -> Optional[TextChannel]:
         """
         Currently just gives the channel with the name bot-trash.
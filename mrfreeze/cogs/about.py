@@ -4,7 +4,6 @@ from typing import List
 
 import discord
 from discord import Embed
-from discord import File
 from discord.ext.commands import Context
 
 from mrfreeze.bot import MrFreeze
@@ -41,9 +40,8 @@ class About(CogBase):
             name="Readme",
             value=f"My readme file is available [on Github]({url})!")
 
-        image = File("images/readme.png")
-        embed.set_thumbnail(url="attachment://readme.png")
-        await ctx.send(embed=embed, file=image)
+        await self.bot.assets.send(
+            ctx, name="readme.png", embed=embed, thumbnail=True)
 
     @discord.ext.commands.command(name="source", aliases=source_aliases)
     async def source(self, ctx: Context) -> None:
@@ -55,9 +53,8 @@ class About(CogBase):
                    "Github](https://github.com/terminalnode/mrfreeze)!")
         )
 
-        image = File("images/source.png")
-        embed.set_thumbnail(url="attachment://source.png")
-        await ctx.send(embed=embed, file=image)
+        await self.bot.assets.send(
+            ctx, name="source.png", embed=embed, thumbnail=True)
 
     @discord.ext.commands.command(name="getfreeze", aliases=getfreeze_aliases)
     async def getfreeze(self, ctx: Context) -> None:
@@ -103,9 +100,8 @@ class About(CogBase):
             value=(f"[Invite Ba'athman to a server]({baathman_url})\n" +
                    f"[Invite Robin to a server]({robin_url})"))
 
-        image = File("images/dummies.png")
-        embed.set_thumbnail(url="attachment://dummies.png")
-        await ctx.send(embed=embed, file=image)
+        await self.bot.assets.send(
+            ctx, name="dummies.png", embed=embed, thumbnail=True)
 
     @discord.ext.commands.command(name="todo", aliases=todo_aliases)
     async def todos(self, ctx: Context) -> None:
@@ -119,6 +115,5 @@ class About(CogBase):
                    "\"cool\" stuff Terminal has planned for me... :sleeping:")
         )
 
-        image = File("images/todos.png")
-        embed.set_thumbnail(url="attachment://todos.png")
-        await ctx.send(embed=embed, file=image)
+        await self.bot.assets.send(
+            ctx, name="todos.png", embed=embed, thumbnail=True)
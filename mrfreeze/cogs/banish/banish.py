@@ -1,7 +1,5 @@
 # Basic discord functionality
 import discord
-# Required for the unbanish loop
-import asyncio
 # Required for outputing the time until / duration of banishes to the log
 import datetime
 # Required to check who's allowed to issue these commands
@@ -13,6 +11,7 @@ from mrfreeze.cogs.cogbase import CogBase
 from mrfreeze.cogs.banish.enums import MuteType, MuteStr
 from mrfreeze.cogs.banish.templates import templates
 from mrfreeze.cogs.banish import mute_db
+from mrfreeze.cogs.banish.scheduler import MuteScheduler
 
 # This cog is for the banish/mute command and the region command.
 # banish/mute is closely connected to the region command since
@@ -47,10 +46,12 @@ class BanishAndRegion(CogBase):
         self.bot = bot
 
         # Server setting names
-        # Mute interval governs how often to check for unmutes.
+        # Mute interval is the batching window of the mute scheduler,
+        # mutes ending within the same window are lifted together.
         self.mute_interval_name = 'mute_interval'
         self.default_mute_interval = 5
         self.mute_interval_dict = dict()
+        self.scheduler = MuteScheduler(self.mute_interval)
 
         # Self mute interval governs how long to banish
         # unauthorized uses of !mute/!banish etc
@@ -60,13 +61,7 @@ class BanishAndRegion(CogBase):
 
         # Mutes database creation
         self.mdbname = mdbname
-        mdbtable = f"""CREATE TABLE IF NOT EXISTS {self.mdbname}(
-            id          integer NOT NULL,
-            server      integer NOT NULL,
-            voluntary   boolean NOT NULL,
-            until       date,
-            CONSTRAINT  server_user PRIMARY KEY (id, server));"""
-        bot.db_create(self.bot, self.mdbname, mdbtable)
+        mute_db.mdb_create(self.bot, self.mdbname)
 
         # Region database creation
         self.rdbname = rdbname
@@ -103,9 +98,6 @@ class BanishAndRegion(CogBase):
             else:
                 self.mute_interval_dict[server.id] = self.default_mute_interval
 
-            # Add unbanish loop to bot
-            self.bot.add_bg_task(self.unbanish_loop(server), f'unbanish@{server.id}')
-
             # Set how long a member should be punished for after unauthorized !mute usage
             self_mute_time = self.bot.read_server_setting(self.bot, server, self.self_mute_time_name)
             if self_mute_time and self_mute_time.isdigit():
@@ -113,55 +105,89 @@ class BanishAndRegion(CogBase):
             else:
                 self.self_mute_time_dict[server.id] = self.default_self_mute_time
 
-    async def unbanish_loop(self, server):
-        """This loop checks for people to unbanish every self.banish_interval seconds."""
+        # One unbanish loop for all servers. on_ready runs again after
+        # reconnecting, by which time the loop is already running.
+        unbanish_task = self.bot.bg_tasks.get('unbanish')
+        if unbanish_task is None or unbanish_task.done():
+            self.bot.add_bg_task(self.unbanish_loop(), 'unbanish')
+
+    def mute_interval(self, server_id):
+        """Get the mute interval of a server."""
+        return self.mute_interval_dict.get(server_id, self.default_mute_interval)
+
+    async def unbanish_loop(self):
+        """This loop sleeps until the next mute ends, then lifts every mute that has ended."""
+        for (server_id, member_id, until) in await mute_db.mdb_timed(self.bot, self.mdbname):
+            self.scheduler.schedule(server_id, member_id, until)
+
         while not self.bot.is_closed():
-            await asyncio.sleep(self.mute_interval_dict[server.id])
+            await self.scheduler.wait()
 
-            current_time = datetime.datetime.now()
-            server_mutes = mute_db.mdb_fetch(self.bot, self.mdbname, server)
-            mute_role = self.bot.servertuples[server.id].mute_role
-            mute_channel = self.bot.servertuples[server.id].mute_channel
-            unmuted = list()
+            # The scheduler only says which servers have mutes due,
+            # the database knows exactly which ones.
+            due = { expiry.guild_id for expiry in self.scheduler.pop_due() }
 
-            for mute in server_mutes:
-                if mute.until is None:
+            for server_id in due:
+                server = self.bot.get_guild(server_id)
+                if server is None:
                     continue
-
-                member = mute.member
-                until = mute.until
-
-                if until < current_time:
-                    diff = self.bot.parse_timedelta(current_time - until)
-                    if diff == "":  diff = "now"
-                    else:           diff = f"{diff} ago"
-
-                    mute_db.mdb_del(self.bot, self.mdbname, member) # Remove from database
-                    if mute_role in member.roles:
-                        try:
-                            await member.remove_roles(mute_role)
-                            # Members are only considered unmuted if they had the antarctica role
-                            unmuted.append(member)
-                        except Exception as e:
-                            print(f"{self.current_time()} {colors.RED_B}Mutes DB:{colors.CYAN} failed to remove " +
-                                f"mute role of{colors.CYAN_B} {member.name}#{member.discriminator} @ {server.name}.\n" +
-                                f"{colors.RED}==> {e}{colors.RESET}")
-
-                    print(f"{self.current_time()} {colors.GREEN_B}Mutes DB:{colors.CYAN} auto-unmuted " +
-                        f"{colors.CYAN_B}{member.name}#{member.discriminator} @ {server.name}." +
-                        f"{colors.YELLOW} (due {diff}){colors.RESET}")
-
-            # Time for some great regrets
-            if len(unmuted) > 0:
-                unmuted = self.mentions_list(unmuted)
-                if len(unmuted) == 1:
-                    await mute_channel.send(
-                        f"It's with great regret that I must inform you all that {unmuted}'s exile has come to an end."
-                    )
-                else:
-                    await mute_channel.send(
-                        f"It's with great regret that I must inform you all that the exile of {unmuted} has come to an end."
-                    )
+                try:
+                    await self.unbanish_due(server)
+                except Exception as e:
+                    print(f"{self.current_time()} {colors.RED_B}Mutes DB:{colors.CYAN} failed to auto-unmute " +
+                        f"in{colors.CYAN_B} {server.name}.\n{colors.RED}==> {e}{colors.RESET}")
+
+    async def unbanish_due(self, server):
+        """Lift the mutes in a server that have ended and announce it."""
+        current_time = datetime.datetime.now()
+        mute_role = self.bot.servertuples[server.id].mute_role
+        mute_channel = self.bot.servertuples[server.id].mute_channel
+        unmuted = list()
+
+        # Mutes prolonged since they were scheduled aren't due any more.
+        due = await mute_db.mdb_del_due(self.bot, self.mdbname, server, current_time)
+        for (member_id, until) in due:
+            self.scheduler.cancel(server.id, member_id)
+
+        # Humanize how overdue every due mute is in one go.
+        overdue = self.bot.parse_timedeltas(
+            current_time - until for (member_id, until) in due)
+
+        members = mute_db.resolve_members(server, (member_id for (member_id, until) in due))
+        for (member_id, until), diff in zip(due, overdue):
+            member = members.get(member_id)
+            if member is None:
+                # They've left the server, there's no role to remove.
+                continue
+
+            if diff == "":  diff = "now"
+            else:           diff = f"{diff} ago"
+
+            if mute_role in member.roles:
+                try:
+                    await member.remove_roles(mute_role)
+                    # Members are only considered unmuted if they had the antarctica role
+                    unmuted.append(member)
+                except Exception as e:
+                    print(f"{self.current_time()} {colors.RED_B}Mutes DB:{colors.CYAN} failed to remove " +
+                        f"mute role of{colors.CYAN_B} {member.name}#{member.discriminator} @ {server.name}.\n" +
+                        f"{colors.RED}==> {e}{colors.RESET}")
+
+            print(f"{self.current_time()} {colors.GREEN_B}Mutes DB:{colors.CYAN} auto-unmuted " +
+                f"{colors.CYAN_B}{member.name}#{member.discriminator} @ {server.name}." +
+                f"{colors.YELLOW} (due {diff}){colors.RESET}")
+
+        # Time for some great regrets
+        if len(unmuted) > 0:
+            unmuted = self.mentions_list(unmuted)
+            if len(unmuted) == 1:
+                await mute_channel.send(
+                    f"It's with great regret that I must inform you all that {unmuted}'s exile has come to an end."
+                )
+            else:
+                await mute_channel.send(
+                    f"It's with great regret that I must inform you all that the exile of {unmuted} has come to an end."
+                )
 
     @discord.ext.commands.command(name='banishinterval', aliases=['banishint', 'baninterval', 'banint', 'muteinterval', 'muteint'])
     @discord.ext.commands.check(checks.is_mod)
@@ -188,6 +214,7 @@ class BanishAndRegion(CogBase):
         else:
             oldinterval = self.mute_interval_dict[server.id]
             self.mute_interval_dict[server.id] = interval
+            self.scheduler.reschedule(server.id)
             setting_saved = self.bot.write_server_setting(self.bot, server, self.mute_interval_name, str(interval))
             if setting_saved:
                 await ctx.send(f"{author} The interval has been changed from {oldinterval} to {interval} seconds.")
@@ -264,24 +291,13 @@ class BanishAndRegion(CogBase):
 
         # Extract durations from statement
         # If no time is stated both of these will be None
-        duration, end_date = self.bot.extract_time(args)
+        duration = self.bot.parse_duration(args)
 
         # Add time if invocation is super or mega
-        if is_super or is_mega:
-            # Make sure a timedelta exists first.
-            if duration is None:
-                duration = datetime.timedelta()
-
-            # Super adds a week, mega adds a year
-            # (or 365 days because timedelta doesn't support years)
-            current_time = datetime.datetime.now()
-            try:
-                if is_super:    duration += datetime.timedelta(weeks=1)
-                elif is_mega:   duration += datetime.timedelta(days=365)
-                end_date = current_time + duration
-            except OverflowError:
-                end_date = datetime.datetime.max
-                duration = end_date - current_time
+        # Super adds a week, mega adds a year
+        if is_super:    duration = duration.add(weeks=1)
+        elif is_mega:   duration = duration.add(years=1)
+        duration, end_date = duration.span()
 
         if len(mentions) == 0:
             template = MuteStr.NONE
@@ -303,12 +319,14 @@ class BanishAndRegion(CogBase):
         else:
             # Working mutes (at user mutes):
             # SINGLE, MULTI, FAIL, FAILS, SINGLE_FAIL, SINGLE_FAILS, MULTI_FAIL, MULTI_FAILS
-            for member in usr:
-                if unmute:
-                    error = await mute_db.carry_out_unbanish(self.bot, self.mdbname, member)
-                else:
-                    error = await mute_db.carry_out_banish(self.bot, self.mdbname, member, end_date)
+            if unmute:
+                errors = [ await mute_db.carry_out_unbanish(self.bot, self.mdbname, member, self.scheduler)
+                           for member in usr ]
+            else:
+                # Everyone is added to the database in one go.
+                errors = await mute_db.carry_out_banishes(self.bot, self.mdbname, usr, end_date, self.scheduler)
 
+            for member, error in zip(usr, errors):
                 if isinstance(error, Exception):
                     fails_list.append(member)
                     if isinstance(error, discord.HTTPException):    http_exception = True
@@ -430,7 +448,7 @@ class BanishAndRegion(CogBase):
         duration = self.bot.parse_timedelta(duration)
 
         # Carry out the banish with resulting end date
-        error = await mute_db.carry_out_banish(self.bot, self.mdbname, author, end_date)
+        error = await mute_db.carry_out_banish(self.bot, self.mdbname, author, end_date, self.scheduler)
 
         if isinstance(error, Exception):
             if isinstance(error, discord.Forbidden):        error = "**a lack of privilegies**"
@@ -1,15 +1,35 @@
 import discord
-from typing import NamedTuple
+from typing import Dict, Iterable, NamedTuple, Optional
 
-from discord import Member
+from discord import Guild, Member
 from datetime import datetime
 
+from mrfreeze import colors
+
 
 class BanishTuple(NamedTuple):
-    member: Member
+    member_id: int
+    server: Guild
     voluntary: bool
     until: datetime
 
+    @property
+    def member(self) -> Optional[Member]:
+        """The muted member, looked up when needed. None if they've left the server."""
+        return self.server.get_member(self.member_id)
+
+
+def resolve_members(server: Guild, member_ids: Iterable[int]) -> Dict[int, Member]:
+    """Look up several members of a server by ID at once.
+    Members who've left the server are left out. Every lookup goes through the
+    ID-keyed member cache of the server rather than searching its member list."""
+    members = dict()
+    for member_id in member_ids:
+        member = server.get_member(member_id)
+        if member is not None:
+            members[member_id] = member
+    return members
+
 
 # Complete list of tables and their rows in this database.
 # (These are created via the banish cog)
@@ -21,30 +41,129 @@ class BanishTuple(NamedTuple):
 # self.mdbname  id*         integer     User ID
 #               server*     integer     Server ID
 #               voluntary!  boolean     If this mute was self-inflicted or not
-#               until       date        The date when the user will be unbanned
+#               until       integer     When the user will be unbanned, in epoch seconds
 #                                       Leave empty if indefinite
-async def carry_out_banish(bot, mdbname, member, end_date):
+#
+# (server, until) is indexed, so finding the mutes that are due in a server
+# doesn't have to look at any other mutes.
+MUTES_TABLE = """CREATE TABLE IF NOT EXISTS {table}(
+    id          integer NOT NULL,
+    server      integer NOT NULL,
+    voluntary   boolean NOT NULL,
+    until       integer,
+    CONSTRAINT  server_user PRIMARY KEY (id, server));"""
+
+MUTES_INDEX = """CREATE INDEX IF NOT EXISTS {table}_server_until
+    ON {table}(server, until);"""
+
+# Version of the layout of the mutes database, kept in PRAGMA user_version.
+# 0: until is a "%Y-%m-%d %H:%M:%S" string in local time
+# 1: until is an integer, epoch seconds
+MUTES_VERSION = 1
+
+
+def to_epoch(date):
+    """Turn a (local) datetime into epoch seconds, None stays None."""
+    if date is None:
+        return None
+    return int(date.timestamp())
+
+
+def from_epoch(seconds):
+    """Turn epoch seconds into a (local) datetime, None stays None."""
+    if seconds is None:
+        return None
+    try:
+        return datetime.fromtimestamp(seconds)
+    except (OverflowError, OSError, ValueError):
+        # Whole seconds, like everything else in the database.
+        return datetime.max.replace(microsecond=0)
+
+
+def migrate_unreadable(conn, mdbname):
+    """Convert the ends of mutes SQLite couldn't read to epoch seconds.
+    Python gets a second go at them. Rather than letting a mute become permanent,
+    those it can't read either end now. Return (id, server, until) of the latter."""
+    rows = conn.execute(f"SELECT id, server, until FROM {mdbname} WHERE typeof(until) = 'text'").fetchall()
+    now = to_epoch(datetime.now())
+    unreadable = list()
+    for (uid, server, until) in rows:
+        try:
+            seconds = to_epoch(datetime.fromisoformat(until.strip()))
+        except ValueError:
+            seconds = now
+            unreadable.append((uid, server, until))
+        conn.execute(f"UPDATE {mdbname} SET until = ? WHERE id = ? AND server = ?",
+                     (seconds, uid, server))
+    return unreadable
+
+
+def mdb_create(bot, mdbname):
+    """Create the mutes table, or bring an existing one up to date.
+    This is blocking, it's only meant to be run when the cog is loaded."""
+    unreadable = list()
+    with bot.db_transaction(bot, mdbname) as conn:
+        conn.execute(MUTES_TABLE.format(table=mdbname))
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+
+        if version < 1:
+            # The 'utc' modifier reads the string as local time.
+            conn.execute(f"UPDATE {mdbname} " +
+                         "SET until = CAST(strftime('%s', until, 'utc') AS integer) " +
+                         "WHERE typeof(until) = 'text' AND strftime('%s', until, 'utc') IS NOT NULL")
+            unreadable = migrate_unreadable(conn, mdbname)
+
+        conn.execute(MUTES_INDEX.format(table=mdbname))
+        conn.execute(f"PRAGMA user_version = {MUTES_VERSION}")
+
+    for (uid, server, until) in unreadable:
+        print(f"{colors.RED_B}DB/table migration:{colors.CYAN} end of the mute of " +
+              f"{colors.CYAN_B}{uid} @ {server}{colors.CYAN} can't be read ({until!r}), " +
+              f"it ends now.{colors.RESET}")
+
+    if version < MUTES_VERSION:
+        print(f"{colors.CYAN}DB/table migrated: " +
+              f"{colors.GREEN_B}{mdbname} {colors.CYAN}(version {version} " +
+              f"to {MUTES_VERSION}){colors.RESET}")
+
+
+async def carry_out_banish(bot, mdbname, member, end_date, scheduler=None):
     """Add the antarctica role to a user, then add them to the db.
     Return None if successful, Exception otherwise."""
-    server = member.guild
-    roles = member.roles
-    mute_role = bot.servertuples[server.id].mute_role
-    result = None
-
-    if mute_role not in roles:
-        try:
-            await member.add_roles(mute_role)
-        except Exception as e:
-            result = e
+    results = await carry_out_banishes(bot, mdbname, [member], end_date, scheduler)
+    return results[0]
+
+
+async def carry_out_banishes(bot, mdbname, members, end_date, scheduler=None):
+    """Add the antarctica role to several users, then add them all to the db at once.
+    The mutes are scheduled to expire with scheduler, if given.
+    Return a list with None for every success and the Exception otherwise."""
+    results = list()
+    for member in members:
+        server = member.guild
+        roles = member.roles
+        mute_role = bot.servertuples[server.id].mute_role
+        result = None
+
+        if mute_role not in roles:
+            try:
+                await member.add_roles(mute_role)
+            except Exception as e:
+                result = e
+        results.append(result)
 
-    if not isinstance(result, Exception):
-        mdb_add(bot, mdbname, member, end_date=end_date)
+    muted = [member for (member, result) in zip(members, results)
+             if not isinstance(result, Exception)]
+    if muted:
+        await mdb_add_many(bot, mdbname, muted, end_date=end_date,
+                           scheduler=scheduler)
 
-    return result
+    return results
 
 
-async def carry_out_unbanish(bot, mdbname, member):
+async def carry_out_unbanish(bot, mdbname, member, scheduler=None):
     """Remove the antarctica role from a user, then remove them from the db.
+    The mute is removed from scheduler too, if given.
     Return None if successful, Exception otherwise."""
     server = member.guild
     roles = member.roles
@@ -58,84 +177,111 @@ async def carry_out_unbanish(bot, mdbname, member):
             result = e
 
     if not isinstance(result, Exception):
-        mdb_del(bot, mdbname, member)
+        await mdb_del(bot, mdbname, member)
+        if scheduler is not None:
+            scheduler.cancel(server.id, member.id)
 
     return result
 
 
-def mdb_add(bot, mdbname, user, voluntary=False, end_date=None, prolong=True):
+# Adds a mute, or replaces the existing one, in a single statement.
+# A timed mute on top of a timed mute prolongs it by :seconds, ending
+# at :max if that doesn't fit in a datetime. A permanent mute is simply
+# replaced, as is any mute when :prolong isn't set.
+UPSERT = """INSERT INTO {table}(id, server, voluntary, until)
+    VALUES(:id, :server, :voluntary, :until)
+    ON CONFLICT(id, server) DO UPDATE SET
+        voluntary = excluded.voluntary,
+        until = CASE
+            WHEN :prolong AND excluded.until IS NOT NULL
+                AND {table}.until IS NOT NULL
+            THEN MIN({table}.until + :seconds, :max)
+            ELSE excluded.until
+        END"""
+
+
+def upsert_mutes(conn, mdbname, mutes):
+    """Add or prolong mutes in a transaction on the database worker.
+    Return when each of the mutes ends now."""
+    conn.executemany(UPSERT.format(table=mdbname), mutes)
+    sql = f"SELECT until FROM {mdbname} WHERE id = ? AND server = ?"
+    return [
+        from_epoch(conn.execute(sql, (mute["id"], mute["server"])).fetchone()[0])
+        for mute in mutes
+    ]
+
+
+async def mdb_add(bot, mdbname, user, voluntary=False, end_date=None, prolong=True):
     """Add a new user to the mutes database."""
-    is_member = isinstance(user, discord.Member)
-    if not is_member:
-        # This should never happen, no point in even logging it.
-        raise TypeError(f"Expected discord.Member, got {type(user)}")
+    return await mdb_add_many(bot, mdbname, [user], voluntary, end_date, prolong)
+
+
+async def mdb_add_many(bot, mdbname, users, voluntary=False, end_date=None, prolong=True,
+                       scheduler=None):
+    """Add new users to the mutes database, all in one transaction.
+    If a scheduler is given, the mutes are scheduled to expire with it."""
+    for user in users:
+        is_member = isinstance(user, discord.Member)
+        if not is_member:
+            # This should never happen, no point in even logging it.
+            raise TypeError(f"Expected discord.Member, got {type(user)}")
+
+    # Length of the new mutes, added on top of existing ones.
+    seconds = None
+    if end_date is not None:
+        diff = end_date - datetime.now()
+        seconds = int(diff.total_seconds())
+
+    mutes = [{
+        "id": user.id,
+        "server": user.guild.id,
+        "voluntary": voluntary,
+        "until": to_epoch(end_date),
+        "prolong": prolong,
+        "seconds": seconds,
+        "max": to_epoch(datetime.max),
+    } for user in users]
 
-    uid = user.id
-    server = user.guild.id
-    servername = user.guild.name
-    name = f"{user.name}#{user.discriminator}"
     error = None
-    until = str()     # this string is filled in if called with an end_date
-    duration = str()  # this string too
-
-    current_mute = mdb_fetch(bot, mdbname, user)
-    is_muted = len(current_mute) != 0
-    if is_muted:
-        # Always delete existing mutes
-        mdb_del(bot, mdbname, user)
-
-    if is_muted and end_date is not None and prolong:
-        old_until = current_mute[0].until
-        # if current mute is permanent just replace it with a timed one
-        if old_until is not None:
-            diff = end_date - datetime.now()
-            try:
-                end_date = old_until + diff
-            except OverflowError:
-                end_date = datetime.max
-
-    with bot.db_connect(bot, mdbname) as conn:
-        c = conn.cursor()
-        if end_date is not None:
-            # Collect time info in string format for the log
-            until = bot.db_time(end_date)
-            until = f"\n{bot.GREEN}==> Until: {until} {bot.RESET}"
-
-            duration = end_date - datetime.now()
-            duration = bot.parse_timedelta(duration)
-            duration = f"{bot.YELLOW}(in {duration}){bot.RESET}"
-
-            # Turn datetime object into string
-            end_date = bot.db_time(end_date)
-
-            sql = (f"INSERT INTO {mdbname}(id, server, voluntary, until) " +
-                   "VALUES(?,?,?,?)")
-
-            try:
-                c.execute(sql, (uid, server, voluntary, end_date))
-            except Exception as e:
-                error = e
-
-        elif end_date is None:
-            sql = (f"INSERT INTO {mdbname}(id, server, voluntary) " +
-                   "VALUES(?,?,?)")
-            try:
-                c.execute(sql, (uid, server, voluntary))
-            except Exception as e:
-                error = e
-
-    if error == None:
-        print(f"{bot.current_time()} {bot.GREEN_B}Mutes DB:{bot.CYAN} added user to DB: " +
-                f"{bot.CYAN_B}{name} @ {servername}{bot.CYAN}.{bot.RESET}{until}{duration}")
-        return True
-
-    else:
-        print(f"{bot.current_time()} {bot.RED_B}Mutes DB:{bot.CYAN} failed adding to DB: " +
-                f"{bot.CYAN_B}{name} @ {servername}{bot.CYAN}:" +
-                f"\n{bot.RED}==> {error}{bot.RESET}")
-        return False
-
-def mdb_del(bot, mdbname, user):
+    try:
+        end_dates = await bot.db_services[mdbname].transaction(
+            upsert_mutes, mdbname, mutes)
+    except Exception as e:
+        error = e
+
+    if error is None and scheduler is not None:
+        for user, until in zip(users, end_dates):
+            scheduler.schedule(user.guild.id, user.id, until)
+
+    # Humanize the length of every mute in one go.
+    if error is None:
+        now = datetime.now()
+        durations = bot.parse_timedeltas(
+            None if until is None else until - now for until in end_dates)
+
+    for index, user in enumerate(users):
+        servername = user.guild.name
+        name = f"{user.name}#{user.discriminator}"
+        until = str()     # this string is filled in if the mute has an end
+        duration = str()  # this string too
+
+        if error is None and end_dates[index] is not None:
+            until = end_dates[index].strftime("%Y-%m-%d %H:%M:%S")
+            until = f"\n{colors.GREEN}==> Until: {until} {colors.RESET}"
+
+            duration = f"{colors.YELLOW}(in {durations[index]}){colors.RESET}"
+
+        if error is None:
+            print(f"{bot.current_time()} {colors.GREEN_B}Mutes DB:{colors.CYAN} added user to DB: " +
+                    f"{colors.CYAN_B}{name} @ {servername}{colors.CYAN}.{colors.RESET}{until}{duration}")
+        else:
+            print(f"{bot.current_time()} {colors.RED_B}Mutes DB:{colors.CYAN} failed adding to DB: " +
+                    f"{colors.CYAN_B}{name} @ {servername}{colors.CYAN}:" +
+                    f"\n{colors.RED}==> {error}{colors.RESET}")
+
+    return error is None
+
+async def mdb_del(bot, mdbname, user):
     """Removes a user from the mutes database."""
     is_member = isinstance(user, discord.Member)
     if not is_member:
@@ -147,29 +293,52 @@ def mdb_del(bot, mdbname, user):
     servername = user.guild.name
     name = f"{user.name}#{user.discriminator}"
 
-    is_muted = len(mdb_fetch(bot, mdbname, user)) != 0
-    if not is_muted:
-        print(f"{bot.current_time()} {bot.GREEN_B}Mutes DB:{bot.CYAN} user already not in DB: " +
-            f"{bot.CYAN_B}{name} @ {servername}{bot.CYAN}.{bot.RESET}")
-        return True
-
-    with bot.db_connect(bot, mdbname) as conn:
-        c = conn.cursor()
+    try:
         sql = f"DELETE FROM {mdbname} WHERE id = ? AND server = ?"
+        is_muted = await bot.db_services[mdbname].execute(sql, (uid, server)) != 0
 
-        try:
-            c.execute(sql, (uid, server))
-            print(f"{bot.current_time()} {bot.GREEN_B}Mutes DB:{bot.CYAN} removed user from DB: " +
-                f"{bot.CYAN_B}{name} @ {servername}{bot.CYAN}.{bot.RESET}")
-            return True
-
-        except Exception as error:
-            print(f"{bot.current_time()} {bot.RED_B}Mutes DB:{bot.CYAN} failed to remove from DB: " +
-                f"{bot.CYAN_B}{name} @ {servername}{bot.CYAN}:" +
-                f"\n{bot.RED}==> {error}{bot.RESET}")
-            return False
-
-def mdb_fetch(bot, mdbname, in_data):
+    except Exception as error:
+        print(f"{bot.current_time()} {colors.RED_B}Mutes DB:{colors.CYAN} failed to remove from DB: " +
+            f"{colors.CYAN_B}{name} @ {servername}{colors.CYAN}:" +
+            f"\n{colors.RED}==> {error}{colors.RESET}")
+        return False
+
+    if not is_muted:
+        print(f"{bot.current_time()} {colors.GREEN_B}Mutes DB:{colors.CYAN} user already not in DB: " +
+            f"{colors.CYAN_B}{name} @ {servername}{colors.CYAN}.{colors.RESET}")
+    else:
+        print(f"{bot.current_time()} {colors.GREEN_B}Mutes DB:{colors.CYAN} removed user from DB: " +
+            f"{colors.CYAN_B}{name} @ {servername}{colors.CYAN}.{colors.RESET}")
+    return True
+
+def delete_due(conn, mdbname, server, now):
+    """Delete the mutes in a server that have ended by now, on the database worker.
+    Return (member ID, until) of every deleted mute."""
+    # Both of these only look at the due part of the (server, until) index.
+    due = conn.execute(
+        f"SELECT id, until FROM {mdbname} WHERE server = ? AND until <= ?",
+        (server, now)).fetchall()
+    conn.execute(f"DELETE FROM {mdbname} WHERE server = ? AND until <= ?",
+                 (server, now))
+    return due
+
+
+async def mdb_del_due(bot, mdbname, server, now):
+    """Remove the mutes in a server that have ended by now.
+    Return (member ID, until) of every removed mute."""
+    due = await bot.db_services[mdbname].transaction(
+        delete_due, mdbname, server.id, to_epoch(now))
+    return [(member_id, from_epoch(until)) for (member_id, until) in due]
+
+
+async def mdb_timed(bot, mdbname):
+    """Return (server ID, member ID, until) of every mute with an end."""
+    sql = f"SELECT server, id, until FROM {mdbname} WHERE until IS NOT NULL"
+    rows = await bot.db_services[mdbname].query(sql)
+    return [(server, member, from_epoch(until)) for (server, member, until) in rows]
+
+
+async def mdb_fetch(bot, mdbname, in_data):
     """If input is a server, return a list of all users from that server in the database.
     If input is a member, return what we've got on that member."""
     is_member = isinstance(in_data, discord.Member)
@@ -179,27 +348,26 @@ def mdb_fetch(bot, mdbname, in_data):
         # This should never happen, no point in even logging it.
         raise TypeError(f"Expected discord.Member or discord.Guild, got {type(in_data)}")
 
-    with bot.db_connect(bot, mdbname) as conn:
-        c = conn.cursor()
-        fetch_id = in_data.id
-        if is_member:
-            server = in_data.guild
-            sql = f' SELECT * FROM {mdbname} WHERE id = ? AND server = ? '
-            c.execute(sql, (fetch_id, server.id))
-
-        elif is_server:
-            server = in_data
-            sql = f' SELECT * FROM {mdbname} WHERE server = ? '
-            c.execute(sql, (fetch_id,))
-        
-        output = [
-            BanishTuple(
-                member = discord.utils.get(server.members, id=int(entry[0])),
-                voluntary = bool(entry[2]),
-                until = bot.db_time(entry[3])
-            )
-            for entry in c.fetchall()
-        ]
+    fetch_id = in_data.id
+    if is_member:
+        server = in_data.guild
+        sql = f' SELECT * FROM {mdbname} WHERE id = ? AND server = ? '
+        rows = await bot.db_services[mdbname].query(sql, (fetch_id, server.id))
+
+    elif is_server:
+        server = in_data
+        sql = f' SELECT * FROM {mdbname} WHERE server = ? '
+        rows = await bot.db_services[mdbname].query(sql, (fetch_id,))
+
+    # Members are only looked up if the caller asks for them.
+    output = [
+        BanishTuple(
+            member_id = int(entry[0]),
+            server = server,
+            voluntary = bool(entry[2]),
+            until = from_epoch(entry[3])
+        )
+        for entry in rows
+    ]
 
     return output
-
@@ -0,0 +1,139 @@
+"""
+Scheduler of mute expiries for all servers.
+
+Rather than polling the mutes of every server every few seconds, all
+timed mutes are kept in a single min-heap and the unbanish loop sleeps
+until the first one is due. The heap is filled from the database at
+startup and kept up to date as members are banished and unbanished.
+
+The mute interval of a server is a batching window: a mute is lifted
+at the end of the window it expires in, so mutes ending close to each
+other are lifted (and announced) together. Mutes are never lifted
+early, and at most one window late.
+
+Entries are never removed from the middle of the heap. Instead the
+current entry of every member is kept in a dict, and entries which
+aren't current any more are skipped when they come up.
+"""
+import asyncio
+import heapq
+import time
+from datetime import datetime
+from math import ceil
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+# Rebuild the heap once it has this many times more entries than mutes.
+COMPACT_RATIO = 2
+
+
+class Expiry(NamedTuple):
+    """A timed mute, ordered by when it should be lifted."""
+
+    wake:      float     # When to lift the mute, in epoch seconds
+    guild_id:  int
+    member_id: int
+    until:     datetime  # When the mute ends
+
+
+def wake_time(until: datetime, window: float) -> float:
+    """Get the end of the window until falls in, in epoch seconds."""
+    timestamp = until.timestamp()
+    if window <= 0:
+        return timestamp
+    return ceil(timestamp / window) * window
+
+
+class MuteScheduler:
+    """All timed mutes, in the order they should be lifted."""
+
+    def __init__(self, window: Callable[[int], float]) -> None:
+        """Create an empty scheduler, window gives the window of a server."""
+        self.window = window
+        self.heap: List[Expiry] = list()
+        self.current: Dict[Tuple[int, int], Expiry] = dict()
+        # Set whenever the first entry may have changed.
+        self.changed = asyncio.Event()
+
+    def __len__(self) -> int:
+        """Get the number of scheduled mutes."""
+        return len(self.current)
+
+    def schedule(self, guild_id: int, member_id: int,
+                 until: Optional[datetime]) -> None:
+        """Schedule the mute of a member, replacing any earlier one."""
+        if until is None:
+            # Permanent mutes never expire.
+            self.cancel(guild_id, member_id)
+            return
+
+        try:
+            wake = wake_time(until, self.window(guild_id))
+        except (OverflowError, ValueError):
+            # Ends too far into the future to ever come up.
+            self.cancel(guild_id, member_id)
+            return
+
+        expiry = Expiry(wake, guild_id, member_id, until)
+        self.current[(guild_id, member_id)] = expiry
+        heapq.heappush(self.heap, expiry)
+        if self.heap[0] is expiry:
+            self.changed.set()
+        self.compact()
+
+    def cancel(self, guild_id: int, member_id: int) -> None:
+        """Forget the mute of a member."""
+        self.current.pop((guild_id, member_id), None)
+        self.compact()
+
+    def reschedule(self, guild_id: int) -> None:
+        """Schedule the mutes of a server again after its window changed."""
+        for expiry in list(self.current.values()):
+            if expiry.guild_id == guild_id:
+                self.schedule(guild_id, expiry.member_id, expiry.until)
+
+    def compact(self) -> None:
+        """Drop entries that aren't current once there are many of them."""
+        if len(self.heap) > COMPACT_RATIO * len(self.current) + 64:
+            self.heap = list(self.current.values())
+            heapq.heapify(self.heap)
+
+    def next_wake(self) -> Optional[float]:
+        """Get when the first mute should be lifted, None if there is none."""
+        heap = self.heap
+        while heap:
+            expiry = heap[0]
+            key = (expiry.guild_id, expiry.member_id)
+            if self.current.get(key) == expiry:
+                return expiry.wake
+            heapq.heappop(heap)
+        return None
+
+    def pop_due(self, now: Optional[float] = None) -> List[Expiry]:
+        """Take every mute that should be lifted by now, first one first."""
+        now = time.time() if now is None else now
+        due = list()
+        while True:
+            wake = self.next_wake()
+            if wake is None or wake > now:
+                return due
+            expiry = heapq.heappop(self.heap)
+            del self.current[(expiry.guild_id, expiry.member_id)]
+            due.append(expiry)
+
+    async def wait(self) -> None:
+        """Sleep until the first mute should be lifted."""
+        while True:
+            self.changed.clear()
+            wake = self.next_wake()
+            if wake is None:
+                await self.changed.wait()
+                continue
+
+            delay = wake - time.time()
+            if delay <= 0:
+                return
+            try:
+                # Woken early if a mute due sooner is scheduled.
+                await asyncio.wait_for(self.changed.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
@@ -1,6 +1,7 @@
 """Cog for logging all issued commands."""
 from mrfreeze import colors
 from mrfreeze.cogs.cogbase import CogBase
+from mrfreeze.pipeline import Feature, MessageView
 
 
 def setup(bot):
@@ -14,14 +15,17 @@ class CommandLogger(CogBase):
     def __init__(self, bot):
         """Initialize the cog."""
         self.bot = bot
+        self.bot.add_message_stage(
+            "command_log", self.log_message, Feature.COMMAND)
 
-    @CogBase.listener()
-    async def on_message(self, message):
-        """Check if a message is a command, and log if it is."""
-        if message.author.bot:
-            return
+    def cog_unload(self):
+        """Remove the message stage when the cog is unloaded."""
+        self.bot.remove_message_stage("command_log")
 
-        ctx = await self.bot.get_context(message)
+    async def log_message(self, view: MessageView) -> None:
+        """Check if a message is a command, and log if it is."""
+        ctx = view.ctx
+        message = view.message
         if ctx.command is not None:
             author = message.author
             name = f"{colors.YELLOW}{author.name}#{author.discriminator}"
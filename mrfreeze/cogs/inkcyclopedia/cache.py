@@ -0,0 +1,87 @@
+"""
+Cache of resolved ink lookups.
+
+The same popular inks are asked for over and over, so the result of
+looking up a term is kept in a bounded least recently used cache. Misses
+are cached too, as None, since a term that didn't match anything won't
+start matching until the catalogue changes. The cache has to be cleared
+whenever a new matcher is swapped in.
+"""
+from collections import OrderedDict
+from typing import NamedTuple, Optional
+
+from mrfreeze.cogs.inkcyclopedia.matcher import InkMatcher, InkyTuple
+
+# Default number of terms to remember.
+CACHE_SIZE = 1024
+
+
+class CacheStats(NamedTuple):
+    """Counters of a LookupCache."""
+
+    size:          int
+    maxsize:       int
+    hits:          int
+    misses:        int
+    evictions:     int
+    invalidations: int
+
+    @property
+    def hit_rate(self) -> float:
+        """Get the share of lookups answered from the cache."""
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+def normalize(term: str) -> str:
+    """Get the cache key of a term, ignoring case and extra whitespace."""
+    return " ".join(term.split()).lower()
+
+
+class LookupCache:
+    """Least recently used cache of InkMatcher.lookup() results."""
+
+    def __init__(self, maxsize: int = CACHE_SIZE) -> None:
+        """Create an empty cache holding at most maxsize terms."""
+        self.maxsize = maxsize
+        self.entries: "OrderedDict[str, Optional[InkyTuple]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def __len__(self) -> int:
+        """Get the number of cached terms."""
+        return len(self.entries)
+
+    def lookup(self, matcher: InkMatcher, term: str) -> Optional[InkyTuple]:
+        """Look up term in the cache, asking matcher if it isn't there."""
+        key = normalize(term)
+        if key in self.entries:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return self.entries[key]
+
+        self.misses += 1
+        ink = matcher.lookup(term)
+        if self.maxsize > 0:
+            self.entries[key] = ink
+            if len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+        return ink
+
+    def clear(self) -> None:
+        """Forget every term, for when the catalogue has changed."""
+        self.entries.clear()
+        self.invalidations += 1
+
+    def stats(self) -> CacheStats:
+        """Get the current counters of the cache."""
+        return CacheStats(
+            size=len(self.entries),
+            maxsize=self.maxsize,
+            hits=self.hits,
+            misses=self.misses,
+            evictions=self.evictions,
+            invalidations=self.invalidations)
@@ -0,0 +1,122 @@
+"""
+Persistent index of the Inkcyclopedia.
+
+Building the matcher means parsing the whole CSV and working out the
+literal prefix of every regex, which gets slow once the catalogue is
+large. The index file stores the finished matcher (patterns, prefix trie
+and fallback list) along with a hash of the CSV it was built from, and
+is only rebuilt when that hash changes. Compiled regexes can't be
+stored, so the matcher compiles each one the first time it's needed.
+
+The index is a marshal dump, which is only guaranteed to be readable by
+the same version of Python. It's versioned accordingly and rebuilt when
+it can't be read.
+"""
+import hashlib
+import marshal
+import mmap
+import os
+import sys
+import tempfile
+from time import perf_counter
+from typing import Any, Dict, NamedTuple, Optional, Tuple
+
+from mrfreeze.cogs.inkcyclopedia import sync
+from mrfreeze.cogs.inkcyclopedia.matcher import InkMatcher
+
+# Bump this whenever the layout of the matcher state changes.
+INDEX_VERSION = 4
+
+
+class IndexStats(NamedTuple):
+    """How loading the index went."""
+
+    rebuilt:  bool   # If the index had to be rebuilt from the CSV
+    size:     int    # Size of the index file in bytes
+    seconds:  float  # Time spent loading (and possibly rebuilding)
+    csv_hash: str    # Hash of the CSV the index was built from
+
+
+def file_hash(path: str) -> str:
+    """Get the SHA-256 hash of a file, or an empty string if it's missing."""
+    if not os.path.isfile(path):
+        return ""
+
+    with open(path, "rb") as infile:
+        try:
+            with mmap.mmap(infile.fileno(), 0,
+                           access=mmap.ACCESS_READ) as mapped:
+                return hashlib.sha256(mapped).hexdigest()
+        except ValueError:
+            return hashlib.sha256(infile.read()).hexdigest()
+
+
+def header(csv_hash: str) -> Dict[str, Any]:
+    """Get what the header of a valid index for csv_hash looks like."""
+    return {
+        "version": INDEX_VERSION,
+        "python": list(sys.version_info[:2]),
+        "csv_hash": csv_hash,
+    }
+
+
+def load_index(index_path: str, csv_hash: str) -> Optional[InkMatcher]:
+    """Load the index, unless it's missing, outdated or unreadable."""
+    if not os.path.isfile(index_path):
+        return None
+
+    try:
+        with open(index_path, "rb") as infile:
+            with mmap.mmap(infile.fileno(), 0,
+                           access=mmap.ACCESS_READ) as mapped:
+                data = marshal.loads(mapped)
+        if data["header"] != header(csv_hash):
+            return None
+        return InkMatcher.from_state(data["matcher"])
+    except Exception:
+        return None
+
+
+def save_index(index_path: str, matcher: InkMatcher, csv_hash: str) -> None:
+    """Write the index to a temporary file, then move it into place."""
+    data = {"header": header(csv_hash), "matcher": matcher.state()}
+    directory = os.path.dirname(index_path) or "."
+    handle, temp_path = tempfile.mkstemp(
+        dir=directory, prefix=".inkcyclopedia-", suffix=".idx")
+
+    try:
+        with open(handle, "wb") as outfile:
+            marshal.dump(data, outfile)
+        os.replace(temp_path, index_path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+def load_matcher(index_path: str, csv_path: str, encoding: str,
+                 previous: Optional[InkMatcher] = None
+                 ) -> Tuple[InkMatcher, IndexStats]:
+    """
+    Get the matcher for the CSV file, from the index if it's up to date.
+
+    If the index has to be rebuilt, regexes already compiled by the
+    previous matcher are carried over.
+    """
+    start = perf_counter()
+    csv_hash = file_hash(csv_path)
+    matcher = load_index(index_path, csv_hash)
+    rebuilt = matcher is None
+
+    if matcher is None:
+        compiled = previous.compiled() if previous is not None else None
+        rows = [(row.name, row.url, row.regex)
+                for row in sync.read_rows(csv_path, encoding) if row.usable]
+        matcher = InkMatcher.from_rows(rows, compiled)
+        save_index(index_path, matcher, csv_hash)
+
+    stats = IndexStats(
+        rebuilt=rebuilt,
+        size=os.path.getsize(index_path),
+        seconds=perf_counter() - start,
+        csv_hash=csv_hash)
+    return matcher, stats
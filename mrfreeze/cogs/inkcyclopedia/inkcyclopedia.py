@@ -0,0 +1,400 @@
+import asyncio
+import os
+import posixpath
+import re
+from typing import Iterable, List, Optional, Sequence, Set, Tuple
+from urllib.parse import quote
+
+import discord
+from discord import Message
+from discord.ext.commands.context import Context
+
+from airtable.airtable import Airtable
+
+from mrfreeze import checks, colors
+from mrfreeze.bot import MrFreeze
+from mrfreeze.cogs.cogbase import CogBase
+from mrfreeze.cogs.inkcyclopedia import index, search, sync
+from mrfreeze.cogs.inkcyclopedia.cache import LookupCache, normalize
+from mrfreeze.cogs.inkcyclopedia.matcher import InkMatcher, InkyTuple
+from mrfreeze.cogs.inkcyclopedia.trigram import TrigramIndex
+from mrfreeze.pipeline import Feature, MessageView, RecentReplies
+
+# An embed can't have more than 25 fields.
+MAX_INKS = 25
+
+
+# Small cog listening to all incoming messages looking for mentions of inks.
+# Based on The Inkcyclopedia by klundtasaur:
+# https://www.reddit.com/r/fountainpens/comments/5egjsa/klundtasaurs_inkcyclopedia_for_rfountainpens/
+def setup(bot):
+    """Add the cog to the bot."""
+    bot.add_cog(Inkcyclopedia(bot))
+
+
+class Inkcyclopedia(CogBase):
+    """Type an ink inside {curly brackets} and I'll tell you what
+    it looks like!"""
+    def __init__(self, bot: MrFreeze) -> None:
+        self.bot: MrFreeze = bot
+
+        self.matcher:    InkMatcher = InkMatcher(list())
+        self.trigrams:   TrigramIndex = TrigramIndex(list())
+        self.lookups:    LookupCache = LookupCache()
+        # Terms of recent messages and the replies to them, for edits.
+        self.replies:    RecentReplies = RecentReplies()
+        self.inkdb_path: str = f"{bot.db_prefix}/inkcyclopedia.csv"
+        self.index_path: str = f"{bot.db_prefix}/inkcyclopedia.idx"
+        self.search_path: str = f"{bot.db_prefix}/inkcyclopedia.db"
+        self.inkdb_enc:  str = "utf-8-sig"
+        self.airtable:   Optional[Airtable] = None
+        # Terms are capped in length so no ink regex ever sees a long text.
+        self.bracketmatch = re.compile(r"[{]([\w\-\s]{1,100})[}]")
+        self.bot.add_message_stage(
+            "inkcyclopedia", self.ink_stage, Feature.INK)
+
+        self.sync_lock:  asyncio.Lock = asyncio.Lock()
+        self.search_lock: asyncio.Lock = asyncio.Lock()
+        self.search_conn = search.connect(self.search_path)
+
+        # Name of the Airtable field with the last modification time
+        # of each row, and how often (in seconds) to sync with Airtable.
+        self.modified_field: str = "Last Modified"
+        self.refresh_interval: int = 3600
+
+        # File config/airtable should have format:
+        # base = <your base id here>
+        # table = <your table name here>
+        # apikey = <your api_key here>
+        #
+        # Optionally it may also have:
+        # modified = <name of last modified field, default Last Modified>
+        # refresh = <seconds between syncs, default 3600>
+        # url = <API url, default https://api.airtable.com/v0>
+        try:
+            with open("config/airtable", "r") as airtable_file:
+                content = [i.split("=", 1) for i in airtable_file.readlines()]
+                content = [[i[0].strip(), i[1].strip()] for i in content]
+                keys = {i[0]: i[1] for i in content}
+                self.airtable = Airtable(
+                        keys["base"],
+                        keys["table"],
+                        api_key=keys["apikey"]
+                )
+                if "url" in keys:
+                    self.airtable.url_table = posixpath.join(
+                        keys["url"], keys["base"],
+                        quote(keys["table"], safe=""))
+                self.modified_field = keys.get("modified", self.modified_field)
+                self.refresh_interval = int(
+                    keys.get("refresh", self.refresh_interval))
+        except Exception:
+            print("Failed to open or parse ./config/airtable.")
+            print("The Inkcyclopedia will not be able to update.")
+
+    def cog_unload(self) -> None:
+        self.bot.remove_message_stage("inkcyclopedia")
+        self.search_conn.close()
+
+    @CogBase.listener()
+    async def on_ready(self) -> None:
+        # Fetch inks if db does not exist
+        if not os.path.isfile(self.inkdb_path):
+            await self.fetch_inks()
+
+        # Load up the ink db!
+        stats = await self.update_db()
+
+        # Print that the ink database has been loaded and with how many inks.
+        print(
+            f"{colors.CYAN}The ink database has been loaded with " +
+            f"{colors.MAGENTA_B}{len(self.matcher)} inks{colors.CYAN}!{colors.RESET}"
+        )
+        action = "rebuilt" if stats.rebuilt else "loaded"
+        print(
+            f"{colors.CYAN}Ink index {action} in {colors.MAGENTA_B}" +
+            f"{stats.seconds * 1000:.1f} ms{colors.CYAN} " +
+            f"({stats.size / 1024:.1f} kB).{colors.RESET}"
+        )
+
+        # on_ready may fire again after reconnects, only start one loop.
+        task = self.bot.bg_tasks.get("inkcyclopedia")
+        if self.airtable is not None and (task is None or task.done()):
+            self.bot.add_bg_task(self.refresh_loop(), "inkcyclopedia")
+
+    async def refresh_loop(self) -> None:
+        """Sync the Inkcyclopedia with Airtable every refresh_interval."""
+        while not self.bot.is_closed():
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                await self.refresh()
+            except Exception as e:
+                print(f"{self.current_time()} {colors.RED_B}Inkcyclopedia:" +
+                      f"{colors.CYAN} sync failed:\n" +
+                      f"{colors.RED}==> {e}{colors.RESET}")
+
+    async def refresh(self) -> Optional[sync.SyncResult]:
+        """Sync with Airtable, reloading the inks if anything changed."""
+        result = await self.fetch_inks()
+        if result is not None and result.changed:
+            await self.update_db()
+            print(f"{self.current_time()} {colors.GREEN_B}Inkcyclopedia:" +
+                  f"{colors.CYAN} fetched {result.fetched} and removed " +
+                  f"{result.removed} rows, now has {colors.MAGENTA_B}" +
+                  f"{len(self.matcher)} inks{colors.CYAN}.{colors.RESET}")
+        return result
+
+    async def fetch_inks(self) -> Optional[sync.SyncResult]:
+        """
+        Fetches the latest version of the Inkcyclopedia from Airtable.
+
+        Only new and changed rows are fetched, and all the blocking work
+        is done in an executor so the event loop isn't held up.
+        """
+        # Abort if self.airtable is not set.
+        if self.airtable is None:
+            return None
+
+        async with self.sync_lock:
+            return await self.bot.loop.run_in_executor(
+                None, sync.sync, self.airtable, self.inkdb_path,
+                self.inkdb_enc, self.modified_field)
+
+    async def update_db(self) -> index.IndexStats:
+        """
+        Load the inks from the index, rebuilding it if the CSV changed.
+
+        Regexes are compiled as they're needed rather than up front, and
+        the ones compiled by the current matcher are carried over.
+        """
+        matcher, stats = await self.bot.loop.run_in_executor(
+            None, index.load_matcher, self.index_path, self.inkdb_path,
+            self.inkdb_enc, self.matcher)
+
+        # Rejected inks can never be found, so don't suggest them.
+        rejected = {name for (name, _) in matcher.rejected}
+        names = [name for name in matcher.names if name not in rejected]
+        trigrams = await self.bot.loop.run_in_executor(
+            None, TrigramIndex, names)
+
+        # Swap in one go so lookups never see a half built catalogue.
+        # The cached lookups belong to the old matcher, so they go too.
+        self.matcher = matcher
+        self.trigrams = trigrams
+        self.lookups.clear()
+
+        rows = list(zip(matcher.names, matcher.urls))
+        async with self.search_lock:
+            await self.bot.loop.run_in_executor(
+                None, search.build_search, self.search_conn, rows,
+                stats.csv_hash)
+        return stats
+
+    @discord.ext.commands.command(name="inkupdate")
+    @discord.ext.commands.check(checks.is_owner)
+    async def inkupdate(self, ctx: Context) -> None:
+        """Sync with Airtable right away instead of waiting for the loop."""
+        result = await self.refresh()
+        if result is None:
+            await ctx.send("I don't know where to get the inks from...")
+            return
+
+        await ctx.send(
+            f"There are now {len(self.matcher)} inks in the database! " +
+            f"({result.fetched} fetched, {result.removed} removed)")
+        self.log_command(
+            ctx, f"Inkcyclopedia updated, now has {len(self.matcher)} entries.")
+
+    @discord.ext.commands.group(name="ink", invoke_without_command=True)
+    async def ink(self, ctx: Context) -> None:
+        """Look up inks in the Inkcyclopedia."""
+        await ctx.send(
+            f"{ctx.author.mention} Try `{ctx.prefix}ink search <terms>`, " +
+            "or just type the name of an ink in {curly brackets}!")
+
+    @ink.command(name="search")
+    async def ink_search(self, ctx: Context, *, terms: str = "") -> None:
+        """Search for inks by name, beginnings of words work too."""
+        async with self.search_lock:
+            results = await self.bot.loop.run_in_executor(
+                None, search.search, self.search_conn, terms)
+
+        if not results:
+            await ctx.send(
+                f"{ctx.author.mention} I couldn't find any inks like that.")
+            return
+
+        # Embed fields can't be longer than 1024 characters.
+        value = ""
+        for (name, url) in results:
+            line = f"[{name}]({url})"
+            if len(value) + len(line) + 1 > 1024:
+                break
+            value = f"{value}\n{line}" if value else line
+
+        embed = discord.Embed(color=0x00dee9)
+        embed.add_field(name=f"Inks matching {terms}"[:256], value=value)
+        await ctx.send(embed=embed)
+
+    @discord.ext.commands.command(name="inkrejects")
+    @discord.ext.commands.check(checks.is_owner)
+    async def inkrejects(self, ctx: Context) -> None:
+        """List inks whose regexes were rejected as unsafe."""
+        rejected = self.matcher.rejected
+        if not rejected:
+            await ctx.send("All the inks in the database are safe to use!")
+            return
+
+        lines = [f"{name}: {reason}" for (name, reason) in rejected]
+        header = f"{len(rejected)} inks have been rejected:"
+
+        # Split into several messages to stay below the length limit.
+        reply = header
+        for line in lines:
+            if len(reply) + len(line) + 10 > 2000:
+                await ctx.send(f"```\n{reply}\n```")
+                reply = ""
+            reply = f"{reply}\n{line}" if reply else line
+        await ctx.send(f"```\n{reply}\n```")
+
+    @discord.ext.commands.command(name="inkcache")
+    @discord.ext.commands.check(checks.is_owner)
+    async def inkcache(self, ctx: Context) -> None:
+        """Show how well the cache of ink lookups is doing."""
+        stats = self.lookups.stats()
+        await ctx.send(
+            "```\n" +
+            f"Cached terms:  {stats.size}/{stats.maxsize}\n" +
+            f"Hits:          {stats.hits} ({stats.hit_rate:.1%})\n" +
+            f"Misses:        {stats.misses}\n" +
+            f"Evictions:     {stats.evictions}\n" +
+            f"Invalidations: {stats.invalidations}\n" +
+            "```")
+
+    async def ink_stage(self, view: MessageView) -> None:
+        """
+        Reply to the inks in a message.
+
+        Edits are only acted on if they bring new terms. The earlier
+        reply is edited to cover every term, and without one only the
+        new terms are replied to.
+        """
+        matches: List[str] = self.bracketmatch.findall(view.content)
+        terms = frozenset(normalize(match) for match in matches)
+        message: Message = view.message
+        previous = self.replies.get(message.id)
+
+        if view.edited:
+            if previous is not None:
+                old_terms = previous.items
+            else:
+                old_terms = frozenset(
+                    normalize(match)
+                    for match in self.bracketmatch.findall(view.before))
+            new_terms = terms - old_terms
+            if not new_terms:
+                return
+            if previous is None or previous.reply is None:
+                matches = [match for match in matches
+                           if normalize(match) in new_terms]
+
+        # Stop the function if message contains no matches
+        if not matches:
+            return
+
+        reply, embed = self.ink_reply(matches)
+        if reply is None:
+            self.replies.put(message.id, terms,
+                             previous.reply if previous else None)
+            return
+
+        if previous is not None and previous.reply is not None:
+            await previous.reply.edit(content=reply, embed=embed)
+            sent = previous.reply
+        else:
+            sent = await message.channel.send(reply, embed=embed)
+        self.replies.put(message.id, terms, sent)
+
+    def ink_reply(self, matches: List[str]
+                  ) -> Tuple[Optional[str], Optional[discord.Embed]]:
+        """Get the reply to the terms in a message, if there is one."""
+        # Everything is looked up first so that it all goes in one reply.
+        inks, missed = resolve(self.matcher, matches, self.lookups)
+        if inks:
+            reply = f"Found a match for {join_names(i.name for i in inks)}!"
+            if len(reply) > 2000:
+                reply = f"Found {len(inks)} matches!"
+            return reply, ink_embed(inks)
+
+        # Nothing matched, suggest the closest inks for the first term
+        # that has any rather than leaving people to guess.
+        for match in missed:
+            suggestions = self.trigrams.suggest(match)
+            if suggestions:
+                names = join_names((s.name for s in suggestions), "or")
+                return f"I couldn't find {match}, did you mean {names}?", None
+        return None, None
+
+
+def join_names(names: Iterable[str], word: str = "and") -> str:
+    """Join names like "**A**, **B** and **C**"."""
+    bold = [f"**{name}**" for name in names]
+    if len(bold) > 1:
+        bold = [", ".join(bold[:-1]), bold[-1]]
+    return f" {word} ".join(bold)
+
+
+def resolve(matcher: InkMatcher, terms: Iterable[str],
+            cache: Optional[LookupCache] = None
+            ) -> Tuple[List[InkyTuple], List[str]]:
+    """
+    Look up every term, returning the inks found and the terms missed.
+
+    Terms that only differ in case and spacing are only looked up once,
+    and every ink is only returned once no matter how many terms found it.
+    At most MAX_INKS inks are returned. Lookups go through cache if
+    one is given.
+    """
+    inks: List[InkyTuple] = list()
+    missed: List[str] = list()
+    seen_terms: Set[str] = set()
+    seen_inks: Set[str] = set()
+
+    for term in terms:
+        term = " ".join(term.split())
+        if not term or term.lower() in seen_terms:
+            continue
+        seen_terms.add(term.lower())
+
+        if cache is not None:
+            ink = cache.lookup(matcher, term)
+        else:
+            ink = matcher.lookup(term)
+        if ink is None:
+            missed.append(term)
+        elif ink.name not in seen_inks:
+            seen_inks.add(ink.name)
+            inks.append(ink)
+            if len(inks) == MAX_INKS:
+                break
+    return inks, missed
+
+
+def ink_embed(inks: Sequence[InkyTuple]) -> discord.Embed:
+    """
+    Create the embed for the inks found in a message.
+
+    An embed can only show one image, so the first ink gets the image
+    and when there are more inks each of them gets a field with a link.
+    """
+    embed = discord.Embed()
+    embed.set_image(url=inks[0].url)
+    if len(inks) > 1:
+        for ink in inks:
+            name = ink.name[:256]
+            value = f"[Picture]({ink.url})"[:1024]
+            # The whole embed can't be longer than 6000 characters.
+            if len(embed) + len(name) + len(value) > 6000:
+                break
+            embed.add_field(name=name, value=value)
+    return embed
@@ -0,0 +1,338 @@
+"""
+Combined matcher for all the regexes in the Inkcyclopedia.
+
+Rather than running every ink's regex against every bracketed term,
+the literal text each regex has to start with is put in a trie. Only
+letters and digits are kept, separators such as \\s* or -? are skipped
+over, so "diamine\\s*oxblood" is filed under "diamineoxblood". A lookup
+walks the trie from every position of the (equally stripped) term and
+only tries the inks found along the way, plus the (hopefully few) inks
+whose regex doesn't start with any literal text.
+
+Inks have a fixed priority, which is the order they were given in.
+When several inks match a term the one with the lowest index wins.
+
+Every pattern is screened for catastrophic backtracking when the matcher
+is built (see safety.py). Rejected inks are left out altogether, the
+others are only run on terms short enough for their worst case to be
+fast, and are disabled if they're too slow anyway.
+"""
+import re
+from heapq import merge
+from time import perf_counter
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional
+from typing import Pattern, Sequence, Set, Tuple
+
+from mrfreeze.cogs.inkcyclopedia import safety
+
+# Prefixes shorter than this are too unspecific to be worth indexing.
+MIN_PREFIX_LENGTH = 2
+
+# Characters which are not literals outside of a character class.
+METACHARACTERS = set(".^$*+?{}[]\\|()")
+
+# Escapes which only ever match things that aren't letters or digits.
+SEPARATOR_ESCAPES = set("s")
+
+# Key under which trie nodes keep their inks. Can't collide with a
+# character since all edges are exactly one character long.
+INKS = ""
+
+
+class InkyTuple(NamedTuple):
+    name:  str
+    url:   str
+    regex: Pattern[str]
+
+
+def top_level_alternation(pattern: str) -> bool:
+    """Check if pattern contains a | which isn't inside a group or class."""
+    depth = 0
+    in_class = False
+    escaped = False
+    for char in pattern:
+        if escaped:
+            escaped = False
+        elif char == "\\":
+            escaped = True
+        elif in_class:
+            in_class = (char != "]")
+        elif char == "[":
+            in_class = True
+        elif char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        elif char == "|" and depth == 0:
+            return True
+    return False
+
+
+def separator_class(content: str) -> bool:
+    """Check if the inside of a [character class] only has separators."""
+    if content.startswith("^"):
+        return False
+
+    position = 0
+    while position < len(content):
+        char = content[position]
+        if char == "\\":
+            escaped = content[position + 1:position + 2]
+            if escaped.isalnum() and escaped not in SEPARATOR_ESCAPES:
+                return False
+            position += 2
+        elif char.isalnum():
+            return False
+        else:
+            position += 1
+    return True
+
+
+def skip_quantifier(pattern: str, position: int) -> Tuple[str, int]:
+    """Get the quantifier at position (if any) and the position after it."""
+    char = pattern[position:position + 1]
+    if char in ("*", "+", "?"):
+        end = position + 1
+    elif char == "{" and "}" in pattern[position:]:
+        end = pattern.index("}", position) + 1
+    else:
+        return "", position
+
+    # Lazy/possessive modifiers.
+    if pattern[end:end + 1] in ("?", "+"):
+        end += 1
+    return char, end
+
+
+def literal_prefix(pattern: str) -> str:
+    """
+    Get the letters and digits any match of pattern has to start with.
+
+    Things which can only match separators (whitespace, dashes, etc.)
+    are skipped, anything else ends the prefix. The result is lower case
+    and an empty string means that no prefix could be found.
+    """
+    if top_level_alternation(pattern):
+        return ""
+
+    prefix = list()
+    position = 0
+    if pattern.startswith("^"):
+        position += 1
+
+    while position < len(pattern):
+        char = pattern[position]
+
+        if char == "\\":
+            escaped = pattern[position + 1:position + 2]
+            if escaped in ("b", "B"):
+                # Zero width, doesn't consume anything.
+                position += 2
+                continue
+            elif escaped.isalnum() and escaped not in SEPARATOR_ESCAPES:
+                break
+            separator = True
+            position += 2
+
+        elif char == "[":
+            end = pattern.find("]", position + 2)
+            if end == -1 or not separator_class(pattern[position + 1:end]):
+                break
+            separator = True
+            position = end + 1
+
+        elif char in METACHARACTERS:
+            break
+
+        else:
+            separator = not char.isalnum()
+            position += 1
+
+        quantifier, after = skip_quantifier(pattern, position)
+        if separator:
+            position = after
+        elif quantifier in ("*", "?", "{"):
+            # This character is optional, so it can't be part of the prefix.
+            break
+        else:
+            prefix.append(char.lower())
+            if quantifier == "+":
+                break
+
+    return "".join(prefix)
+
+
+def strip_term(term: str) -> str:
+    """Lower case a term and remove everything but letters and digits."""
+    return "".join(char for char in term.lower() if char.isalnum())
+
+
+class InkMatcher:
+    """
+    All the inks of the Inkcyclopedia, compiled into a single matcher.
+
+    Regexes are compiled the first time they're needed, so a matcher can
+    be created from the plain patterns without compiling anything.
+    """
+
+    def __init__(self, inks: Sequence[InkyTuple]) -> None:
+        """Create a matcher from already compiled inks."""
+        self.names:    List[str] = [ink.name for ink in inks]
+        self.urls:     List[str] = [ink.url for ink in inks]
+        self.patterns: List[str] = [ink.regex.pattern for ink in inks]
+        self.regexes:  List[Optional[Pattern[str]]] = [
+            ink.regex for ink in inks]
+        self.trie:     Dict[str, Any] = dict()
+        self.fallback: List[int] = list()
+        self.guarded:  Set[int] = set()
+        self.limits:   Dict[int, int] = dict()  # Longest term of each ink
+        self.rejected: List[Tuple[str, str]] = list()  # (name, reason)
+        self.disabled: Set[int] = set()
+        self.build()
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Tuple[str, str, str]],
+                  compiled: Optional[Dict[str, Pattern[str]]] = None
+                  ) -> "InkMatcher":
+        """
+        Create a matcher from (name, url, pattern) rows.
+
+        Regexes found in compiled are reused, the rest are left to be
+        compiled when they're first needed.
+        """
+        compiled = compiled or dict()
+        matcher = cls(list())
+        for (name, url, pattern) in rows:
+            matcher.names.append(name)
+            matcher.urls.append(url)
+            matcher.patterns.append(pattern)
+            matcher.regexes.append(compiled.get(pattern))
+        matcher.build()
+        return matcher
+
+    @classmethod
+    def from_state(cls, state: Dict[str, Any]) -> "InkMatcher":
+        """Recreate a matcher from the output of state()."""
+        matcher = cls(list())
+        matcher.names = state["names"]
+        matcher.urls = state["urls"]
+        matcher.patterns = state["patterns"]
+        matcher.regexes = [None] * len(matcher.patterns)
+        matcher.trie = state["trie"]
+        matcher.fallback = state["fallback"]
+        matcher.guarded = set(state["guarded"])
+        matcher.limits = state["limits"]
+        matcher.rejected = [tuple(ink) for ink in state["rejected"]]
+        return matcher
+
+    def state(self) -> Dict[str, Any]:
+        """Get everything except the compiled regexes as plain data."""
+        return {
+            "names":    self.names,
+            "urls":     self.urls,
+            "patterns": self.patterns,
+            "trie":     self.trie,
+            "fallback": self.fallback,
+            "guarded":  sorted(self.guarded),
+            "limits":   self.limits,
+            "rejected": [list(ink) for ink in self.rejected],
+        }
+
+    def build(self) -> None:
+        """Screen every ink and put the literal prefix of it in the trie."""
+        self.trie = dict()
+        self.fallback = list()
+        self.guarded = set()
+        self.limits = dict()
+        self.rejected = list()
+        for index, pattern in enumerate(self.patterns):
+            verdict = safety.check_pattern(pattern, re.IGNORECASE)
+            if verdict.category == safety.REJECTED:
+                self.rejected.append((self.names[index], verdict.reason))
+                continue
+            elif verdict.category == safety.GUARDED:
+                self.guarded.add(index)
+            self.limits[index] = verdict.max_term
+
+            prefix = literal_prefix(pattern)
+            if len(prefix) < MIN_PREFIX_LENGTH:
+                self.fallback.append(index)
+                continue
+
+            node = self.trie
+            for char in prefix:
+                node = node.setdefault(char, dict())
+            node.setdefault(INKS, list()).append(index)
+
+    def __len__(self) -> int:
+        """Get the number of inks in the matcher."""
+        return len(self.patterns)
+
+    def compiled(self) -> Dict[str, Pattern[str]]:
+        """Get all regexes compiled so far, by pattern."""
+        return {regex.pattern: regex
+                for regex in self.regexes if regex is not None}
+
+    def regex(self, index: int) -> Optional[Pattern[str]]:
+        """Get the compiled regex of an ink, compiling it if needed."""
+        regex = self.regexes[index]
+        if regex is None:
+            try:
+                regex = re.compile(self.patterns[index], re.IGNORECASE)
+            except re.error as e:
+                print(f"Failed to compile the regex of {self.names[index]}: " +
+                      f"{e}")
+                # Never matches anything, so the ink is effectively ignored.
+                regex = re.compile(r"(?!)")
+            self.regexes[index] = regex
+        return regex
+
+    def ink(self, index: int) -> InkyTuple:
+        """Get the ink with the given index."""
+        return InkyTuple(self.names[index], self.urls[index],
+                         self.regex(index))
+
+    def candidates(self, term: str) -> Iterator[int]:
+        """Get the indices of all inks that might match term, in order."""
+        stripped = strip_term(term)
+        found = [self.fallback]
+
+        for start in range(len(stripped)):
+            node = self.trie
+            for char in stripped[start:]:
+                node = node.get(char)
+                if node is None:
+                    break
+                if INKS in node:
+                    found.append(node[INKS])
+
+        # Ink lists are built in index order, so merging keeps them sorted.
+        previous = None
+        for index in merge(*found):
+            if index != previous:
+                yield index
+            previous = index
+
+    def search(self, index: int, term: str) -> bool:
+        """Check if the regex of an ink matches term."""
+        # Regexes are only run on terms short enough for their worst
+        # case to fit the budget, and disabled if they're slow anyway.
+        if index in self.disabled or len(term) > self.limits[index]:
+            return False
+
+        start = perf_counter()
+        found = self.regex(index).search(term) is not None
+        elapsed = perf_counter() - start
+        if elapsed > safety.SEARCH_BUDGET:
+            self.disabled.add(index)
+            self.rejected.append((
+                self.names[index],
+                f"search took {elapsed * 1000:.0f} ms, disabled"))
+        return found
+
+    def lookup(self, term: str) -> Optional[InkyTuple]:
+        """Find the highest priority ink matching term, if any."""
+        for index in self.candidates(term):
+            if self.search(index, term):
+                return self.ink(index)
+        return None
@@ -0,0 +1,244 @@
+"""
+Screening of Airtable regexes for catastrophic backtracking.
+
+The regexes of the Inkcyclopedia come straight from Airtable and are run
+against text anyone can type, so a single bad pattern could block the
+event loop. Every pattern is parsed and put in one of three categories:
+
+SAFE      Backtracks at most linearly, runs like any other regex.
+GUARDED   Can backtrack polynomially (adjacent quantifiers that can
+          match the same thing).
+REJECTED  Doesn't compile, or can backtrack exponentially: nested
+          quantifiers such as (a+)+ or (a+){10}, or alternatives that
+          can start alike under a quantifier such as (a|ab)+ or
+          (?i)(a|A)+. Never run.
+
+Both SAFE and GUARDED patterns are only run on terms short enough for
+their worst case to fit the budget, see term_limit().
+"""
+from typing import Any, Iterable, NamedTuple, Optional, Set
+
+try:
+    from re import _parser as sre_parse  # Python 3.11+
+except ImportError:
+    import sre_parse  # type: ignore
+
+SAFE = "safe"
+GUARDED = "guarded"
+REJECTED = "rejected"
+
+# Repeats with an upper bound this high might as well be unbounded.
+UNBOUNDED = 100
+
+# Regexes are never run on terms longer than this, or this for guarded
+# regexes...
+MAX_TERM = 100
+MAX_GUARDED_TERM = 64
+
+# ...nor on terms where a search could take more steps than this, which
+# is well within SEARCH_BUDGET even on a slow machine.
+MAX_STEPS = 2_000_000
+
+# Regexes are disabled if a search takes longer than this anyway
+# (seconds), in case the machine is slower still.
+SEARCH_BUDGET = 0.05
+
+# Possessive repeats never backtrack, so they're not included here.
+REPEATS = {sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT}
+
+# Largest character range we're willing to expand into a set.
+MAX_RANGE = 256
+
+
+class Verdict(NamedTuple):
+    """The category of a pattern and why it was put there."""
+
+    category: str
+    reason:   str = ""
+    max_term: int = 0  # Longest term the pattern may be run on
+
+
+class Rejected(Exception):
+    """Raised while walking a pattern that has to be rejected."""
+
+
+def unbounded(maximum: int) -> bool:
+    """Check if the upper bound of a repeat is effectively unbounded."""
+    return maximum == sre_parse.MAXREPEAT or maximum >= UNBOUNDED
+
+
+def fold(chars: Set[int]) -> Set[int]:
+    """Add the lower and upper case forms of every character to chars."""
+    folded = set(chars)
+    for char in chars:
+        for other in (chr(char).lower(), chr(char).upper()):
+            if len(other) == 1:
+                folded.add(ord(other))
+    return folded
+
+
+def scoped(ignorecase: bool, av: Any) -> bool:
+    """Check if a group ignores case, given its SUBPATTERN arguments."""
+    (_, add_flags, del_flags, _) = av
+    if del_flags & sre_parse.SRE_FLAG_IGNORECASE:
+        return False
+    return ignorecase or bool(add_flags & sre_parse.SRE_FLAG_IGNORECASE)
+
+
+def first_chars(items: Iterable[Any],
+                ignorecase: bool = False) -> Optional[Set[int]]:
+    """
+    Get the characters a sequence of items can start with.
+
+    None means it could start with pretty much anything (or nothing),
+    which always counts as overlapping. With ignorecase both cases of
+    every character are included.
+    """
+    for (op, av) in items:
+        if op == sre_parse.AT:
+            # Anchors don't consume anything.
+            continue
+        elif op == sre_parse.LITERAL:
+            return fold({av}) if ignorecase else {av}
+        elif op == sre_parse.IN:
+            chars: Set[int] = set()
+            for (in_op, in_av) in av:
+                if in_op == sre_parse.LITERAL:
+                    chars.add(in_av)
+                elif in_op == sre_parse.RANGE and \
+                        in_av[1] - in_av[0] <= MAX_RANGE:
+                    chars.update(range(in_av[0], in_av[1] + 1))
+                else:
+                    return None
+            return fold(chars) if ignorecase else chars
+        elif op == sre_parse.SUBPATTERN:
+            return first_chars(av[-1], scoped(ignorecase, av))
+        elif op == sre_parse.BRANCH:
+            chars = set()
+            for branch in av[1]:
+                branch_chars = first_chars(branch, ignorecase)
+                if branch_chars is None:
+                    return None
+                chars.update(branch_chars)
+            return chars
+        elif op in REPEATS and av[0] > 0:
+            return first_chars(av[2], ignorecase)
+        else:
+            return None
+    return None
+
+
+def overlap(first: Optional[Set[int]], second: Optional[Set[int]]) -> bool:
+    """Check if two sets from first_chars() might share a character."""
+    return first is None or second is None or bool(first & second)
+
+
+def ambiguous_branch(items: Iterable[Any], ignorecase: bool = False) -> bool:
+    """Check if a repeated body has alternatives that can start alike."""
+    for (op, av) in items:
+        if op == sre_parse.SUBPATTERN:
+            return ambiguous_branch(av[-1], scoped(ignorecase, av))
+        if op == sre_parse.BRANCH:
+            seen: Set[int] = set()
+            for branch in av[1]:
+                chars = first_chars(branch, ignorecase)
+                if chars is None or seen & chars:
+                    return True
+                seen.update(chars)
+    return False
+
+
+def walk(items: Any, repeated: bool, findings: Set[str],
+         ignorecase: bool = False) -> int:
+    """
+    Walk a parsed pattern looking for trouble.
+
+    Raises Rejected on nested quantifiers and ambiguous alternatives
+    under a quantifier, adds reasons for guarding the pattern to
+    findings and returns the number of unbounded quantifiers.
+    """
+    previous_repeat: Optional[Any] = None
+    count = 0
+
+    for (op, av) in items:
+        if op in REPEATS:
+            body = av[2]
+            is_unbounded = unbounded(av[1])
+            # (a+){10} backtracks just like (a+)+ does.
+            repeats_body = is_unbounded or av[1] > 1
+            # So does anything of varying length inside a repeat, such
+            # as the x? of (x?\w)+ which may or may not take an x.
+            if repeated and av[0] != av[1]:
+                raise Rejected("nested quantifiers")
+            if repeats_body and ambiguous_branch(body, ignorecase):
+                raise Rejected("overlapping alternatives under a quantifier")
+            if is_unbounded and previous_repeat is not None and overlap(
+                    first_chars(previous_repeat, ignorecase),
+                    first_chars(body, ignorecase)):
+                findings.add("adjacent overlapping quantifiers")
+
+            count += walk(body, repeated or repeats_body, findings,
+                          ignorecase)
+            count += is_unbounded
+            previous_repeat = body if is_unbounded else None
+            continue
+
+        if op == sre_parse.SUBPATTERN:
+            count += walk(av[-1], repeated, findings,
+                          scoped(ignorecase, av))
+        elif op == sre_parse.BRANCH:
+            for branch in av[1]:
+                count += walk(branch, repeated, findings, ignorecase)
+        elif op in (sre_parse.ASSERT, sre_parse.ASSERT_NOT):
+            count += walk(av[1], repeated, findings, ignorecase)
+        elif op == sre_parse.GROUPREF_EXISTS:
+            for branch in av[1:]:
+                if branch is not None:
+                    count += walk(branch, repeated, findings, ignorecase)
+        elif op == getattr(sre_parse, "ATOMIC_GROUP", None):
+            # Nothing inside an atomic group is ever backtracked into.
+            count += walk(av, False, findings, ignorecase)
+
+        previous_repeat = None
+
+    return count
+
+
+def term_limit(size: int, degree: int, ceiling: int) -> int:
+    """
+    Get the longest term (at most ceiling) a pattern may be run on.
+
+    A search of a term of length n tries every one of the n + 1 places
+    it could start at. Without nested quantifiers, each unbounded
+    quantifier that overlaps its neighbour can then only try n + 1
+    lengths, so the search takes at most size * (n + 1) ** degree steps,
+    degree being one more than the number of such quantifiers. That has
+    to fit MAX_STEPS.
+    """
+    limit = ceiling
+    while limit > 0 and max(size, 1) * (limit + 1) ** degree > MAX_STEPS:
+        limit -= 1
+    return limit
+
+
+def check_pattern(pattern: str, flags: int = 0) -> Verdict:
+    """Put a pattern into one of the categories SAFE, GUARDED or REJECTED."""
+    try:
+        parsed = sre_parse.parse(pattern, flags)
+    except Exception as e:
+        return Verdict(REJECTED, f"doesn't compile ({e})")
+
+    findings: Set[str] = set()
+    ignorecase = bool(parsed.state.flags & sre_parse.SRE_FLAG_IGNORECASE)
+    try:
+        repeats = walk(parsed, False, findings, ignorecase)
+    except Rejected as e:
+        return Verdict(REJECTED, str(e))
+
+    if findings:
+        return Verdict(GUARDED, ", ".join(sorted(findings)),
+                       term_limit(len(pattern), repeats + 1,
+                                  MAX_GUARDED_TERM))
+    # None of the quantifiers overlap, so every place a search starts
+    # at takes at most linear time.
+    return Verdict(SAFE, "", term_limit(len(pattern), 2, MAX_TERM))
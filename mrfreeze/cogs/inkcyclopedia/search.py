@@ -0,0 +1,97 @@
+"""
+Full-text search of the Inkcyclopedia.
+
+The names of all inks are kept in an SQLite FTS5 table, which gives
+ranked results and prefix matching ("diamine ox" finds both Oxblood and
+Oxford Blue) without scanning every ink in Python. The table is rebuilt
+only when the CSV it was built from changes.
+
+Everything in here is blocking, so it should be run in an executor
+rather than on the event loop.
+"""
+import re
+import sqlite3
+from typing import Iterable, List, NamedTuple, Tuple
+
+# Default number of results for a search.
+SEARCH_LIMIT = 10
+
+# Words shorter than this are too short to be used as prefixes.
+MIN_PREFIX = 2
+
+
+class SearchResult(NamedTuple):
+    """A single ink found by a search."""
+
+    name: str
+    url:  str
+
+
+def connect(db_path: str) -> sqlite3.Connection:
+    """Create a connection to the search database."""
+    return sqlite3.connect(db_path, check_same_thread=False)
+
+
+def build_search(conn: sqlite3.Connection, rows: Iterable[Tuple[str, str]],
+                 csv_hash: str) -> bool:
+    """
+    Fill the search table with (name, url) rows.
+
+    Nothing is done if the table was already built from the same CSV.
+    Return True if the table was rebuilt.
+    """
+    with conn:
+        conn.execute("""CREATE TABLE IF NOT EXISTS inks_meta(
+            key         text NOT NULL PRIMARY KEY,
+            value       text NOT NULL);""")
+        built_from = conn.execute(
+            "SELECT value FROM inks_meta WHERE key = 'csv_hash'").fetchone()
+        if built_from is not None and built_from[0] == csv_hash:
+            return False
+
+        conn.execute("DROP TABLE IF EXISTS inks_fts")
+        conn.execute("""CREATE VIRTUAL TABLE inks_fts USING fts5(
+            name,
+            url UNINDEXED,
+            tokenize = 'unicode61 remove_diacritics 2',
+            prefix = '2 3');""")
+        conn.executemany(
+            "INSERT INTO inks_fts(name, url) VALUES(?,?)", rows)
+        conn.execute(
+            "INSERT OR REPLACE INTO inks_meta(key, value) " +
+            "VALUES('csv_hash', ?)", (csv_hash,))
+    return True
+
+
+def build_query(terms: str) -> str:
+    """
+    Turn free text into an FTS5 query.
+
+    Every word has to be present, and each word may also be the
+    beginning of a longer word.
+    """
+    words = re.findall(r"\w+", terms.lower())
+    query = list()
+    for word in words:
+        if len(word) >= MIN_PREFIX:
+            query.append(f'"{word}"*')
+        else:
+            query.append(f'"{word}"')
+    return " ".join(query)
+
+
+def search(conn: sqlite3.Connection, terms: str,
+           limit: int = SEARCH_LIMIT) -> List[SearchResult]:
+    """Find the inks best matching terms, best match first."""
+    query = build_query(terms)
+    if not query:
+        return list()
+
+    try:
+        rows = conn.execute(
+            "SELECT name, url FROM inks_fts WHERE inks_fts MATCH ? " +
+            "ORDER BY rank LIMIT ?", (query, limit)).fetchall()
+    except sqlite3.OperationalError:
+        # The table hasn't been built yet.
+        return list()
+    return [SearchResult(*row) for row in rows]
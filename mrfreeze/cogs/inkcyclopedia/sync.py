@@ -0,0 +1,160 @@
+"""
+Incremental synchronisation of the Inkcyclopedia with Airtable.
+
+The local copy of the Inkcyclopedia is a CSV file in which every ink
+also has its Airtable record ID and modification time. A sync first
+lists only the IDs and modification times of all records, then fetches
+the full rows of records that are new or have changed since last time.
+
+Everything in here is blocking, so it should be run in an executor
+rather than on the event loop.
+"""
+import csv
+import os
+import tempfile
+from typing import Any, Dict, List, NamedTuple, Sequence
+
+from airtable.airtable import Airtable
+
+# Inks with this image are placeholders without a real swab.
+PLACEHOLDER_IMAGE = "N38sjv2.jpg"
+
+# Number of records to ask for per filterByFormula request.
+FETCH_CHUNK = 50
+
+
+class InkRow(NamedTuple):
+    """A single row of the local Inkcyclopedia CSV file."""
+
+    name:      str
+    regex:     str
+    url:       str
+    record_id: str = ""
+    modified:  str = ""
+
+    @property
+    def usable(self) -> bool:
+        """Check if the row has everything it needs to be looked up."""
+        return bool(self.name and self.regex and self.url)
+
+
+class SyncResult(NamedTuple):
+    """Summary of what a sync changed."""
+
+    fetched: int  # Number of records fetched in full
+    removed: int  # Number of records no longer in Airtable
+    total:   int  # Number of usable inks after the sync
+
+    @property
+    def changed(self) -> bool:
+        """Check if the sync changed the local file at all."""
+        return bool(self.fetched or self.removed)
+
+
+def read_rows(path: str, encoding: str) -> List[InkRow]:
+    """Read the local CSV file, returning an empty list if there is none."""
+    if not os.path.isfile(path):
+        return list()
+
+    with open(path, encoding=encoding, newline="") as inkfile:
+        # Files written before syncs were incremental only have three
+        # columns, these rows will simply be fetched again.
+        return [InkRow(*row[:5]) for row in csv.reader(inkfile) if row]
+
+
+def write_rows(path: str, encoding: str, rows: Sequence[InkRow]) -> None:
+    """Write rows to a temporary file, then move it into place."""
+    directory = os.path.dirname(path) or "."
+    handle, temp_path = tempfile.mkstemp(
+        dir=directory, prefix=".inkcyclopedia-", suffix=".csv")
+
+    try:
+        with open(handle, "w", encoding=encoding, newline="") as inkfile:
+            csv.writer(inkfile).writerows(rows)
+            inkfile.flush()
+            os.fsync(inkfile.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+def modified_time(record: Dict[str, Any], modified_field: str) -> str:
+    """Get the modification time of a record, or its creation time."""
+    fields = record.get("fields", dict())
+    return str(fields.get(modified_field, record.get("createdTime", "")))
+
+
+def record_to_row(record: Dict[str, Any], modified_field: str) -> InkRow:
+    """
+    Turn an Airtable record into a row for the CSV file.
+
+    Records which can't be used are still kept (with empty fields) so
+    that they aren't fetched again until they change.
+    """
+    record_id = record["id"]
+    modified = modified_time(record, modified_field)
+    fields = record.get("fields", dict())
+
+    try:
+        name = fields["Ink Name"]
+        regex = fields["RegEx"]
+        url = fields["Inkbot version"]
+    except KeyError:
+        # One of the fields is missing, we can't use this row
+        print(f"Failed to add {fields.get('Ink Name', record_id)}")
+        return InkRow("", "", "", record_id, modified)
+
+    if PLACEHOLDER_IMAGE in url:
+        return InkRow(name, "", "", record_id, modified)
+    return InkRow(name, regex, url, record_id, modified)
+
+
+def fetch_records(airtable: Airtable,
+                  record_ids: Sequence[str]) -> Dict[str, Dict[str, Any]]:
+    """Fetch the full records with the given IDs."""
+    records: Dict[str, Dict[str, Any]] = dict()
+    for start in range(0, len(record_ids), FETCH_CHUNK):
+        chunk = record_ids[start:start + FETCH_CHUNK]
+        formula = ",".join(f"RECORD_ID()='{record}'" for record in chunk)
+        for record in airtable.get_all(formula=f"OR({formula})"):
+            records[record["id"]] = record
+    return records
+
+
+def sync(airtable: Airtable, path: str, encoding: str,
+         modified_field: str) -> SyncResult:
+    """Bring the CSV file at path up to date with Airtable."""
+    current = {row.record_id: row
+               for row in read_rows(path, encoding) if row.record_id}
+
+    listing = airtable.get_all(fields=[modified_field])
+    stamps = [(record["id"], modified_time(record, modified_field))
+              for record in listing]
+    changed = [record_id for (record_id, stamp) in stamps
+               if record_id not in current
+               or current[record_id].modified != stamp]
+
+    if len(changed) > len(stamps) // 2:
+        # Most of it has changed, one big fetch is cheaper.
+        fetched = {record["id"]: record for record in airtable.get_all()}
+    else:
+        fetched = fetch_records(airtable, changed)
+
+    # Keep the Airtable order, it decides which ink wins a lookup.
+    rows: List[InkRow] = list()
+    for (record_id, _) in stamps:
+        if record_id in fetched:
+            rows.append(record_to_row(fetched[record_id], modified_field))
+        elif record_id in current:
+            rows.append(current[record_id])
+
+    listed = {record_id for (record_id, _) in stamps}
+    result = SyncResult(
+        fetched=len(changed),
+        removed=len([record for record in current if record not in listed]),
+        total=len([row for row in rows if row.usable]))
+
+    if result.changed or not os.path.isfile(path):
+        write_rows(path, encoding, rows)
+    return result
@@ -0,0 +1,101 @@
+"""
+Trigram index of ink names, used to suggest inks when a lookup misses.
+
+Every name is split into the overlapping three letter pieces of its words
+("oxblood" gives "  o", " ox", "oxb", "xbl", ...) and each trigram keeps a
+postings list of the inks that contain it. Similarity is the Dice
+coefficient of the trigram sets of the term and the name.
+
+Rather than comparing a term against every ink, the postings lists of
+the term's trigrams are counted: the number of lists an ink shows up in
+is the number of trigrams it shares with the term. Only inks sharing
+enough trigrams to possibly reach the similarity threshold are scored,
+and scoring one only takes the size of its trigram set. Every ink that
+reaches the threshold is found, however common the term's trigrams are.
+"""
+import heapq
+from collections import Counter
+from math import ceil
+from typing import Dict, FrozenSet, List, NamedTuple, Sequence, Set
+
+# Default minimum Dice similarity for a suggestion.
+THRESHOLD = 0.5
+
+# Default number of suggestions.
+SUGGESTIONS = 3
+
+
+class Suggestion(NamedTuple):
+    """An ink name similar to a term, along with how similar it is."""
+
+    name:       str
+    similarity: float
+
+
+def trigrams(text: str) -> FrozenSet[str]:
+    """
+    Get the trigrams of the words in text.
+
+    Words are lower cased, stripped of everything but letters and digits
+    and padded, so short words and the beginnings of words count too.
+    """
+    grams: Set[str] = set()
+    for word in text.lower().split():
+        word = "".join(char for char in word if char.isalnum())
+        if not word:
+            continue
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return frozenset(grams)
+
+
+def min_overlap(size: int, threshold: float) -> int:
+    """Get the fewest shared trigrams needed to reach threshold."""
+    # Dice is 2o / (a + b), which can be at most 2o / (a + o).
+    return max(1, ceil(threshold * size / (2 - threshold)))
+
+
+class TrigramIndex:
+    """Postings lists of the trigrams of a list of names."""
+
+    def __init__(self, names: Sequence[str]) -> None:
+        """Index names, an ink's index is its position in names."""
+        self.names:    Sequence[str] = names
+        self.grams:    List[FrozenSet[str]] = list()
+        self.postings: Dict[str, List[int]] = dict()
+
+        for index, name in enumerate(names):
+            grams = trigrams(name)
+            self.grams.append(grams)
+            for gram in grams:
+                self.postings.setdefault(gram, list()).append(index)
+
+    def __len__(self) -> int:
+        """Get the number of names in the index."""
+        return len(self.grams)
+
+    def suggest(self, term: str, limit: int = SUGGESTIONS,
+                threshold: float = THRESHOLD) -> List[Suggestion]:
+        """Get up to limit names similar to term, most similar first."""
+        grams = trigrams(term)
+        if not grams or limit < 1:
+            return list()
+
+        # How many of the term's trigrams each ink shares with it.
+        counts: Counter = Counter()
+        for gram in grams:
+            counts.update(self.postings.get(gram, ()))
+
+        needed = min_overlap(len(grams), threshold)
+        scored = list()
+        for index, shared in counts.items():
+            if shared < needed:
+                continue
+            similarity = 2 * shared / (len(grams) + len(self.grams[index]))
+            if similarity >= threshold:
+                # Earlier inks win ties, like they do in the matcher.
+                scored.append((similarity, -index))
+
+        best = heapq.nlargest(limit, scored)
+        return [Suggestion(self.names[-index], similarity)
+                for (similarity, index) in best]
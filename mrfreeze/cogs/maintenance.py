@@ -73,3 +73,12 @@ class Maintenance(CogBase):
         if do_restart:
             await ctx.send("Updates retrieved, restarting.")
             os.execl(sys.executable, sys.executable, *sys.argv)
+
+    @discord.ext.commands.command(name="stages", aliases=["pipeline"])
+    @discord.ext.commands.check(checks.is_owner)
+    async def _stages(self, ctx: Context) -> None:
+        """
+        Show how much time each message stage has spent on the event loop.
+        """
+        table: str = self.bot.pipeline.timings_table()
+        await ctx.send(f"```\n{table}\n```")
@@ -1,7 +1,13 @@
+import asyncio          # Used to delay summaries of throttled replies.
 import discord          # Basic discord functionality.
 import re               # Used extensively to parse input.
 from enum import Enum   # Used to denote temperature units.
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+from discord.ext.commands import RoleConverter
+from mrfreeze import checks
 from mrfreeze.cogs.cogbase import CogBase
+from mrfreeze.throttle import Budget, RecentSet, TokenBucket
+from mrfreeze.pipeline import Feature, MessageView, RecentReplies
 
 # Set to true to enable some printouts on how
 # the temperature statement has been parsed.
@@ -16,6 +22,175 @@ class TempUnit(Enum):
     R = "°R"
 
 
+# What a temperature is converted to unless something else is asked for.
+DEFAULT_DESTINATION = {
+    TempUnit.C: TempUnit.F,
+    TempUnit.F: TempUnit.C,
+    TempUnit.K: TempUnit.C,
+    TempUnit.R: TempUnit.F,
+}
+
+# Every unit as an affine transform to kelvin: K = scale * t + offset.
+TO_KELVIN = {
+    TempUnit.C: (1.0, 273.15),
+    TempUnit.F: (5.0 / 9.0, 459.67 * 5.0 / 9.0),
+    TempUnit.K: (1.0, 0.0),
+    TempUnit.R: (5.0 / 9.0, 0.0),
+}
+
+# (scale, offset) converting between any two units in one step,
+# precomputed by going through kelvin.
+CONVERSIONS = {
+    (origin, destination): (
+        origin_scale / destination_scale,
+        (origin_offset - destination_offset) / destination_scale)
+    for origin, (origin_scale, origin_offset) in TO_KELVIN.items()
+    for destination, (destination_scale, destination_offset)
+    in TO_KELVIN.items()
+}
+
+# Anything further from zero than this is just silly.
+MAX_TEMPERATURE = 10000
+
+# Most statements converted in a single message.
+MAX_STATEMENTS = 10
+
+# Unit of "degrees" for members without any of the unit roles, and in DMs.
+DEFAULT_UNIT = TempUnit.C
+
+# Roles deciding what unit "degrees" means when a server hasn't picked
+# its own, by name. The first role a member has wins.
+DEFAULT_UNIT_ROLES = [
+    ("Celsius", TempUnit.C),
+    ("Fahrenheit", TempUnit.F),
+    ("Canada", TempUnit.C),
+    ("Mexico", TempUnit.C),
+    ("North America", TempUnit.F),
+]
+
+# Server setting with the unit roles of a server, as role_id:unit pairs
+# separated by commas in order of priority, e.g. 1234:C,5678:F.
+UNIT_ROLES_SETTING = "temperature_roles"
+
+UnitRoles = List[Tuple[int, TempUnit]]
+
+# Automatic replies allowed per channel unless the server picks its own
+# budget, stored in the server setting as replies/seconds, e.g. 3/60.
+DEFAULT_BUDGET = Budget(3, 60)
+BUDGET_SETTING = "temperature_budget"
+
+# Repeats of a conversion in a channel within this many seconds are ignored.
+DEDUP_WINDOW = 300
+
+# Seconds to wait before summing up replies that were held back, and
+# the most conversions to include in a summary.
+SUMMARY_DELAY = 60
+SUMMARY_LINES = 10
+
+
+def parse_unit_roles(setting: str) -> UnitRoles:
+    """Parse the unit roles server setting, skipping broken entries."""
+    unit_roles = list()
+    for entry in setting.split(","):
+        role_id, _, unit = entry.strip().partition(":")
+        if role_id.isdigit() and unit.strip().upper() in TempUnit.__members__:
+            unit_roles.append((int(role_id), TempUnit[unit.strip().upper()]))
+    return unit_roles
+
+
+def format_unit_roles(unit_roles: UnitRoles) -> str:
+    """Turn unit roles into the server setting."""
+    return ",".join(f"{role_id}:{unit.name}" for (role_id, unit) in unit_roles)
+
+
+def convert(temperature: float, origin: TempUnit,
+            destination: TempUnit) -> float:
+    """Convert a temperature between two units."""
+    scale, offset = CONVERSIONS[(origin, destination)]
+    return temperature * scale + offset
+
+
+class Conversion(NamedTuple):
+    """A temperature statement along with what it converts to."""
+
+    temperature: float
+    origin:      TempUnit
+    destination: TempUnit
+    manual:      bool
+    converted:   float
+    in_celsius:  float
+
+
+# Building blocks of the temperature scanner.
+# A minus sign only counts after whitespace or at the start of the text.
+# The number starts with a plain [-\d] so the regex engine can skip ahead
+# to the next digit or dash instead of trying every position. It can't
+# start in the middle of a run of digits, which would make long runs
+# quadratic.
+NUMBER = r"[-\d](?:(?<=\d)(?<!\d\d)\d*|(?<=-)(?<!\S-)\d+)(?:[,.]\d+)?"
+# Space or ° mandatory for kelvin to avoid
+# collision with k as in thousand.
+CELSIUS = r"°?(?:c|celcius|celsius|civili[sz]ed units?)"
+FAHRENHEIT = r"°?(?:f|fahrenheit|freedom units?)"
+DEGREES = r"°?(?:deg|degrees)"
+KELVIN = r"(?:k|kelvin)"
+RANKINE = r"°?(?:r|rankine)"
+
+# A temperature statement, optionally followed by the unit to convert
+# it to ("20c in f"). Matches end at whitespace or the end of the text
+# without consuming it, so finditer finds statements right after
+# each other.
+TEMPERATURE_SCANNER = re.compile(
+    fr"(?P<number>{NUMBER}) ?" +
+    fr"(?:(?P<C>{CELSIUS})|(?P<F>{FAHRENHEIT})|(?P<K>[ °]{KELVIN})" +
+    fr"|(?P<R>{RANKINE})|(?P<degrees>{DEGREES}))" +
+    r"(?: (?:for|in|as|(?:convert )?to|convert) " +
+    fr"(?:(?P<to_C>{CELSIUS})|(?P<to_F>{FAHRENHEIT})" +
+    fr"|(?P<to_K>°?{KELVIN})|(?P<to_R>{RANKINE})))?" +
+    r"(?=\s|$)",
+    re.IGNORECASE)
+
+
+class TempStatement(NamedTuple):
+    """A temperature found in a message."""
+
+    temperature: float
+    # None when the unit was just "degrees".
+    origin:      Optional[TempUnit]
+    # None unless a unit to convert to was asked for.
+    destination: Optional[TempUnit]
+
+    @property
+    def manual(self) -> bool:
+        """Check if the unit to convert to was asked for."""
+        return self.destination is not None
+
+
+# Scanner groups naming the unit of a statement and the unit to convert to.
+ORIGIN_GROUPS = tuple(unit.name for unit in TempUnit)
+DESTINATION_GROUPS = tuple(f"to_{unit.name}" for unit in TempUnit)
+
+
+def unit_of(groups: Sequence[Optional[str]]) -> Optional[TempUnit]:
+    """Get the unit whose group matched, groups being in TempUnit order."""
+    for unit, group in zip(TempUnit, groups):
+        if group is not None:
+            return unit
+    return None
+
+
+def scan_temperatures(text: str) -> List[TempStatement]:
+    """Find every temperature statement in text, in a single pass."""
+    statements = list()
+    for match in TEMPERATURE_SCANNER.finditer(text):
+        temperature = float(match.group("number").replace(",", "."))
+        statements.append(TempStatement(
+            temperature,
+            unit_of(match.group(*ORIGIN_GROUPS)),
+            unit_of(match.group(*DESTINATION_GROUPS))))
+    return statements
+
+
 def setup(bot):
     """Add the cog to the bot."""
     bot.add_cog(TemperatureConverter(bot))
@@ -25,221 +200,398 @@ class TemperatureConverter(CogBase):
     """How the bot acts when messages are posted."""
     def __init__(self, bot):
         self.bot = bot
+        # Unit roles of each server, by server ID.
+        self.unit_roles: Dict[int, UnitRoles] = dict()
+        # What "degrees" means to each member, by (server ID, member ID).
+        self.member_units: Dict[Tuple[int, int], TempUnit] = dict()
+
+        # Throttling of automatic replies, by server or channel ID.
+        self.budgets:    Dict[int, Budget] = dict()
+        self.buckets:    Dict[int, TokenBucket] = dict()
+        self.recent:     Dict[int, RecentSet] = dict()
+        self.suppressed: Dict[int, List[str]] = dict()
+
+        # Conversions in recent messages and the replies to them, for edits.
+        self.replies: RecentReplies = RecentReplies()
+        self.bot.add_message_stage(
+            "temperature", self.temperature_stage, Feature.TEMPERATURE)
+
+    def cog_unload(self):
+        self.bot.remove_message_stage("temperature")
 
     # Certain events, namely temp, depends on checking for
     # temperature statements in all messages sent to the chat.
-    @CogBase.listener()
-    async def on_message(self, message):
-        # Ignore what all the bots say...
-        if message.author.bot:
-            return
-
+    async def temperature_stage(self, view: MessageView):
         # Look for temperature statements and autoconvert them.
-        ctx = await self.bot.get_context(message)
-        await self.temperatures(ctx)
+        await self.temperatures(view.ctx, view.before)
+
+    async def temperatures(self, ctx, before=None):
+        """
+        Convert every temperature statement in a message in one reply.
+
+        For edited messages, before is the content from before the edit
+        and only statements the edit introduced are converted. If there
+        already is a reply to the message, it's edited instead.
+        """
+        every = self.parse_request(ctx)
+        conversions = every
+        previous = self.replies.get(ctx.message.id)
+        found = frozenset(every)
+
+        if before is not None:
+            if previous is not None:
+                old = previous.items
+            else:
+                old = frozenset(self.parse_request(ctx, before))
+            conversions = [c for c in conversions if c not in old]
+            if not conversions:
+                return
+
+            # Add the new conversions to the reply we already have.
+            if previous is not None and previous.reply is not None:
+                author = ctx.author.mention
+                await previous.reply.edit(content="\n".join(
+                    self.describe(c, author) for c in every))
+                self.replies.put(ctx.message.id, found, previous.reply)
+                return
+
+        conversions = self.throttle(ctx, conversions)
+        if not conversions:
+            if found:
+                self.replies.put(ctx.message.id, found)
+            return
 
-    async def temperatures(self, ctx):
-        # Trailing space is required for matching
-        # temperatures at the end of the message.
         author = ctx.author.mention
+        reply = "\n".join(
+            self.describe(conversion, author) for conversion in conversions)
+
+        # hot/cold thresholds are defined in celsius, one image per reply
+        # so the hottest or coldest statement decides.
+        image = None
+        in_c = [c.in_celsius for c in conversions
+                if abs(c.temperature) <= MAX_TEMPERATURE]
+        if in_c and max(in_c) >= 35:
+            image = "helldog.gif"
+        elif in_c and min(in_c) <= -20:
+            image = "hellacold.gif"
+
+        if image is None:
+            sent = await ctx.channel.send(reply)
+        else:
+            sent = await self.bot.assets.send(ctx.channel, reply, name=image)
+        self.replies.put(ctx.message.id, found, sent)
+
+    def throttle(self, ctx, conversions):
+        """
+        Drop the automatic conversions which shouldn't be replied to now.
+
+        Conversions that were asked for are always kept. Automatic ones
+        are dropped if they were already made in the channel recently,
+        and held back for a summary if the channel is out of budget.
+        """
+        if not conversions:
+            return conversions
+
         channel = ctx.channel
+        recent = self.recent.get(channel.id)
+        if recent is None:
+            recent = self.recent[channel.id] = RecentSet(DEDUP_WINDOW)
+        conversions = [c for c in conversions
+                       if c.manual or not recent.check(c)]
+
+        automatic = [c for c in conversions if not c.manual]
+        if automatic and not self.get_bucket(ctx).take():
+            author = ctx.author.mention
+            self.hold_back(channel, [self.describe(c, author)
+                                     for c in automatic])
+            conversions = [c for c in conversions if c.manual]
+        return conversions
+
+    def get_bucket(self, ctx):
+        """Get the token bucket of the channel of ctx."""
+        bucket = self.buckets.get(ctx.channel.id)
+        if bucket is None:
+            bucket = TokenBucket(self.get_budget(ctx.guild))
+            self.buckets[ctx.channel.id] = bucket
+        return bucket
+
+    def get_budget(self, guild):
+        """Get the budget of automatic replies for a server."""
+        if guild is None:
+            return DEFAULT_BUDGET
+
+        budget = self.budgets.get(guild.id)
+        if budget is None:
+            setting = self.bot.read_server_setting(
+                self.bot, guild, BUDGET_SETTING)
+            budget = (setting and Budget.parse(setting)) or DEFAULT_BUDGET
+            self.budgets[guild.id] = budget
+        return budget
+
+    def hold_back(self, channel, lines):
+        """Save lines for the summary of a channel, starting one if needed."""
+        if channel.id not in self.suppressed:
+            self.suppressed[channel.id] = list()
+            self.bot.loop.create_task(self.summarize(channel))
+        self.suppressed[channel.id].extend(lines)
+
+    async def summarize(self, channel):
+        """Post the conversions held back in a channel after a while."""
+        await asyncio.sleep(SUMMARY_DELAY)
+        lines = self.suppressed.pop(channel.id, list())
+        if not lines:
+            return
+
+        summary = lines[:SUMMARY_LINES]
+        if len(lines) > SUMMARY_LINES:
+            summary.append(f"...and {len(lines) - SUMMARY_LINES} more.")
+        await channel.send("While I was catching my breath:\n" +
+                           "\n".join(summary))
 
-        # Abort if no temperature statement was found.
-        statement = self.parse_request(ctx)
-        if not statement:
+    @discord.ext.commands.command(name="tempbudget", aliases=["tempbudgets"])
+    @discord.ext.commands.check(checks.is_mod)
+    async def tempbudget(self, ctx, budget: str = ""):
+        """
+        Set how many automatic conversions to post per channel.
+
+        Give the budget as replies/seconds, e.g. !tempbudget 3/60.
+        """
+        author = ctx.author.mention
+        guild = ctx.guild
+
+        if not budget:
+            current = self.get_budget(guild)
+            await ctx.send(
+                f"{author} I'll convert temperatures on my own " +
+                f"{current.replies} times every {current.seconds:g} " +
+                "seconds per channel.")
             return
 
+        parsed = Budget.parse(budget)
+        if parsed is None:
+            await ctx.send(f"{author} That's not a budget I understand, " +
+                           f"try something like `{ctx.prefix}tempbudget " +
+                           f"{DEFAULT_BUDGET}`.")
+            return
+
+        self.budgets[guild.id] = parsed
+        for channel in guild.channels:
+            self.buckets.pop(channel.id, None)
+
+        saved = self.bot.write_server_setting(
+            self.bot, guild, BUDGET_SETTING, str(parsed))
+        if saved:
+            await ctx.send(f"{author} The budget is now {parsed}.")
+        else:
+            await ctx.send(f"{author} The budget is now {parsed}, *BUT* " +
+                           "for some reason I was unable to save it, so " +
+                           "it will be reset once I restart.")
+
+    def describe(self, conversion, author):
+        """Get the line of the reply for one conversion."""
         # Check if input is ridiculous.
-        if abs(statement["temperature"]) > 10000:
+        if abs(conversion.temperature) > MAX_TEMPERATURE:
             hotcold = "a bit chilly"
-            if statement["temperature"] > 0:
+            if conversion.temperature > 0:
                 hotcold = "quite warm"
-
-            await channel.send(
-                    f"{author} No matter what unit you put that " +
-                    "in the answer is still gonna be \"{hotcold}\".")
-            return
-
-        # Calculate converted temperature,
-        # see if it's above or equal to dog threshold.
-        if statement["origin"] == TempUnit.C:
-            new_temp = self.celsius_table(
-                statement["temperature"],
-                statement["destination"])
-            in_c = statement["temperature"]
-
-        elif statement["origin"] == TempUnit.F:
-            new_temp = self.fahrenheit_table(
-                statement["temperature"],
-                statement["destination"])
-            in_c = self.fahrenheit_table(statement["temperature"], TempUnit.C)
-
-        elif statement["origin"] == TempUnit.K:
-            new_temp = self.kelvin_table(
-                statement["temperature"],
-                statement["destination"])
-            in_c = self.kelvin_table(statement["temperature"], TempUnit.C)
-
-        elif statement["origin"] == TempUnit.R:
-            new_temp = self.rankine_table(
-                statement["temperature"],
-                statement["destination"])
-            in_c = self.rankine_table(statement["temperature"], TempUnit.C)
-
-        # hot/cold thresholds are defined in celsius
-        image = None
-        if in_c >= 35:
-            image = discord.File("images/helldog.gif")
-        elif in_c <= -20:
-            image = discord.File("images/hellacold.gif")
+            return (f"{author} No matter what unit you put that " +
+                    f"in the answer is still gonna be \"{hotcold}\".")
 
         # old/new_temp contains the temperature values as floats.
-        old_temp = round(statement["temperature"], 2)
-        new_temp = round(new_temp, 2)
+        old_temp = round(conversion.temperature, 2)
+        new_temp = round(conversion.converted, 2)
         # Check if old and new temp are the same temperatures or units.
         no_change = (old_temp == new_temp)
-        same_unit = (statement["origin"] == statement["destination"])
+        same_unit = (conversion.origin == conversion.destination)
         # Get the abbreviations for each temperature unit
-        origin = statement["origin"].value
-        destination = statement["destination"].value
+        origin = conversion.origin.value
+        destination = conversion.destination.value
 
-        # Time for the reply.
         if no_change:
-            if same_unit and statement["manual"]:
-                reply = (f"Did {author} just try to convert {old_temp}" +
-                         f"{origin} to {destination}? :thinking:")
-            elif statement["manual"]:
-                reply = (f"Uh... {old_temp}{origin} is the same in " +
-                         f"{new_temp}{destination} you smud. :angry:")
+            if same_unit and conversion.manual:
+                return (f"Did {author} just try to convert {old_temp}" +
+                        f"{origin} to {destination}? :thinking:")
+            elif conversion.manual:
+                return (f"Uh... {old_temp}{origin} is the same in " +
+                        f"{new_temp}{destination} you smud. :angry:")
             else:
-                reply = (f"Guess what! {old_temp}{origin} is the same as " +
-                         f"{new_temp}{destination}! WOOOW!")
-        else:
-            reply = f"{old_temp}{origin} is around {new_temp}{destination}"
-        await channel.send(reply, file=image)
+                return (f"Guess what! {old_temp}{origin} is the same as " +
+                        f"{new_temp}{destination}! WOOOW!")
+        return f"{old_temp}{origin} is around {new_temp}{destination}"
 
-    def parse_request(self, ctx):
+    def parse_request(self, ctx, content=None):
         """
-        Extract temperature statement from text.
-        If no temperature statement is found returns false.
+        Extract all temperature statements from a message.
 
-        Otherwise returns a dictionary with keys:
-            temperature, origin, destination, manual
+        Returns a list of Conversions, without duplicates and at most
+        MAX_STATEMENTS of them, which is empty if nothing was found.
+        The content of the message is used unless content is given.
         """
-        text = ctx.message.content
-
-        # Space or ° mandatory for kelvin to avoid
-        # collision with k as in thousand.
-        numbers = r"(?:(?:\s|^)-)?\d+(?:[,.]\d+)? ?"
-        celsius = r"°?(?:c|celcius|celsius|civili[sz]ed units?)"
-        fahrenheit = r"°?(?:f|fahrenheit|freedom units?)"
-        degrees = r"°?(?:deg|degrees)"
-        kelvin = r"(?:k|kelvin)"
-        rankine = r"°?(?:r|rankine)"
-        regex = (f"({numbers})(?:({celsius})|({fahrenheit})" +
-                 fr"|([ °]{kelvin})|({rankine})|({degrees}))(?:\s|$)")
-        statement = re.search(regex, text, re.IGNORECASE)
-        if not statement:
-            return False
-
-        result = dict()
-
-        # Determine the origin unit.
-        statement = statement.groups()
-        result["temperature"] = float(statement[0].replace(",", "."))
-        if statement[1]:
-            result["origin"] = TempUnit.C
-        elif statement[2]:
-            result["origin"] = TempUnit.F
-        elif statement[3]:
-            result["origin"] = TempUnit.K
-        elif statement[4]:
-            result["origin"] = TempUnit.R
-
-        # Origin is "degrees", turning it into a real unit.
-        elif statement[5]:
-            if ctx.guild is not None:
-                # Not DMs
-                roles = ctx.author.roles
-                if discord.utils.get(roles, name="Celsius") is not None:
-                    result["origin"] = TempUnit.C
-                elif discord.utils.get(roles, name="Fahrenheit") is not None:
-                    result["origin"] = TempUnit.F
-                elif discord.utils.get(roles, name="Canada") is not None:
-                    result["origin"] = TempUnit.C
-                elif discord.utils.get(roles, name="Mexico") is not None:
-                    result["origin"] = TempUnit.C
-                elif discord.utils.get(roles, name="North America") is not None:
-                    result["origin"] = TempUnit.F
-                else:
-                    # Default is celsius
-                    result["origin"] = TempUnit.C
-            else:
-                # DMs
-                result["origin"] = TempUnit.C
-
-        # Determine destination unit
-        # First we'll look for force conversions
-        no_catch = (fr"(?:(?:{numbers}) ?(?:{celsius}|{fahrenheit}|" +
-                    fr"{degrees}|[ °]{kelvin}|{rankine})) (?:for|in|as" +
-                    fr"|(?:convert )?to|convert)")
-        find_convert = (fr"{no_catch} (?:({celsius})|({fahrenheit})" +
-                        fr"|(°?{kelvin})|({rankine}))(?:\s|$)")
-        conversion = re.search(find_convert, text, re.IGNORECASE)
-
-        if conversion:
-            result["manual"] = True
-            conversion = conversion.groups()
-            if conversion[0]:
-                result["destination"] = TempUnit.C
-            elif conversion[1]:
-                result["destination"] = TempUnit.F
-            elif conversion[2]:
-                result["destination"] = TempUnit.K
-            elif conversion[3]:
-                result["destination"] = TempUnit.R
-        else:
-            result['manual'] = False
-            if result["origin"] == TempUnit.F:
-                result["destination"] = TempUnit.C
-            elif result["origin"] == TempUnit.K:
-                result["destination"] = TempUnit.C
-            elif result["origin"] == TempUnit.C:
-                result["destination"] = TempUnit.F
-            elif result["origin"] == TempUnit.R:
-                result["destination"] = TempUnit.F
+        if content is None:
+            content = ctx.message.content
+
+        conversions = list()
+        degrees = None
+        for statement in scan_temperatures(content):
+            origin = statement.origin
+            # Origin is "degrees", turning it into a real unit.
+            if origin is None:
+                if degrees is None:
+                    degrees = self.degrees_unit(ctx)
+                origin = degrees
+
+            # Determine destination unit, unless it was asked for.
+            destination = statement.destination
+            if destination is None:
+                destination = DEFAULT_DESTINATION[origin]
+
+            conversion = Conversion(
+                temperature=statement.temperature,
+                origin=origin,
+                destination=destination,
+                manual=statement.manual,
+                converted=convert(statement.temperature, origin, destination),
+                in_celsius=convert(statement.temperature, origin, TempUnit.C))
 
             if TEMP_DEBUG:
-                print(statement)
-                print(f"{result['temperature']} {result['origin']} to " +
-                      f"{result['destination']}. Manual: {result['manual']}")
-
-        return result
-
-    def celsius_table(self, temp, dest):
-        if dest == TempUnit.C:
-            return temp
-        elif dest == TempUnit.F:
-            return temp * 9.0 / 5.0 + 32
-        elif dest == TempUnit.K:
-            return temp + 273.15
-        elif dest == TempUnit.R:
-            return (temp + 273.15) * 9.0 / 5.0
-
-    def fahrenheit_table(self, temp, dest):
-        if dest == TempUnit.C:
-            return (temp - 32) * 5.0 / 9.0
-        elif dest == TempUnit.F:
-            return temp
-        elif dest == TempUnit.K:
-            return (temp + 459.67) * 5.0 / 9.0
-        elif dest == TempUnit.R:
-            return temp + 459.67
-
-    def kelvin_table(self, temp, dest):
-        in_celsius = (temp - 273.15)
-        return self.celsius_table(in_celsius, dest)
-
-    def rankine_table(self, temp, dest):
-        in_fahrenheit = (temp - 459.67)
-        return self.fahrenheit_table(in_fahrenheit, dest)
+                print(conversion)
+
+            if conversion not in conversions:
+                conversions.append(conversion)
+            if len(conversions) == MAX_STATEMENTS:
+                break
+
+        return conversions
+
+    def degrees_unit(self, ctx):
+        """Work out what unit someone means by just "degrees"."""
+        if ctx.guild is None:
+            # DMs
+            return DEFAULT_UNIT
+
+        key = (ctx.guild.id, ctx.author.id)
+        unit = self.member_units.get(key)
+        if unit is None:
+            unit = self.resolve_unit(ctx.guild, ctx.author)
+            self.member_units[key] = unit
+        return unit
+
+    def resolve_unit(self, guild, member):
+        """Get the unit of the first unit role member has."""
+        member_roles = {role.id for role in member.roles}
+        for (role_id, unit) in self.get_unit_roles(guild):
+            if role_id in member_roles:
+                return unit
+        return DEFAULT_UNIT
+
+    def get_unit_roles(self, guild):
+        """Get the unit roles of a server, loading them if needed."""
+        unit_roles = self.unit_roles.get(guild.id)
+        if unit_roles is None:
+            setting = self.bot.read_server_setting(
+                self.bot, guild, UNIT_ROLES_SETTING)
+            if setting:
+                unit_roles = parse_unit_roles(setting)
+            else:
+                unit_roles = self.default_unit_roles(guild)
+            self.unit_roles[guild.id] = unit_roles
+        return unit_roles
+
+    def default_unit_roles(self, guild):
+        """Get the unit roles of a server going by DEFAULT_UNIT_ROLES."""
+        return [(role.id, unit)
+                for (name, unit) in DEFAULT_UNIT_ROLES
+                for role in guild.roles if role.name == name]
+
+    def forget_guild(self, guild):
+        """Drop the unit roles and cached members of a server."""
+        self.unit_roles.pop(guild.id, None)
+        self.member_units = {key: unit
+                             for key, unit in self.member_units.items()
+                             if key[0] != guild.id}
+
+    @CogBase.listener()
+    async def on_member_update(self, before, after):
+        if before.roles != after.roles:
+            self.member_units.pop((after.guild.id, after.id), None)
+
+    @CogBase.listener()
+    async def on_member_remove(self, member):
+        self.member_units.pop((member.guild.id, member.id), None)
+
+    @CogBase.listener()
+    async def on_guild_role_create(self, role):
+        # Unit roles picked by name might have changed.
+        self.forget_guild(role.guild)
+
+    @CogBase.listener()
+    async def on_guild_role_update(self, before, after):
+        if before.name != after.name:
+            self.forget_guild(after.guild)
+
+    @CogBase.listener()
+    async def on_guild_role_delete(self, role):
+        self.forget_guild(role.guild)
+
+    @discord.ext.commands.command(name="temproles", aliases=["unitroles"])
+    @discord.ext.commands.check(checks.is_mod)
+    async def temproles(self, ctx, *args):
+        """
+        Pick the roles deciding what unit "degrees" means.
+
+        Give roles and units in order of priority, e.g.
+        !temproles @Celsius C @Fahrenheit F, or reset to go back
+        to the default roles.
+        """
+        author = ctx.author.mention
+        guild = ctx.guild
+
+        if not args:
+            unit_roles = self.get_unit_roles(guild)
+            roles = [(guild.get_role(role_id), unit)
+                     for (role_id, unit) in unit_roles]
+            described = [f"{role.mention} = {unit.value}"
+                         for (role, unit) in roles if role is not None]
+            if described:
+                await ctx.send(f"{author} Degrees mean: " +
+                               ", ".join(described) +
+                               f", otherwise {DEFAULT_UNIT.value}.")
+            else:
+                await ctx.send(f"{author} Degrees always mean " +
+                               f"{DEFAULT_UNIT.value} in here.")
+            return
+
+        if len(args) == 1 and args[0].lower() == "reset":
+            unit_roles = self.default_unit_roles(guild)
+            setting = ""
+        elif len(args) % 2 != 0:
+            await ctx.send(f"{author} Give me a unit for every role, " +
+                           f"like `{ctx.prefix}temproles @Role C`.")
+            return
+        else:
+            unit_roles = list()
+            for (role_arg, unit_arg) in zip(args[::2], args[1::2]):
+                try:
+                    role = await RoleConverter().convert(ctx, role_arg)
+                except discord.ext.commands.BadArgument:
+                    await ctx.send(f"{author} I couldn't find the role " +
+                                   f"{role_arg}.")
+                    return
+                unit = unit_arg.strip("°").upper()
+                if unit not in TempUnit.__members__:
+                    await ctx.send(f"{author} {unit_arg} isn't a unit I " +
+                                   "know, try C, F, K or R.")
+                    return
+                unit_roles.append((role.id, TempUnit[unit]))
+            setting = format_unit_roles(unit_roles)
+
+        saved = self.bot.write_server_setting(
+            self.bot, guild, UNIT_ROLES_SETTING, setting)
+        self.forget_guild(guild)
+        self.unit_roles[guild.id] = unit_roles
+        if saved:
+            await ctx.send(f"{author} Got it, the unit roles have been updated.")
+        else:
+            await ctx.send(f"{author} The unit roles have been updated, " +
+                           "*BUT* for some reason I was unable to save " +
+                           "them, so they will be reset once I restart.")
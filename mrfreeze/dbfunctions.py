@@ -3,18 +3,126 @@ Helper methods  for database interractions.
 
 A simple module containing some helper methods
 for handling interraction with databases.
+
+Connections are long-lived: the bot keeps one per database file in a
+ConnectionManager, instead of opening a new one for every query.
 """
 import datetime
 import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
 
 from mrfreeze import colors
 
+# Set on every new connection. WAL lets readers and the writer work at
+# the same time, and with WAL synchronous=NORMAL is still safe from
+# corruption while only syncing at checkpoints.
+PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA foreign_keys = ON",
+    "PRAGMA busy_timeout = 5000",
+    "PRAGMA temp_store = MEMORY",
+)
+
+# Number of prepared statements kept per connection.
+STATEMENT_CACHE = 256
+
+
+class ConnectionManager:
+    """
+    One long-lived connection per database file.
+
+    Connections are opened the first time they're asked for and kept
+    until close() is called. Prepared statements are cached by their
+    SQL, so queries using placeholders are only compiled once.
+    """
+
+    def __init__(self, prefix: str) -> None:
+        """Manage the databases in the directory prefix."""
+        self.prefix = prefix
+        self.connections: Dict[str, sqlite3.Connection] = dict()
+        self.savepoints: Dict[str, int] = dict()
+        self.lock = threading.Lock()
+
+    def path(self, dbname: str) -> str:
+        """Get the path of a database file."""
+        return f"{self.prefix}/{dbname}.db"
+
+    def connect(self, dbname: str) -> sqlite3.Connection:
+        """Get the connection to a database, opening it the first time."""
+        conn = self.connections.get(dbname)
+        if conn is not None:
+            return conn
+
+        with self.lock:
+            conn = self.connections.get(dbname)
+            if conn is None:
+                conn = sqlite3.connect(
+                    self.path(dbname),
+                    cached_statements=STATEMENT_CACHE,
+                    check_same_thread=False)
+                for pragma in PRAGMAS:
+                    conn.execute(pragma)
+                self.connections[dbname] = conn
+        return conn
+
+    @contextmanager
+    def transaction(self, dbname: str,
+                    immediate: bool = True) -> Iterator[sqlite3.Connection]:
+        """
+        Run the block in a transaction, committed unless it raises.
+
+        An immediate transaction takes the write lock right away, so a
+        read followed by a write can't be raced by another writer.
+        Transactions inside transactions become savepoints.
+        """
+        conn = self.connect(dbname)
+        if conn.in_transaction:
+            depth = self.savepoints.get(dbname, 0) + 1
+            self.savepoints[dbname] = depth
+            savepoint = f"nested_{depth}"
+            conn.execute(f"SAVEPOINT {savepoint}")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute(f"ROLLBACK TO {savepoint}")
+                conn.execute(f"RELEASE {savepoint}")
+                raise
+            else:
+                conn.execute(f"RELEASE {savepoint}")
+            finally:
+                self.savepoints[dbname] = depth - 1
+            return
+
+        conn.execute("BEGIN IMMEDIATE" if immediate else "BEGIN")
+        try:
+            yield conn
+        except BaseException:
+            conn.rollback()
+            raise
+        else:
+            conn.commit()
+
+    def close(self, dbname: Optional[str] = None) -> None:
+        """Close the connection to a database, or to all of them."""
+        with self.lock:
+            names = list(self.connections) if dbname is None else [dbname]
+            for name in names:
+                conn = self.connections.pop(name, None)
+                if conn is not None:
+                    conn.close()
+
 
 def db_connect(bot, dbname):
-    """Create a connection to a database."""
-    db_file = f"{bot.db_prefix}/{dbname}.db"
-    conn = sqlite3.connect(db_file)
-    return conn
+    """Get the connection to a database, it's shared so don't close it."""
+    return bot.databases.connect(dbname)
+
+
+def db_transaction(bot, dbname, immediate=True):
+    """Run a with block in a transaction on a database."""
+    return bot.databases.transaction(dbname, immediate)
 
 
 def db_create(bot, dbname, tables, comment=None):
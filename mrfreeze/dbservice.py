@@ -0,0 +1,128 @@
+"""
+Asynchronous access to the databases of the bot.
+
+SQLite is blocking, and a slow disk or a big table would hold up the
+event loop (and with it the gateway heartbeat). Every database gets a
+DatabaseService instead: a single worker thread running the queries
+one after the other on the long-lived connection of that database,
+which coroutines await.
+
+At most maxsize jobs may be queued for a database at once. Beyond that
+callers wait for a free slot before their job is even handed to the
+worker, so a flood of queries slows down the ones sending them rather
+than piling up without bound.
+"""
+import asyncio
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Sequence
+
+from mrfreeze.dbfunctions import ConnectionManager
+
+# Default number of jobs that may be queued for a database at once.
+QUEUE_SIZE = 64
+
+
+def fetchall(conn: sqlite3.Connection, sql: str,
+             parameters: Sequence[Any]) -> List[tuple]:
+    """Run a query and get all of its rows."""
+    return conn.execute(sql, parameters).fetchall()
+
+
+def execute(conn: sqlite3.Connection, sql: str,
+            parameters: Sequence[Any]) -> int:
+    """Run a statement and get the number of rows it changed."""
+    return conn.execute(sql, parameters).rowcount
+
+
+def executemany(conn: sqlite3.Connection, sql: str,
+                parameters: Iterable[Sequence[Any]]) -> int:
+    """Run a statement for each set of parameters."""
+    return conn.executemany(sql, parameters).rowcount
+
+
+class DatabaseService:
+    """A worker thread running the queries of one database."""
+
+    def __init__(self, databases: ConnectionManager, dbname: str,
+                 maxsize: int = QUEUE_SIZE) -> None:
+        """Create the worker of dbname, the connection comes from databases."""
+        self.databases = databases
+        self.dbname = dbname
+        self.executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix=f"db-{dbname}")
+        self.slots = asyncio.Semaphore(maxsize)
+        # Jobs handed to the worker and not finished yet.
+        self.queued = 0
+
+    async def submit(self, job: Callable[..., Any], *args: Any) -> Any:
+        """Wait for a free slot, then run job(*args) on the worker."""
+        async with self.slots:
+            self.queued += 1
+            try:
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(self.executor, job, *args)
+            finally:
+                self.queued -= 1
+
+    def run(self, function: Callable[..., Any], args: Sequence[Any]) -> Any:
+        """Run a job, this is called on the worker thread."""
+        return function(self.databases.connect(self.dbname), *args)
+
+    def run_transaction(self, function: Callable[..., Any],
+                        args: Sequence[Any]) -> Any:
+        """Run a job in a transaction, this is called on the worker thread."""
+        with self.databases.transaction(self.dbname) as conn:
+            return function(conn, *args)
+
+    async def call(self, function: Callable[..., Any], *args: Any) -> Any:
+        """Run function(connection, *args) on the worker, get its result."""
+        return await self.submit(self.run, function, args)
+
+    async def transaction(self, function: Callable[..., Any],
+                          *args: Any) -> Any:
+        """Run function(connection, *args) in a transaction on the worker."""
+        return await self.submit(self.run_transaction, function, args)
+
+    async def query(self, sql: str,
+                    parameters: Sequence[Any] = ()) -> List[tuple]:
+        """Get all rows of a query."""
+        return await self.call(fetchall, sql, parameters)
+
+    async def execute(self, sql: str, parameters: Sequence[Any] = ()) -> int:
+        """Run a statement in a transaction, get the number of changed rows."""
+        return await self.transaction(execute, sql, parameters)
+
+    async def executemany(self, sql: str,
+                          parameters: Iterable[Sequence[Any]]) -> int:
+        """Run a statement for every set of parameters in one transaction."""
+        return await self.transaction(executemany, sql, list(parameters))
+
+    def close(self) -> None:
+        """Finish the queued jobs and stop the worker."""
+        self.executor.shutdown(wait=True)
+
+
+class DatabaseServices:
+    """The DatabaseService of each database, started when first used."""
+
+    def __init__(self, databases: ConnectionManager,
+                 maxsize: int = QUEUE_SIZE) -> None:
+        """Create services for the databases managed by databases."""
+        self.databases = databases
+        self.maxsize = maxsize
+        self.services: Dict[str, DatabaseService] = dict()
+
+    def __getitem__(self, dbname: str) -> DatabaseService:
+        """Get the service of a database."""
+        service = self.services.get(dbname)
+        if service is None:
+            service = DatabaseService(self.databases, dbname, self.maxsize)
+            self.services[dbname] = service
+        return service
+
+    def close(self) -> None:
+        """Stop every worker, after they've finished their queued jobs."""
+        for service in self.services.values():
+            service.close()
+        self.services.clear()
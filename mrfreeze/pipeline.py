@@ -0,0 +1,279 @@
+"""
+Shared per-message dispatch pipeline.
+
+Instead of every cog listening to on_message and building its own
+context, the bot builds the context once per message and hands the
+same immutable MessageView to every registered stage. Each stage is
+timed so we can see which one is hogging the event loop. Only the time
+a stage actually runs on the loop is counted: time spent awaiting I/O,
+or running other stages in the meantime, is not.
+
+Before any stage runs the message is pre-classified in a single pass,
+and stages which can't possibly apply to the message are skipped.
+
+Edited messages go through the same stages, with the content from before
+the edit in the view. Stages can remember what they replied to in a
+RecentReplies cache, so they only act on what the edit introduced and
+can edit their earlier reply instead of sending a new one.
+"""
+import asyncio
+import re
+import traceback
+import types
+from collections import OrderedDict
+from enum import Flag, auto
+from time import perf_counter
+from typing import Any, Awaitable, Callable, Coroutine, Dict, FrozenSet
+from typing import Generator, Hashable, NamedTuple, Optional, Tuple, Union
+
+from discord import Guild, Member, Message, User
+from discord.abc import Messageable
+from discord.ext.commands.context import Context
+
+from mrfreeze import colors
+
+
+class Feature(Flag):
+    """Things a message might trigger, as found by classify()."""
+
+    NONE = 0
+    TEMPERATURE = auto()  # A digit followed by something unit-like
+    INK = auto()          # A {bracketed term}
+    COMMAND = auto()      # Starts with a command prefix
+    MENTION = auto()      # Mentions the bot
+
+
+# One alternation covering every feature found inside the message.
+# These are deliberately loose, they only have to rule messages out.
+# The temperature scanner allows up to two spaces before a unit
+# ("20  k"), so this has to as well.
+feature_scan = re.compile(
+    r"(?P<temperature>\d {0,2}[°cdfkr])" +
+    r"|(?P<ink>[{][\w\-\s]+[}])" +
+    r"|<@!?(?P<mention>\d+)>",
+    re.IGNORECASE)
+
+
+def classify(content: str, prefixes: Optional[Tuple[str, ...]] = None,
+             bot_id: Optional[int] = None) -> Feature:
+    """
+    Tag a message with the features it might trigger.
+
+    If prefixes is None the prefix can't be known in advance, so every
+    message is considered a possible command.
+    """
+    features = Feature.NONE
+    if prefixes is None or content.startswith(prefixes):
+        features |= Feature.COMMAND
+
+    for match in feature_scan.finditer(content):
+        kind = match.lastgroup
+        if kind == "temperature":
+            features |= Feature.TEMPERATURE
+        elif kind == "ink":
+            features |= Feature.INK
+        elif bot_id is not None and int(match.group("mention")) == bot_id:
+            features |= Feature.MENTION
+
+    return features
+
+
+class MessageView(NamedTuple):
+    """Read-only view of a message shared between all stages."""
+
+    message:  Message
+    ctx:      Context
+    content:  str
+    author:   Union[Member, User]
+    channel:  Messageable
+    guild:    Optional[Guild]
+    features: Feature
+    # Content before the edit, None unless the message was edited.
+    before:   Optional[str] = None
+
+    @property
+    def edited(self) -> bool:
+        """Check if this view is of an edited message."""
+        return self.before is not None
+
+
+Stage = Callable[[MessageView], Awaitable[None]]
+
+
+class StageEntry(NamedTuple):
+    """A registered stage and the features it needs to be run."""
+
+    stage:    Stage
+    features: Optional[Feature]
+
+
+class StageTiming:
+    """Accumulated timings for a single stage."""
+
+    def __init__(self) -> None:
+        """Initialize an empty set of timings."""
+        self.calls: int = 0
+        self.skipped: int = 0
+        self.total: float = 0.0
+        self.worst: float = 0.0
+
+    def record(self, elapsed: float) -> None:
+        """Add the time (in seconds) a single run spent on the loop."""
+        self.calls += 1
+        self.total += elapsed
+        if elapsed > self.worst:
+            self.worst = elapsed
+
+    @property
+    def mean(self) -> float:
+        """Get the average run time in seconds."""
+        if self.calls == 0:
+            return 0.0
+        return self.total / self.calls
+
+
+class LoopTimer:
+    """Time spent by a coroutine on the event loop, between its awaits."""
+
+    def __init__(self) -> None:
+        """Initialize the timer at zero."""
+        self.busy: float = 0.0
+
+    @types.coroutine
+    def run(self, coro: Coroutine[Any, Any, Any]
+            ) -> Generator[Any, Any, Any]:
+        """
+        Await coro, timing each step it runs before it suspends.
+
+        Whatever coro yields (the futures it waits for) is passed up to
+        the task running us, and whatever the task sends or throws back
+        is passed down to coro.
+        """
+        value: Any = None
+        error: Optional[BaseException] = None
+        while True:
+            start = perf_counter()
+            try:
+                if error is None:
+                    waiting_for = coro.send(value)
+                else:
+                    waiting_for = coro.throw(error)
+            except StopIteration as stop:
+                return stop.value
+            finally:
+                self.busy += perf_counter() - start
+
+            value, error = None, None
+            try:
+                value = yield waiting_for
+            except BaseException as thrown:
+                error = thrown
+
+
+class MessagePipeline:
+    """Ordered collection of message stages with per-stage timing."""
+
+    def __init__(self) -> None:
+        """Initialize an empty pipeline."""
+        self.stages:  Dict[str, StageEntry] = dict()
+        self.timings: Dict[str, StageTiming] = dict()
+
+    def add_stage(self, name: str, stage: Stage,
+                  features: Optional[Feature] = None) -> None:
+        """
+        Register a stage, replacing any previous stage with that name.
+
+        If features is given, the stage is only run for messages
+        tagged with at least one of those features.
+        """
+        self.stages[name] = StageEntry(stage, features)
+        self.timings.setdefault(name, StageTiming())
+
+    def remove_stage(self, name: str) -> None:
+        """Unregister a stage. Its timings are kept for reference."""
+        self.stages.pop(name, None)
+
+    @staticmethod
+    def build_view(message: Message, ctx: Context,
+                   features: Feature = Feature.NONE,
+                   before: Optional[str] = None) -> MessageView:
+        """Create the view shared by all stages for one message."""
+        return MessageView(
+            message=message,
+            ctx=ctx,
+            content=message.content,
+            author=message.author,
+            channel=message.channel,
+            guild=message.guild,
+            features=features,
+            before=before)
+
+    async def dispatch(self, view: MessageView) -> None:
+        """Run all applicable stages concurrently on a message view."""
+        runs = list()
+        # Copy the stages so cogs can be (un)loaded while we're running.
+        for name, entry in list(self.stages.items()):
+            if entry.features is None or entry.features & view.features:
+                runs.append(self.run_stage(name, entry.stage, view))
+            else:
+                self.timings.setdefault(name, StageTiming())
+                self.timings[name].skipped += 1
+
+        if runs:
+            await asyncio.gather(*runs)
+
+    async def run_stage(self, name: str, stage: Stage,
+                        view: MessageView) -> None:
+        """Run a single stage, timing it and logging any exceptions."""
+        timer = LoopTimer()
+        try:
+            await timer.run(stage(view))
+        except Exception:
+            print(f"{colors.RED_B}Message stage {colors.YELLOW}{name} " +
+                  f"{colors.RED_B}raised an exception:{colors.RESET}")
+            traceback.print_exc()
+        finally:
+            self.timings.setdefault(name, StageTiming())
+            self.timings[name].record(timer.busy)
+
+    def timings_table(self) -> str:
+        """Format the stage timings as a plain text table."""
+        rows = [f"{'stage':<16}{'calls':>8}{'skipped':>9}" +
+                f"{'mean ms':>10}{'max ms':>10}"]
+        for name, timing in sorted(self.timings.items()):
+            rows.append(
+                f"{name:<16}{timing.calls:>8}{timing.skipped:>9}" +
+                f"{timing.mean * 1000:>10.3f}{timing.worst * 1000:>10.3f}")
+        return "\n".join(rows)
+
+
+class Fingerprint(NamedTuple):
+    """What a stage found in a message, and how it replied."""
+
+    items: FrozenSet[Hashable]
+    reply: Optional[Message]
+
+
+class RecentReplies:
+    """Bounded cache of the fingerprints of recent messages, by ID."""
+
+    def __init__(self, maxsize: int = 512) -> None:
+        """Create an empty cache holding at most maxsize messages."""
+        self.maxsize = maxsize
+        self.fingerprints: "OrderedDict[int, Fingerprint]" = OrderedDict()
+
+    def __len__(self) -> int:
+        """Get the number of messages remembered."""
+        return len(self.fingerprints)
+
+    def get(self, message_id: int) -> Optional[Fingerprint]:
+        """Get the fingerprint of a message, if it's still remembered."""
+        return self.fingerprints.get(message_id)
+
+    def put(self, message_id: int, items: FrozenSet[Hashable],
+            reply: Optional[Message] = None) -> None:
+        """Remember the fingerprint of a message."""
+        self.fingerprints[message_id] = Fingerprint(items, reply)
+        self.fingerprints.move_to_end(message_id)
+        if len(self.fingerprints) > self.maxsize:
+            self.fingerprints.popitem(last=False)
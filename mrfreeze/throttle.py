@@ -0,0 +1,100 @@
+"""
+Building blocks for throttling automatic replies.
+
+TokenBucket limits how often something may happen, while still allowing
+short bursts. RecentSet remembers what has been seen within a sliding
+window, so repeats can be dropped.
+
+Times are in seconds from time.monotonic() unless given explicitly.
+"""
+from time import monotonic
+from typing import Dict, Hashable, NamedTuple, Optional
+
+
+class Budget(NamedTuple):
+    """How many replies may be sent per how many seconds."""
+
+    replies: int
+    seconds: float
+
+    @classmethod
+    def parse(cls, setting: str) -> Optional["Budget"]:
+        """Parse a budget like 3/60, returning None if it's broken."""
+        replies, _, seconds = setting.strip().partition("/")
+        try:
+            budget = cls(int(replies), float(seconds))
+        except ValueError:
+            return None
+        if budget.replies < 1 or budget.seconds <= 0:
+            return None
+        return budget
+
+    def __str__(self) -> str:
+        """Format the budget the way parse() reads it."""
+        return f"{self.replies}/{self.seconds:g}"
+
+
+class TokenBucket:
+    """
+    A bucket of tokens, refilled at a steady rate.
+
+    Up to budget.replies tokens fit in the bucket and a new one is added
+    every budget.seconds / budget.replies seconds.
+    """
+
+    def __init__(self, budget: Budget, now: Optional[float] = None) -> None:
+        """Create a full bucket."""
+        self.budget = budget
+        self.tokens = float(budget.replies)
+        self.updated = monotonic() if now is None else now
+
+    def take(self, now: Optional[float] = None) -> bool:
+        """Take a token if there is one, return True if there was."""
+        now = monotonic() if now is None else now
+        rate = self.budget.replies / self.budget.seconds
+        self.tokens = min(float(self.budget.replies),
+                          self.tokens + (now - self.updated) * rate)
+        self.updated = now
+
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+
+class RecentSet:
+    """Things seen within the last window seconds."""
+
+    def __init__(self, window: float) -> None:
+        """Create an empty set with a window of window seconds."""
+        self.window = window
+        self.seen: Dict[Hashable, float] = dict()
+        self.expired = monotonic()
+
+    def __len__(self) -> int:
+        """Get the number of things remembered, including stale ones."""
+        return len(self.seen)
+
+    def check(self, item: Hashable, now: Optional[float] = None) -> bool:
+        """
+        Remember item, return True if it was already seen in the window.
+
+        Seeing a repeat doesn't extend the window, so something repeated
+        forever still gets through once per window.
+        """
+        now = monotonic() if now is None else now
+        if now - self.expired >= self.window:
+            self.expire(now)
+
+        seen = self.seen.get(item)
+        if seen is not None and now - seen < self.window:
+            return True
+        self.seen[item] = now
+        return False
+
+    def expire(self, now: Optional[float] = None) -> None:
+        """Forget everything seen before the window."""
+        now = monotonic() if now is None else now
+        self.expired = now
+        self.seen = {item: seen for item, seen in self.seen.items()
+                     if now - seen < self.window}
@@ -1,6 +1,125 @@
 """Module for converting text to timedelta objects and vice versa."""
 import datetime
+import functools
 import re
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence
+from typing import Tuple, Union
+
+
+# One token per number and unit, e.g. "2 days", "1.5h" or the two tokens
+# of "1h30m". The unit has to end where the letters do, so "m" can't
+# steal the start of "months". Numbers only start where a run of digits
+# does, trying every digit of a long run makes the scan quadratic.
+DURATION_TOKEN = re.compile(
+    r"(-?(?<!\d)\d+(?:\.\d+)?) ?(?:" +
+    r"(?P<seconds>seconds?|secs?|s)" +
+    r"|(?P<minutes>minutes?|mins?|m)" +
+    r"|(?P<hours>hours?|hrs?|h)" +
+    r"|(?P<days>days?|d)" +
+    r"|(?P<weeks>weeks?|w)" +
+    r"|(?P<months>months?|mnth?s?|mons?)" +
+    r"|(?P<years>years?|yrs?|y))(?![a-z])",
+    re.IGNORECASE)
+
+Number = Union[int, float]
+
+
+class Duration(NamedTuple):
+    """
+    A length of time as written, e.g. 1 year and 2 hours.
+
+    Months and years are turned into 30 and 365 days respectively
+    when converted to a timedelta.
+    """
+
+    seconds: Number = 0
+    minutes: Number = 0
+    hours:   Number = 0
+    days:    Number = 0
+    weeks:   Number = 0
+    months:  Number = 0
+    years:   Number = 0
+
+    @property
+    def empty(self) -> bool:
+        """Check if the duration adds up to nothing."""
+        return self.total_seconds == 0
+
+    @property
+    def total_seconds(self) -> float:
+        """Get the length of the duration in seconds."""
+        days = self.days + self.weeks * 7 + self.months * 30 + \
+            self.years * 365
+        return (self.seconds + self.minutes * 60 + self.hours * 3600 +
+                days * 86400)
+
+    @property
+    def timedelta(self) -> datetime.timedelta:
+        """Get the duration as a timedelta, may raise OverflowError."""
+        return datetime.timedelta(
+            weeks=self.weeks,
+            days=self.days + self.months * 30 + self.years * 365,
+            hours=self.hours,
+            minutes=self.minutes,
+            seconds=self.seconds)
+
+    def add(self, **units: Number) -> "Duration":
+        """Get a new duration with units added, e.g. add(weeks=1)."""
+        return self._replace(
+            **{unit: getattr(self, unit) + value
+               for unit, value in units.items()})
+
+    def span(self, start: Optional[datetime.datetime] = None
+             ) -> Tuple[Optional[datetime.timedelta],
+                        Optional[datetime.datetime]]:
+        """
+        Get the duration as a timedelta and the time it ends.
+
+        The end is counted from start, or from now. Durations which don't
+        fit in a datetime end at datetime.max, and empty durations give
+        (None, None).
+        """
+        if start is None:
+            start = datetime.datetime.now()
+
+        try:
+            add_time = self.timedelta
+            end_date = start + add_time
+        except OverflowError:
+            # If overflowing, just set the end_date to maximum.
+            end_date = datetime.datetime.max
+            add_time = end_date - start
+
+        if end_date == start:
+            return None, None
+        return add_time, end_date
+
+
+@functools.lru_cache(maxsize=256)
+def parse_args(args: Tuple[str, ...]) -> Duration:
+    """Add up all time expressions in args, in a single pass."""
+    units: Dict[str, Number] = dict()
+    for match in DURATION_TOKEN.finditer(" ".join(args)):
+        number = match.group(1)
+        value = float(number) if "." in number else int(number)
+        units[match.lastgroup] = units.get(match.lastgroup, 0) + value
+    return Duration(**units)
+
+
+def parse_duration(args: Sequence[str],
+                   fallback_minutes: bool = True) -> Duration:
+    """
+    Extract a duration from a set of arguments.
+
+    If no time expressions are found and fallback_minutes is set, all
+    plain numbers are assumed to be minutes.
+    """
+    args = tuple(args)
+    duration = parse_args(args)
+    if duration.empty and fallback_minutes:
+        duration = Duration(
+            minutes=sum(int(arg) for arg in args if arg.isnumeric()))
+    return duration
 
 
 def extract_time(args, fallback_minutes=True):
@@ -10,131 +129,62 @@ def extract_time(args, fallback_minutes=True):
     If time expressions are not found, assume all digits refer to minutes.
     Return a timedelta and an end time if successful, otherwise (None, None).
     """
-    # Create regular expression
-    seconds = r"seconds?|secs?|s[, ]"
-    minutes = r"minutes?|mins?|m[, ]"
-    hours = r"hours?|hrs?|h[, ]"
-    days = r"days?|d[, ]"
-    weeks = r"weeks?|w[, ]"
-    months = r"months?|mnth?s?|mons?"
-    years = r"years?|yrs?|y[, ]"
-    find_time = (fr"(-?\d+) ?(({seconds})|({minutes})|({hours})" +
-                 fr"|({days})|({weeks})|({months})|({years}))")
-
-    regex_output = re.findall(
-            find_time,       # Use our newly created regex.
-            " ".join(args),  # Search through the arguments.
-            re.IGNORECASE)   # Ignore case when applying the expression.
-
-    # Sum up all hits for the different time units
-    time_dict = {
-        "seconds": sum([int(row[0]) for row in regex_output if row[2]]),
-        "minutes": sum([int(row[0]) for row in regex_output if row[3]]),
-        "hours": sum([int(row[0]) for row in regex_output if row[4]]),
-        "days": sum([int(row[0]) for row in regex_output if row[5]]),
-        "weeks": sum([int(row[0]) for row in regex_output if row[6]]),
-        "months": sum([int(row[0]) for row in regex_output if row[7]]),
-        "years": sum([int(row[0]) for row in regex_output if row[8]]),
-    }
-
-    # Create a new datetime object based on these numbers.
-    # Months and years are converted to 30 and 365 days respectively.
-    time_dict["days"] += ((time_dict["months"] * 30) +
-                          (time_dict["years"] * 365))
-    current_time = datetime.datetime.now()
-
-    try:
-        add_time = datetime.timedelta(
-            weeks=time_dict["weeks"],
-            days=time_dict["days"],
-            hours=time_dict["hours"],
-            minutes=time_dict["minutes"],
-            seconds=time_dict["seconds"])
-        end_date = current_time + add_time
-
-        # If nothing was found, assume all numbers are minutes.
-        if (end_date == current_time) and fallback_minutes:
-            no_minutes = sum([int(arg) for arg in args if arg.isnumeric()])
-            add_time = datetime.timedelta(minutes=no_minutes)
-            end_date = current_time + add_time
-
-    except OverflowError:
-        # If overflowing, just set the end_date to maximum.
-        end_date = datetime.datetime.max
-        add_time = end_date - current_time
-
-    # Return None if current date and end date are different.
-    if end_date != current_time:
-        return add_time, end_date
-    else:
-        return None, None
+    return parse_duration(args, fallback_minutes).span()
+
+
+# Units of a humanized timedelta, largest first.
+UNIT_NAMES = ("year", "month", "week", "day", "hour", "minute", "second")
+
+Units = Tuple[int, int, int, int, int, int, int]
+
+
+def decompose(days: int, seconds: int, microseconds: int = 0) -> Units:
+    """
+    Split the parts of a timedelta into (years, months, ..., seconds).
+
+    Years and months are counted as 365 and 30 days respectively.
+    """
+    years, days = divmod(days, 365)
+    months, days = divmod(days, 30)
+    weeks, days = divmod(days, 7)
+    hours, seconds = divmod(seconds, 3600)
+    minutes, seconds = divmod(seconds, 60)
+    seconds = round(seconds + microseconds / 1000000)
+    return (years, months, weeks, days, hours, minutes, seconds)
+
+
+@functools.lru_cache(maxsize=1024)
+def format_units(units: Units) -> str:
+    """Turn units from decompose() into e.g. '1 day, 2 hours and 1 second'."""
+    parts = list()
+    for name, value in zip(UNIT_NAMES, units):
+        if value > 0:
+            parts.append(f"{value} {name}" if value == 1 else
+                         f"{value} {name}s")
+
+    if len(parts) < 2:
+        return "".join(parts)
+    return f"{', '.join(parts[:-1])} and {parts[-1]}"
+
+
+def parse_timedeltas(time_deltas: Iterable[Optional[datetime.timedelta]]
+                     ) -> List[str]:
+    """
+    Convert many timedelta objects to strings at once.
+
+    Each one is split into units with divmod and the units are formatted
+    through a cache, since mute lengths tend to repeat. None becomes
+    'an eternity'.
+    """
+    return [
+        "an eternity" if time_delta is None else format_units(decompose(
+            time_delta.days, time_delta.seconds, time_delta.microseconds))
+        for time_delta in time_deltas
+    ]
 
 
 def parse_timedelta(time_delta):
     """Convert a timedelta object to a string such as '1 day, 2 hours[...]'."""
     # This function takes a time delta as it's argument and outputs
     # a string such as "1 days, 2 hours, 3 minutes and 4 seconds".
-
-    if time_delta is None:
-        return "an eternity"
-
-    # Time delta only gives us days and seconds, we have to calculate
-    # hours and minutes ourselves.
-    days = time_delta.days
-    seconds = time_delta.seconds
-    microseconds = time_delta.microseconds
-
-    # Some simple calculations. Weeks are the last whole number we can get from
-    # days/7 i.e. int(days/7), then weeks*7 are subtracted from the remanining
-    # days and so on and so on for hours and minutes.
-    years = int(days / 365)
-    days %= 365
-
-    months = int(days / 30)
-    days %= 30
-
-    weeks = int(days / 7)
-    days %= 7
-
-    hours = int(seconds / 3600)
-    seconds %= 3600
-
-    minutes = int(seconds / 60)
-    seconds = round((seconds % 60 + microseconds / 1000000))
-
-    time_str = ""
-    size_order = (
-        ("year", years), ("month", months),
-        ("week", weeks), ("day", days),
-        ("hour", hours), ("minute", minutes),
-        ("second", seconds)
-    )
-
-    for value in range(len(size_order)):
-        # Number of trailing values are used to know if we should
-        # add an 'and' after the value.
-        trailing_values = 0
-
-        # Checking that this isn't the last value.
-        if value != (len(size_order) - 1):
-
-            # Going through all trailing values and
-            # checking which are non-zero.
-            for i in size_order[value+1:]:
-                if i[1] > 0:
-                    trailing_values += 1
-
-        # Adding the value to the string if it's more than zero.
-        if size_order[value][1] > 0:
-            if size_order[value][1] == 1:
-                time_str += f"{size_order[value][1]} {size_order[value][0]}"
-            else:
-                time_str += f"{size_order[value][1]} {size_order[value][0]}s"
-
-            if trailing_values == 0:
-                pass
-            elif trailing_values == 1:
-                time_str += " and "
-            else:
-                time_str += ", "
-    return time_str
+    return parse_timedeltas((time_delta,))[0]
@@ -0,0 +1,7 @@
+"""
+Benchmarks for the hot paths of the bot.
+
+These are not run as part of the unit tests. Run the whole suite and
+compare it to the stored baseline with `python -m tests.benchmarks`, or
+a single comparison with e.g. `python -m tests.benchmarks.bench_ink_matcher`.
+"""
@@ -0,0 +1,6 @@
+"""Run the benchmark suite, see suite.py."""
+import sys
+
+from tests.benchmarks.suite import main
+
+sys.exit(main())
@@ -0,0 +1,45 @@
+"""Compare the combined ink matcher with looping over every ink."""
+
+import re
+import timeit
+from typing import List, Optional
+
+from mrfreeze.cogs.inkcyclopedia.matcher import InkMatcher, InkyTuple
+from tests.benchmarks import corpora
+
+
+def catalogue(size: int, seed: int = 1) -> List[InkyTuple]:
+    """Create a reproducible catalogue of compiled synthetic inks."""
+    return [InkyTuple(name, url, re.compile(regex, re.IGNORECASE))
+            for (name, url, regex) in corpora.ink_rows(size, seed)]
+
+
+def loop_lookup(inks: List[InkyTuple], term: str) -> Optional[InkyTuple]:
+    """Look up a term the way the Inkcyclopedia used to."""
+    for ink in inks:
+        if ink.regex.findall(term):
+            return ink
+    return None
+
+
+def main() -> None:
+    """Time hits and misses for a small and a large catalogue."""
+    print(f"{'inks':>8}{'case':>6}{'loop us':>12}{'matcher us':>12}")
+    for size in (500, 50_000):
+        inks = catalogue(size)
+        matcher = InkMatcher(inks)
+        terms = {
+            "hit": inks[size // 2].name,
+            "miss": "some ink that isn't there",
+        }
+        for case, term in terms.items():
+            assert loop_lookup(inks, term) == matcher.lookup(term)
+            runs = 20 if size > 1000 else 200
+            loop = timeit.timeit(lambda: loop_lookup(inks, term), number=runs)
+            fast = timeit.timeit(lambda: matcher.lookup(term), number=runs)
+            print(f"{size:>8}{case:>6}" +
+                  f"{loop / runs * 1e6:>12.1f}{fast / runs * 1e6:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
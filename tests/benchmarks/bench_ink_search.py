@@ -0,0 +1,33 @@
+"""Time full-text searches of the Inkcyclopedia at different sizes."""
+
+import os
+import tempfile
+import timeit
+
+from mrfreeze.cogs.inkcyclopedia import search
+from tests.benchmarks import corpora
+
+QUERIES = ["diamine", "diamine ox", "robert oster 42", "kw", "nonexistent"]
+
+
+def main() -> None:
+    """Build search tables of 10k and 100k inks and time some queries."""
+    print(f"{'inks':>8}  {'query':<18}{'hits':>6}{'us/query':>12}")
+    with tempfile.TemporaryDirectory() as directory:
+        for size in (10_000, 100_000):
+            conn = search.connect(os.path.join(directory, f"{size}.db"))
+            rows = [(name, url) for (name, url, _) in corpora.ink_rows(size)]
+            search.build_search(conn, rows, str(size))
+
+            for query in QUERIES:
+                hits = len(search.search(conn, query))
+                runs = 200
+                elapsed = timeit.timeit(
+                    lambda: search.search(conn, query), number=runs)
+                print(f"{size:>8}  {query:<18}{hits:>6}" +
+                      f"{elapsed / runs * 1e6:>12.1f}")
+            conn.close()
+
+
+if __name__ == "__main__":
+    main()
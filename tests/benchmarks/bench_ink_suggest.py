@@ -0,0 +1,44 @@
+"""Time "did you mean" suggestions for misspelt inks at different sizes."""
+
+import random
+import timeit
+from time import perf_counter
+
+from mrfreeze.cogs.inkcyclopedia.trigram import TrigramIndex
+from tests.benchmarks import corpora
+
+
+def misspell(name: str, rng: random.Random) -> str:
+    """Swap one letter of a name for another."""
+    position = rng.randrange(len(name))
+    return name[:position] + rng.choice(corpora.LETTERS) + name[position + 1:]
+
+
+def main() -> None:
+    """Build trigram indices of 1k to 50k inks and time suggestions."""
+    print(f"{'inks':>8}{'build ms':>10}{'found':>8}{'us/probe':>10}" +
+          f"{'us/miss':>10}")
+    for size in (1_000, 10_000, 50_000):
+        rng = random.Random(size)
+        names = [name for (name, _, _) in corpora.ink_rows(size)]
+
+        start = perf_counter()
+        trigrams = TrigramIndex(names)
+        build = perf_counter() - start
+
+        wanted = rng.sample(names, 200)
+        typos = [misspell(name, rng) for name in wanted]
+        found = sum([best.name for best in trigrams.suggest(typo)[:1]] ==
+                    [name] for (typo, name) in zip(typos, wanted))
+        probe = timeit.timeit(
+            lambda: [trigrams.suggest(typo) for typo in typos], number=5)
+        miss = timeit.timeit(
+            lambda: trigrams.suggest("completely unknown"), number=1000)
+
+        print(f"{size:>8}{build * 1000:>10.0f}{found / len(typos):>8.0%}" +
+              f"{probe / 5 / len(typos) * 1e6:>10.1f}" +
+              f"{miss / 1000 * 1e6:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
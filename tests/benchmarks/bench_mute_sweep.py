@@ -0,0 +1,96 @@
+"""Compare finding due mutes before and after the epoch/index migration."""
+
+import contextlib
+import datetime
+import io
+import os
+import sqlite3
+import tempfile
+import timeit
+from types import SimpleNamespace
+from typing import List, Tuple
+
+from mrfreeze import dbfunctions
+from mrfreeze.dbfunctions import ConnectionManager
+from mrfreeze.cogs.banish import mute_db
+from tests.benchmarks import corpora
+
+LEGACY_TABLE = """CREATE TABLE mutes(
+    id          integer NOT NULL,
+    server      integer NOT NULL,
+    voluntary   boolean NOT NULL,
+    until       date,
+    CONSTRAINT  server_user PRIMARY KEY (id, server));"""
+
+
+def legacy_sweep(conn: sqlite3.Connection, server: int,
+                 now: datetime.datetime) -> List[int]:
+    """Find the due mutes of a server the way the unbanish loop used to."""
+    rows = conn.execute(
+        "SELECT * FROM mutes WHERE server = ?", (server,)).fetchall()
+    return [row[0] for row in rows
+            if row[3] is not None and dbfunctions.db_time(row[3]) < now]
+
+
+def indexed_sweep(conn: sqlite3.Connection, server: int,
+                  now: datetime.datetime) -> List[int]:
+    """Find the due mutes of a server with the (server, until) index."""
+    rows = conn.execute(
+        "SELECT id, until FROM mutes WHERE server = ? AND until <= ?",
+        (server, mute_db.to_epoch(now))).fetchall()
+    return [row[0] for row in rows]
+
+
+def build(directory: str, size: int, servers: int
+          ) -> Tuple[sqlite3.Connection, sqlite3.Connection]:
+    """Create a legacy and a migrated mutes database with the same rows."""
+    rows = [(uid, server, voluntary, dbfunctions.db_time(
+                datetime.datetime.fromtimestamp(until)))
+            for (uid, server, voluntary, until)
+            in corpora.mute_rows(size, servers)]
+
+    connections = list()
+    for layout in ("legacy", "indexed"):
+        path = os.path.join(directory, f"{layout}{servers}")
+        os.mkdir(path)
+        bot = SimpleNamespace(databases=ConnectionManager(path),
+                              db_transaction=dbfunctions.db_transaction)
+        with bot.databases.transaction("mutes") as conn:
+            conn.execute(LEGACY_TABLE)
+            conn.executemany("INSERT INTO mutes VALUES(?,?,?,?)", rows)
+        if layout == "indexed":
+            # Migrate the table the same way the cog does when it loads.
+            with contextlib.redirect_stdout(io.StringIO()):
+                mute_db.mdb_create(bot, "mutes")
+        connections.append(bot.databases.connect("mutes"))
+    return tuple(connections)
+
+
+def main() -> None:
+    """Time sweeping one server and every server, at 100k mutes."""
+    size = 100_000
+    now = datetime.datetime.now()
+    print(f"{'servers':>8}{'case':>12}{'legacy ms':>12}{'indexed ms':>12}")
+    with tempfile.TemporaryDirectory() as directory:
+        for servers in (1, 100):
+            legacy, migrated = build(directory, size, servers)
+            assert sorted(legacy_sweep(legacy, 0, now)) == \
+                sorted(indexed_sweep(migrated, 0, now))
+
+            cases = {
+                "one": lambda sweep, conn: sweep(conn, 0, now),
+                "all": lambda sweep, conn: [sweep(conn, server, now)
+                                            for server in range(servers)],
+            }
+            for case, run in cases.items():
+                runs = 5
+                before = timeit.timeit(
+                    lambda: run(legacy_sweep, legacy), number=runs) / runs
+                after = timeit.timeit(
+                    lambda: run(indexed_sweep, migrated), number=runs) / runs
+                print(f"{servers:>8}{case:>12}" +
+                      f"{before * 1000:>12.2f}{after * 1000:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
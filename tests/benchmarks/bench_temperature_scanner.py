@@ -0,0 +1,54 @@
+"""Compare the temperature scanner with the old parse_request regexes."""
+
+import re
+import timeit
+
+from mrfreeze.cogs.temp_converter import scan_temperatures
+from tests.benchmarks import corpora
+
+
+def legacy_parse(text: str) -> bool:
+    """Look for the first statement the way parse_request used to."""
+    numbers = r"(?:(?:\s|^)-)?\d+(?:[,.]\d+)? ?"
+    celsius = r"°?(?:c|celcius|celsius|civili[sz]ed units?)"
+    fahrenheit = r"°?(?:f|fahrenheit|freedom units?)"
+    degrees = r"°?(?:deg|degrees)"
+    kelvin = r"(?:k|kelvin)"
+    rankine = r"°?(?:r|rankine)"
+    regex = (f"({numbers})(?:({celsius})|({fahrenheit})" +
+             fr"|([ °]{kelvin})|({rankine})|({degrees}))(?:\s|$)")
+    statement = re.search(regex, text, re.IGNORECASE)
+    if not statement:
+        return False
+
+    no_catch = (fr"(?:(?:{numbers}) ?(?:{celsius}|{fahrenheit}|" +
+                fr"{degrees}|[ °]{kelvin}|{rankine})) (?:for|in|as" +
+                fr"|(?:convert )?to|convert)")
+    find_convert = (fr"{no_catch} (?:({celsius})|({fahrenheit})" +
+                    fr"|(°?{kelvin})|({rankine}))(?:\s|$)")
+    re.search(find_convert, text, re.IGNORECASE)
+    return True
+
+
+def main() -> None:
+    """Time both over a chat corpus."""
+    messages = corpora.chat_messages(10_000)
+    found = sum(bool(scan_temperatures(message)) for message in messages)
+    assert found == sum(legacy_parse(message) for message in messages)
+
+    runs = 5
+    legacy = timeit.timeit(
+        lambda: [legacy_parse(message) for message in messages], number=runs)
+    scanner = timeit.timeit(
+        lambda: [scan_temperatures(message) for message in messages],
+        number=runs)
+
+    print(f"{len(messages)} messages, {found} with temperatures")
+    for (name, elapsed) in (("legacy", legacy), ("scanner", scanner)):
+        per_message = elapsed / runs / len(messages) * 1e6
+        print(f"{name:>8}{per_message:>10.2f} us/message" +
+              f"{len(messages) * runs / elapsed:>12.0f} messages/s")
+
+
+if __name__ == "__main__":
+    main()
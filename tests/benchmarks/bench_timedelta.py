@@ -0,0 +1,73 @@
+"""Compare batch humanization of timedeltas with the old one-by-one loop."""
+
+import datetime
+import timeit
+
+from mrfreeze import time
+from tests.benchmarks import corpora
+
+
+def legacy_parse_timedelta(time_delta: datetime.timedelta) -> str:
+    """Humanize a timedelta the way parse_timedelta used to."""
+    days = time_delta.days
+    seconds = time_delta.seconds
+    microseconds = time_delta.microseconds
+
+    years = int(days / 365)
+    days %= 365
+    months = int(days / 30)
+    days %= 30
+    weeks = int(days / 7)
+    days %= 7
+    hours = int(seconds / 3600)
+    seconds %= 3600
+    minutes = int(seconds / 60)
+    seconds = round((seconds % 60 + microseconds / 1000000))
+
+    time_str = ""
+    size_order = (
+        ("year", years), ("month", months),
+        ("week", weeks), ("day", days),
+        ("hour", hours), ("minute", minutes),
+        ("second", seconds)
+    )
+    for value in range(len(size_order)):
+        trailing_values = 0
+        if value != (len(size_order) - 1):
+            for i in size_order[value+1:]:
+                if i[1] > 0:
+                    trailing_values += 1
+        if size_order[value][1] > 0:
+            if size_order[value][1] == 1:
+                time_str += f"{size_order[value][1]} {size_order[value][0]}"
+            else:
+                time_str += f"{size_order[value][1]} {size_order[value][0]}s"
+            if trailing_values == 0:
+                pass
+            elif trailing_values == 1:
+                time_str += " and "
+            else:
+                time_str += ", "
+    return time_str
+
+
+def main() -> None:
+    """Time both over 10k and 100k mute lengths."""
+    print(f"{'mutes':>8}{'legacy ms':>12}{'batch ms':>12}{'speedup':>10}")
+    for size in (10_000, 100_000):
+        lengths = corpora.mute_lengths(size)
+        assert time.parse_timedeltas(lengths) == \
+            [legacy_parse_timedelta(length) for length in lengths]
+
+        runs = 5
+        legacy = timeit.timeit(
+            lambda: [legacy_parse_timedelta(length) for length in lengths],
+            number=runs) / runs
+        batch = timeit.timeit(
+            lambda: time.parse_timedeltas(lengths), number=runs) / runs
+        print(f"{size:>8}{legacy * 1000:>12.1f}{batch * 1000:>12.1f}" +
+              f"{legacy / batch:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""Reproducible synthetic data for the benchmarks."""
+
+import datetime
+import random
+from typing import List, Tuple
+
+BRANDS = ["diamine", "noodlers", "iroshizuku", "sailor", "pilot",
+          "robert oster", "de atramentis", "kwz", "pelikan", "waterman",
+          "montblanc", "lamy", "j herbin", "colorverse", "private reserve"]
+
+LETTERS = "abcdefghijklmnopqrstuvwxyz"
+
+
+def ink_rows(size: int, seed: int = 1) -> List[Tuple[str, str, str]]:
+    """
+    Create (name, url, regex) rows for a catalogue of synthetic inks.
+
+    Every name is unique thanks to a trailing number, and every regex
+    matches its own name and nothing else.
+    """
+    rng = random.Random(seed)
+    rows = list()
+    for number in range(size):
+        brand = rng.choice(BRANDS)
+        colour = "".join(rng.choice(LETTERS)
+                         for _ in range(rng.randint(4, 9)))
+        name = f"{brand} {colour} {number}"
+        regex = brand.replace(" ", r"\s*") + rf"\s*{colour}\s*{number}\b"
+        rows.append((name, f"https://example.com/{number}.jpg", regex))
+    return rows
+
+
+CHAT = [
+    "anyone tried the {brand} inks?",
+    "lol that's the third time today",
+    "I'll be back in 10 minutes",
+    "my {brand} arrived, 5 bottles!",
+    "it's {temp} outside and I'm melting",
+    "it was {temp} this morning and {temp} now",
+    "what is {temp} in {unit}",
+    "{temp} seems a bit much for a pen show",
+    "check out page 42 of the manual",
+    "ok",
+]
+
+UNITS = ["c", "°C", " celsius", "f", "°F", " fahrenheit", " k", " kelvin",
+         "°R", " degrees", " freedom units"]
+
+
+def chat_messages(size: int, seed: int = 1) -> List[str]:
+    """
+    Create chat messages, most without any temperature in them.
+
+    Templates are filled in with brands, temperatures ("20c", "-4.5 °F")
+    and units to convert to.
+    """
+    rng = random.Random(seed)
+    messages = list()
+    for _ in range(size):
+        template = rng.choice(CHAT)
+        while "{temp}" in template:
+            number = rng.choice([f"{rng.randint(-40, 110)}",
+                                 f"{rng.uniform(-40, 110):.1f}"])
+            template = template.replace(
+                "{temp}", number + rng.choice(UNITS), 1)
+        messages.append(template.format(
+            brand=rng.choice(BRANDS), unit=rng.choice("cfkr")))
+    return messages
+
+
+def mute_lengths(size: int, seed: int = 1) -> List[datetime.timedelta]:
+    """Create mute lengths, mostly round numbers like real mutes."""
+    rng = random.Random(seed)
+    lengths = list()
+    for _ in range(size):
+        if rng.random() < 0.8:
+            unit = rng.choice([60, 3600, 86400, 604800])
+            lengths.append(datetime.timedelta(
+                seconds=unit * rng.randint(1, 30)))
+        else:
+            lengths.append(datetime.timedelta(
+                seconds=rng.uniform(0, 86400 * 400)))
+    return lengths
+
+
+DURATIONS = ["{n} minutes", "{n}m", "{n} hours", "{n}h", "{n} days",
+             "{n} d", "{n} weeks", "{n} months", "{n} years", "{n}h{n}m",
+             "{n}"]
+
+REASONS = ["spamming", "being rude to", "posting", "arguing about",
+           "the", "ink", "for", "and", "again", "in", "general"]
+
+
+def mention(rng: random.Random) -> str:
+    """Create a user mention, with or without the nickname marker."""
+    return rng.choice(["<@", "<@!"]) + str(rng.randint(10**17, 10**18))
+
+
+def command_args(size: int, seed: int = 1,
+                 length: int = 6) -> List[Tuple[str, ...]]:
+    """
+    Create argument tuples like those of !banish or !mute.
+
+    Every tuple has a mention or two, a duration and some words of
+    reason, around length arguments in total.
+    """
+    rng = random.Random(seed)
+    args = list()
+    for _ in range(size):
+        words = [mention(rng) + ">" for _ in range(rng.randint(1, 2))]
+        words += rng.choice(DURATIONS).format(n=rng.randint(1, 60)).split()
+        while len(words) < length:
+            words.append(rng.choice(REASONS))
+        args.append(tuple(words))
+    return args
+
+
+def reasons(size: int, seed: int = 1) -> List[str]:
+    """Create joined !ban and !kick arguments, mentions and then a reason."""
+    return [" ".join(args) for args in command_args(size, seed, length=10)]
+
+
+def pathological(seed: int = 1) -> List[str]:
+    """
+    Create inputs meant to find slow paths in regexes and char loops.
+
+    Long runs of digits and minus signs, mentions that never close,
+    mentions without a reason and walls of brackets and punctuation.
+    """
+    rng = random.Random(seed)
+    return [
+        "9" * 2000,
+        "-" * 2000 + "1",
+        "1 " * 1000 + "deg",
+        "1,1" * 700 + "c",
+        "-1.5 " * 400 + "k to",
+        " ".join(str(rng.randint(-99, 99)) for _ in range(1000)),
+        "<@1" * 700 + " x",
+        " ".join(mention(rng) + ">" for _ in range(200)),
+        "(" * 1000 + ")" * 1000,
+        "[<{" * 700,
+        "".join(rng.choice(LETTERS + " ") for _ in range(2000)),
+        "1h" * 700,
+        "°" * 1000 + "c",
+    ]
+
+
+def mute_rows(size: int, servers: int, due: float = 0.01,
+              seed: int = 1) -> List[Tuple[int, int, bool, int]]:
+    """
+    Create (id, server, voluntary, until) rows of a mutes table.
+
+    Until is in epoch seconds, about the given fraction of mutes has
+    ended by now and the rest end within a month.
+    """
+    rng = random.Random(seed)
+    now = int(datetime.datetime.now().timestamp())
+    rows = list()
+    for number in range(size):
+        if rng.random() < due:
+            until = now - rng.randint(1, 3600)
+        else:
+            until = now + rng.randint(60, 86400 * 30)
+        rows.append((10**17 + number, rng.randrange(servers),
+                     rng.random() < 0.1, until))
+    return rows
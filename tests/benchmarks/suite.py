@@ -0,0 +1,244 @@
+"""
+Benchmark suite for the parsing hot paths, with a baseline to compare to.
+
+Every case runs a function over a reproducible corpus from corpora.py
+and reports the best time per item out of a number of repeats. Results
+are written as JSON, and compared against a stored baseline: a case
+that got slower by more than the threshold is a regression, which
+makes the run fail.
+
+Run it with `python -m tests.benchmarks`, see --help for the options.
+Timings depend on the machine, so a baseline is only meaningful on the
+machine it was saved on. Save a new one with --save.
+"""
+import argparse
+import json
+import os
+import platform
+import re
+import sys
+import timeit
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence
+
+from mrfreeze import time
+from mrfreeze.cogs.inkcyclopedia.matcher import InkMatcher
+from mrfreeze.cogs.moderation import Moderation
+from mrfreeze.cogs.temp_converter import TemperatureConverter
+from tests.benchmarks import corpora
+
+# The stored baseline, next to this file.
+BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+# Default slowdown (as a fraction) before a case counts as a regression.
+THRESHOLD = 0.25
+
+# Default number of timed repeats, the best of which is reported.
+REPEATS = 5
+
+# Each repeat runs the case at least this many seconds.
+MIN_SECONDS = 0.05
+
+
+class Case(NamedTuple):
+    """A function run over each item of a corpus."""
+
+    name:   str
+    corpus: Sequence[Any]
+    run:    Callable[[Any], Any]
+    reset:  Optional[Callable[[], None]] = None
+
+
+class Result(NamedTuple):
+    """How fast a case ran."""
+
+    name:  str
+    items: int
+    usec:  float  # Microseconds per item, best of all repeats
+
+
+class Regression(NamedTuple):
+    """A case that got slower than the baseline allows."""
+
+    name:     str
+    baseline: float
+    current:  float
+
+    @property
+    def slowdown(self) -> float:
+        """Get how much slower the case got, 0.5 meaning 50%."""
+        return self.current / self.baseline - 1
+
+
+def cases() -> List[Case]:
+    """Build every case along with its corpus."""
+    chat = corpora.chat_messages(2000)
+    args = corpora.command_args(2000)
+    long_args = corpora.command_args(200, length=200)
+    pathological = corpora.pathological()
+    pathological_args = [tuple(text.split()) or (text,)
+                         for text in pathological]
+
+    converter = TemperatureConverter(
+        SimpleNamespace(add_message_stage=lambda *args: None))
+    dm = SimpleNamespace(guild=None)
+    moderation = Moderation(None)
+
+    rows = corpora.ink_rows(5000)
+    matcher = InkMatcher.from_rows(rows)
+    terms = [name for (name, _, _) in rows[::50]] + chat[:100]
+
+    return [
+        Case("time.extract_time/chat", args,
+             time.extract_time, time.parse_args.cache_clear),
+        Case("time.extract_time/long_args", long_args,
+             time.extract_time, time.parse_args.cache_clear),
+        Case("time.extract_time/pathological", pathological_args,
+             time.extract_time, time.parse_args.cache_clear),
+        Case("time.parse_timedelta", corpora.mute_lengths(2000),
+             time.parse_timedelta, time.format_units.cache_clear),
+        Case("temperature.parse_request/chat", chat,
+             lambda text: converter.parse_request(dm, text)),
+        Case("temperature.parse_request/pathological", pathological,
+             lambda text: converter.parse_request(dm, text)),
+        Case("moderation.extract_reason/reasons", corpora.reasons(2000),
+             moderation.extract_reason),
+        Case("moderation.extract_reason/pathological", pathological,
+             moderation.extract_reason),
+        Case("inkcyclopedia.lookup/chat", terms, matcher.lookup),
+        Case("inkcyclopedia.lookup/pathological", pathological,
+             matcher.lookup),
+    ]
+
+
+def measure(case: Case, repeats: int = REPEATS,
+            min_seconds: float = MIN_SECONDS) -> Result:
+    """Time a case, resetting its caches before every pass."""
+    def run_corpus() -> None:
+        if case.reset is not None:
+            case.reset()
+        for item in case.corpus:
+            case.run(item)
+
+    timer = timeit.Timer(run_corpus)
+    number = 1
+    while timer.timeit(number) < min_seconds:
+        number *= 2
+    best = min(timer.repeat(repeats, number)) / number
+    return Result(case.name, len(case.corpus), best / len(case.corpus) * 1e6)
+
+
+def compare(results: Sequence[Result], baseline: Dict[str, float],
+            threshold: float = THRESHOLD) -> List[Regression]:
+    """Get the cases slower than their baseline by more than threshold."""
+    regressions = list()
+    for result in results:
+        before = baseline.get(result.name)
+        if before is None or before <= 0:
+            continue
+        regression = Regression(result.name, before, result.usec)
+        if regression.slowdown > threshold:
+            regressions.append(regression)
+    return regressions
+
+
+def environment() -> Dict[str, str]:
+    """Describe the machine the benchmarks ran on."""
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "machine": platform.machine(),
+        "system": platform.system(),
+    }
+
+
+def to_json(results: Sequence[Result]) -> Dict[str, Any]:
+    """Turn results into the JSON layout of the results and the baseline."""
+    return {
+        "environment": environment(),
+        "results": {result.name: {"items": result.items,
+                                  "usec": round(result.usec, 4)}
+                    for result in results},
+    }
+
+
+def load_baseline(path: str) -> Optional[Dict[str, float]]:
+    """Read microseconds per item by case from a baseline file, if any."""
+    if not os.path.isfile(path):
+        return None
+    with open(path) as infile:
+        data = json.load(infile)
+    return {name: result["usec"]
+            for (name, result) in data.get("results", dict()).items()}
+
+
+def write_json(path: str, data: Dict[str, Any]) -> None:
+    """Write JSON data to a file, or to stdout if path is -."""
+    if path == "-":
+        json.dump(data, sys.stdout, indent=2)
+        print()
+        return
+    with open(path, "w") as outfile:
+        json.dump(data, outfile, indent=2)
+        outfile.write("\n")
+
+
+def parse_args(argv: Optional[Sequence[str]]) -> argparse.Namespace:
+    """Parse the command line."""
+    parser = argparse.ArgumentParser(
+        prog="python -m tests.benchmarks",
+        description="Benchmark the parsing hot paths of the bot.")
+    parser.add_argument(
+        "-k", "--filter", default="",
+        help="only run cases whose name matches this regex")
+    parser.add_argument(
+        "-o", "--output", default="-",
+        help="where to write the JSON results (default: stdout)")
+    parser.add_argument(
+        "--baseline", default=BASELINE,
+        help="baseline to compare to (default: %(default)s)")
+    parser.add_argument(
+        "--threshold", type=float, default=THRESHOLD,
+        help="allowed slowdown before failing, 0.25 is 25%% " +
+             "(default: %(default)s)")
+    parser.add_argument(
+        "--repeats", type=int, default=REPEATS,
+        help="timed repeats per case (default: %(default)s)")
+    parser.add_argument(
+        "--save", action="store_true",
+        help="save the results as the new baseline instead of comparing")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    """Run the suite, return 1 if anything regressed and 0 otherwise."""
+    options = parse_args(argv)
+    selected = [case for case in cases()
+                if re.search(options.filter, case.name)]
+
+    results = list()
+    for case in selected:
+        result = measure(case, options.repeats)
+        results.append(result)
+        print(f"{result.name:<45}{result.usec:>12.2f} us",
+              file=sys.stderr)
+
+    data = to_json(results)
+    if options.save:
+        write_json(options.baseline, data)
+        print(f"Saved baseline to {options.baseline}", file=sys.stderr)
+        return 0
+    write_json(options.output, data)
+
+    baseline = load_baseline(options.baseline)
+    if baseline is None:
+        print(f"No baseline at {options.baseline}, nothing to compare to.",
+              file=sys.stderr)
+        return 0
+
+    regressions = compare(results, baseline, options.threshold)
+    for regression in regressions:
+        print(f"REGRESSION {regression.name}: " +
+              f"{regression.baseline:.2f} us -> {regression.current:.2f} us " +
+              f"({regression.slowdown:+.0%})", file=sys.stderr)
+    return 1 if regressions else 0
@@ -0,0 +1,45 @@
+"""Unittests for the benchmark suite itself, not the benchmarks."""
+
+import json
+import os
+import tempfile
+import unittest
+
+from tests.benchmarks import suite
+
+
+class SuiteUnitTest(unittest.TestCase):
+    """Test running cases and comparing them to a baseline."""
+
+    def test_measure(self):
+        """Test that a case is timed per item of its corpus."""
+        resets = list()
+        case = suite.Case("sum", [1, 2, 3], abs, lambda: resets.append(1))
+        result = suite.measure(case, repeats=2, min_seconds=0)
+        self.assertEqual((result.name, result.items), ("sum", 3))
+        self.assertGreater(result.usec, 0)
+        self.assertTrue(resets)
+
+    def test_compare(self):
+        """Test that only slowdowns past the threshold are regressions."""
+        results = [suite.Result("fast", 1, 1.2),
+                   suite.Result("slow", 1, 2.0),
+                   suite.Result("new", 1, 9.0)]
+        baseline = {"fast": 1.0, "slow": 1.0}
+        regressions = suite.compare(results, baseline, threshold=0.25)
+        self.assertEqual(regressions, [suite.Regression("slow", 1.0, 2.0)])
+        self.assertAlmostEqual(regressions[0].slowdown, 1.0)
+        self.assertEqual(suite.compare(results, baseline, threshold=1.5),
+                         list())
+
+    def test_baseline_round_trip(self):
+        """Test that saved results read back as a baseline."""
+        data = suite.to_json([suite.Result("case", 10, 1.5)])
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "baseline.json")
+            suite.write_json(path, data)
+            self.assertEqual(suite.load_baseline(path), {"case": 1.5})
+            with open(path) as infile:
+                self.assertIn("environment", json.load(infile))
+            self.assertIsNone(
+                suite.load_baseline(os.path.join(directory, "missing")))
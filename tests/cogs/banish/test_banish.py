@@ -0,0 +1,74 @@
+"""Unittests for lifting mutes in the banish cog."""
+
+import asyncio
+import datetime
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from mrfreeze.bot import ServerTuple
+from mrfreeze.cogs.banish import mute_db
+from mrfreeze.cogs.banish.banish import BanishAndRegion
+
+from tests import helpers
+from tests.cogs.banish.test_mute_db import database_bot
+
+
+class UnbanishUnitTest(unittest.TestCase):
+    """Test lifting the mutes the scheduler says are due."""
+
+    def setUp(self):
+        """Create a server with a muted and a prolonged member."""
+        quiet = patch("builtins.print")
+        quiet.start()
+        self.addCleanup(quiet.stop)
+
+        self.directory = tempfile.TemporaryDirectory()
+        self.bot = database_bot(self.directory.name)
+
+        self.role = helpers.MockRole(name="Antarctica")
+        self.channel = helpers.MockTextChannel()
+        self.guild = helpers.MockGuild()
+        self.bot.servertuples = {
+            self.guild.id: ServerTuple(None, self.channel, self.role)}
+
+        self.muted = helpers.MockMember(
+            guild=self.guild, discriminator="1", roles=[self.role])
+        self.prolonged = helpers.MockMember(
+            guild=self.guild, discriminator="2", roles=[self.role])
+        members = {member.id: member
+                   for member in (self.muted, self.prolonged)}
+        self.guild.get_member.side_effect = members.get
+
+        self.cog = BanishAndRegion(self.bot)
+
+    def tearDown(self):
+        """Stop the database worker and remove the directory."""
+        self.bot.db_services.close()
+        self.bot.databases.close()
+        self.directory.cleanup()
+
+    def test_unbanish_due(self):
+        """Test that only mutes still due are lifted, and announced."""
+        async def unbanish():
+            past = datetime.datetime.now() - datetime.timedelta(minutes=1)
+            future = datetime.datetime.now() + datetime.timedelta(hours=1)
+            await mute_db.carry_out_banishes(
+                self.bot, "mutes", [self.muted, self.prolonged], past,
+                self.cog.scheduler)
+            self.assertEqual(len(self.cog.scheduler.pop_due()), 2)
+
+            # Prolonged after it was found to be due.
+            await mute_db.carry_out_banish(
+                self.bot, "mutes", self.prolonged, future, self.cog.scheduler)
+            await self.cog.unbanish_due(self.guild)
+            return await mute_db.mdb_fetch(self.bot, "mutes", self.guild)
+
+        mutes = asyncio.run(unbanish())
+        self.assertEqual([mute.member for mute in mutes], [self.prolonged])
+        self.assertEqual(len(self.cog.scheduler), 1)
+
+        self.muted.remove_roles.assert_awaited_once_with(self.role)
+        self.prolonged.remove_roles.assert_not_awaited()
+        self.channel.send.assert_awaited_once()
+        self.assertIn(self.muted.mention, self.channel.send.call_args[0][0])
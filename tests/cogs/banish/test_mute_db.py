@@ -0,0 +1,229 @@
+"""Unittests for the mutes database."""
+
+import asyncio
+import datetime
+import tempfile
+import threading
+import unittest
+from unittest.mock import MagicMock, patch
+
+from mrfreeze import dbfunctions, dbservice, time
+from mrfreeze.cogs.banish import mute_db
+
+from tests import helpers
+
+# The mutes table before until was turned into epoch seconds.
+LEGACY_MUTES_TABLE = """CREATE TABLE IF NOT EXISTS mutes(
+    id          integer NOT NULL,
+    server      integer NOT NULL,
+    voluntary   boolean NOT NULL,
+    until       date,
+    CONSTRAINT  server_user PRIMARY KEY (id, server));"""
+
+
+def database_bot(directory):
+    """Create a bot mock with real databases in directory."""
+    bot = helpers.MockMrFreeze()
+    bot.databases = dbfunctions.ConnectionManager(directory)
+    bot.db_services = dbservice.DatabaseServices(bot.databases)
+    bot.db_connect = dbfunctions.db_connect
+    bot.db_transaction = dbfunctions.db_transaction
+    bot.db_time = dbfunctions.db_time
+    bot.parse_timedelta = time.parse_timedelta
+    bot.parse_timedeltas = time.parse_timedeltas
+    return bot
+
+
+class MuteDBUnitTest(unittest.TestCase):
+    """Test adding, prolonging and removing mutes."""
+
+    def setUp(self):
+        """Create the mutes table and a member to mute."""
+        quiet = patch("builtins.print")
+        quiet.start()
+        self.addCleanup(quiet.stop)
+
+        self.directory = tempfile.TemporaryDirectory()
+        self.bot = database_bot(self.directory.name)
+        mute_db.mdb_create(self.bot, "mutes")
+
+        self.guild = helpers.MockGuild()
+        self.member = helpers.MockMember(guild=self.guild, discriminator="1")
+        self.members = {self.member.id: self.member}
+        self.guild.get_member.side_effect = self.members.get
+
+    def tearDown(self):
+        """Stop the database worker and remove the directory."""
+        self.bot.db_services.close()
+        self.bot.databases.close()
+        self.directory.cleanup()
+
+    def test_add_and_delete(self):
+        """Test that a mute is added once and can be removed."""
+        async def add_and_delete():
+            end = datetime.datetime.now() + datetime.timedelta(hours=1)
+            self.assertTrue(await mute_db.mdb_add(
+                self.bot, "mutes", self.member, end_date=end, prolong=False))
+            self.assertTrue(await mute_db.mdb_add(
+                self.bot, "mutes", self.member, end_date=end, prolong=False))
+
+            mutes = await mute_db.mdb_fetch(self.bot, "mutes", self.guild)
+            self.assertEqual(len(mutes), 1)
+            self.assertIs(mutes[0].member, self.member)
+            self.assertEqual(mutes[0].until, end.replace(microsecond=0))
+
+            self.assertTrue(
+                await mute_db.mdb_del(self.bot, "mutes", self.member))
+            self.assertEqual(
+                await mute_db.mdb_fetch(self.bot, "mutes", self.member),
+                list())
+            self.assertTrue(
+                await mute_db.mdb_del(self.bot, "mutes", self.member))
+
+        asyncio.run(add_and_delete())
+
+    def test_prolong(self):
+        """Test that a new mute is added on top of a timed one."""
+        async def prolong():
+            start = datetime.datetime.now() + datetime.timedelta(days=1)
+            await mute_db.mdb_add(
+                self.bot, "mutes", self.member, end_date=start)
+            await mute_db.mdb_add(
+                self.bot, "mutes", self.member,
+                end_date=datetime.datetime.now() +
+                datetime.timedelta(hours=2))
+
+            mutes = await mute_db.mdb_fetch(self.bot, "mutes", self.member)
+            expected = start + datetime.timedelta(hours=2)
+            self.assertLess(abs(mutes[0].until - expected),
+                            datetime.timedelta(seconds=2))
+
+        asyncio.run(prolong())
+
+    def test_permanent_mute_is_replaced(self):
+        """Test that a timed mute replaces a permanent one."""
+        async def replace():
+            await mute_db.mdb_add(self.bot, "mutes", self.member)
+            end = datetime.datetime.now() + datetime.timedelta(hours=1)
+            await mute_db.mdb_add(
+                self.bot, "mutes", self.member, end_date=end)
+
+            mutes = await mute_db.mdb_fetch(self.bot, "mutes", self.member)
+            self.assertEqual(mutes[0].until, end.replace(microsecond=0))
+
+        asyncio.run(replace())
+
+    def test_prolong_overflow(self):
+        """Test that prolonging past datetime.max ends at datetime.max."""
+        async def overflow():
+            end = datetime.datetime.max - datetime.timedelta(days=1)
+            await mute_db.mdb_add(self.bot, "mutes", self.member,
+                                  voluntary=True, end_date=end)
+            await mute_db.mdb_add(self.bot, "mutes", self.member, end_date=end)
+
+            mutes = await mute_db.mdb_fetch(self.bot, "mutes", self.member)
+            self.assertEqual(mutes[0].until,
+                             datetime.datetime.max.replace(microsecond=0))
+            self.assertFalse(mutes[0].voluntary)
+
+        asyncio.run(overflow())
+
+    def test_add_many(self):
+        """Test adding several members at once, prolonging existing mutes."""
+        others = [helpers.MockMember(guild=self.guild, discriminator="2"),
+                  helpers.MockMember(guild=self.guild, discriminator="3")]
+        self.members.update((other.id, other) for other in others)
+
+        async def add_many():
+            start = datetime.datetime.now() + datetime.timedelta(days=1)
+            await mute_db.mdb_add(
+                self.bot, "mutes", self.member, end_date=start)
+            end = datetime.datetime.now() + datetime.timedelta(hours=1)
+            self.bot.parse_timedeltas = MagicMock(
+                side_effect=time.parse_timedeltas)
+            self.assertTrue(await mute_db.mdb_add_many(
+                self.bot, "mutes", [self.member] + others, end_date=end))
+            return await mute_db.mdb_fetch(self.bot, "mutes", self.guild)
+
+        mutes = {mute.member: mute.until for mute in asyncio.run(add_many())}
+        self.assertEqual(len(mutes), 3)
+        # Every duration is humanized in a single batch.
+        self.bot.parse_timedeltas.assert_called_once()
+        self.assertGreater(mutes[self.member] - mutes[others[0]],
+                           datetime.timedelta(hours=23))
+
+    def test_departed_member(self):
+        """Test that a mute outlives its member, who is looked up lazily."""
+        async def depart():
+            await mute_db.mdb_add(self.bot, "mutes", self.member)
+            del self.members[self.member.id]
+            return await mute_db.mdb_fetch(self.bot, "mutes", self.guild)
+
+        mutes = asyncio.run(depart())
+        self.assertEqual(mutes[0].member_id, self.member.id)
+        self.assertIsNone(mutes[0].member)
+        self.assertIsNone(mutes[0].until)
+
+    def test_resolve_members(self):
+        """Test that members who've left are left out of a bulk lookup."""
+        self.assertEqual(
+            mute_db.resolve_members(self.guild, [self.member.id, 1234]),
+            {self.member.id: self.member})
+
+    def test_migration(self):
+        """Test that an old mutes table is migrated to epoch seconds."""
+        self.bot.databases.close()
+        self.directory.cleanup()
+        self.directory = tempfile.TemporaryDirectory()
+        self.bot = database_bot(self.directory.name)
+        with self.bot.databases.transaction("mutes") as conn:
+            conn.execute(LEGACY_MUTES_TABLE)
+            conn.executemany("INSERT INTO mutes VALUES(?,?,?,?)", [
+                (1, 2, False, "2020-06-01 12:30:00"),
+                (3, 2, True, None)])
+
+        mute_db.mdb_create(self.bot, "mutes")
+        mute_db.mdb_create(self.bot, "mutes")
+        conn = self.bot.databases.connect("mutes")
+        self.assertEqual(
+            conn.execute("SELECT id, until FROM mutes ORDER BY id").fetchall(),
+            [(1, int(datetime.datetime(2020, 6, 1, 12, 30).timestamp())),
+             (3, None)])
+        self.assertEqual(
+            conn.execute("PRAGMA user_version").fetchone()[0],
+            mute_db.MUTES_VERSION)
+
+        plan = conn.execute(
+            "EXPLAIN QUERY PLAN SELECT id FROM mutes " +
+            "WHERE server = 2 AND until <= 5").fetchall()
+        self.assertIn("mutes_server_until", str(plan))
+
+    def test_migration_of_unreadable_dates(self):
+        """Test that mutes with unreadable ends stay timed."""
+        with self.bot.databases.transaction("mutes") as conn:
+            conn.execute("DROP TABLE mutes")
+            conn.execute("PRAGMA user_version = 0")
+            conn.execute(LEGACY_MUTES_TABLE)
+            conn.executemany("INSERT INTO mutes VALUES(?,?,?,?)", [
+                # Only Python can read this one.
+                (1, 2, False, "20200601T123000"),
+                (3, 2, False, "next tuesday")])
+
+        start = int(datetime.datetime.now().timestamp())
+        mute_db.mdb_create(self.bot, "mutes")
+        conn = self.bot.databases.connect("mutes")
+        rows = conn.execute("SELECT id, until FROM mutes ORDER BY id")
+        (_, readable), (_, unreadable) = rows.fetchall()
+        self.assertEqual(
+            readable, int(datetime.datetime(2020, 6, 1, 12, 30).timestamp()))
+        self.assertIsInstance(unreadable, int)
+        self.assertLessEqual(start, unreadable)
+
+    def test_sql_runs_off_the_loop(self):
+        """Test that queries run on the worker thread of the database."""
+        async def thread_names():
+            def name(conn):
+                return threading.current_thread().name
+            return await self.bot.db_services["mutes"].call(name)
+
+        self.assertTrue(asyncio.run(thread_names()).startswith("db-mutes"))
@@ -0,0 +1,77 @@
+"""Unittests for the mute expiry scheduler."""
+
+import asyncio
+import datetime
+import time
+import unittest
+
+from mrfreeze.cogs.banish.scheduler import MuteScheduler, wake_time
+
+
+def at(timestamp):
+    """Get the local datetime of an epoch timestamp."""
+    return datetime.datetime.fromtimestamp(timestamp)
+
+
+class MuteSchedulerUnitTest(unittest.TestCase):
+    """Test scheduling and lifting mutes."""
+
+    def setUp(self):
+        """Create a scheduler with a 10 second window in server 2."""
+        self.scheduler = MuteScheduler(lambda guild_id: 10 * (guild_id == 2))
+
+    def test_wake_time(self):
+        """Test that mutes are lifted at the end of their window."""
+        self.assertEqual(wake_time(at(1001), 10), 1010)
+        self.assertEqual(wake_time(at(1010), 10), 1010)
+        self.assertEqual(wake_time(at(1001.5), 0), 1001.5)
+
+    def test_due_in_order(self):
+        """Test that due mutes are taken first one first, and only once."""
+        self.scheduler.schedule(1, 10, at(1003))
+        self.scheduler.schedule(1, 11, at(1001))
+        self.scheduler.schedule(2, 10, at(1002))
+        self.scheduler.schedule(1, 12, None)
+        self.assertEqual(len(self.scheduler), 3)
+        self.assertEqual(self.scheduler.next_wake(), 1001)
+
+        due = self.scheduler.pop_due(1005)
+        self.assertEqual([(e.guild_id, e.member_id) for e in due],
+                         [(1, 11), (1, 10)])
+        self.assertEqual(self.scheduler.pop_due(1005), list())
+        self.assertEqual([e.member_id for e in self.scheduler.pop_due(1010)],
+                         [10])
+        self.assertIsNone(self.scheduler.next_wake())
+
+    def test_replaced_and_cancelled(self):
+        """Test that only the current mute of a member comes up."""
+        self.scheduler.schedule(1, 10, at(1001))
+        self.scheduler.schedule(1, 10, at(2001))
+        self.scheduler.schedule(1, 11, at(1002))
+        self.scheduler.cancel(1, 11)
+        self.assertEqual(self.scheduler.next_wake(), 2001)
+        self.assertEqual(self.scheduler.pop_due(1500), list())
+
+    def test_reschedule(self):
+        """Test that a new window applies to mutes already scheduled."""
+        windows = {1: 0}
+        scheduler = MuteScheduler(windows.get)
+        scheduler.schedule(1, 10, at(1001))
+        windows[1] = 100
+        scheduler.reschedule(1)
+        self.assertEqual(scheduler.next_wake(), 1100)
+        self.assertEqual(len(scheduler.pop_due(1100)), 1)
+
+    def test_wait_wakes_for_sooner_mute(self):
+        """Test that wait returns when a mute scheduled meanwhile is due."""
+        async def wait():
+            self.scheduler.schedule(1, 10, at(time.time() + 3600))
+            waiter = asyncio.ensure_future(self.scheduler.wait())
+            await asyncio.sleep(0.01)
+            self.assertFalse(waiter.done())
+
+            self.scheduler.schedule(1, 11, at(time.time() + 0.05))
+            await asyncio.wait_for(waiter, 1)
+            return self.scheduler.pop_due()
+
+        self.assertEqual([e.member_id for e in asyncio.run(wait())], [11])
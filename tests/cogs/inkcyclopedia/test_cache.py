@@ -0,0 +1,53 @@
+"""Unittests for the cache of ink lookups."""
+
+import re
+import unittest
+from unittest.mock import patch
+
+from mrfreeze.cogs.inkcyclopedia.cache import LookupCache
+from mrfreeze.cogs.inkcyclopedia.matcher import InkMatcher, InkyTuple
+
+
+class LookupCacheUnitTest(unittest.TestCase):
+    """Test caching, evicting and invalidating lookups."""
+
+    def setUp(self):
+        """Create a matcher with a single ink and a small cache."""
+        self.oxblood = InkyTuple("Diamine Oxblood", "oxblood.jpg",
+                                 re.compile(r"ox\s*blood", re.IGNORECASE))
+        self.matcher = InkMatcher([self.oxblood])
+        self.cache = LookupCache(maxsize=2)
+
+    def test_hits_and_misses(self):
+        """Test that terms are normalized and misses are cached too."""
+        with patch.object(self.matcher, "lookup",
+                          wraps=self.matcher.lookup) as lookup:
+            self.assertEqual(self.cache.lookup(self.matcher, "Oxblood"),
+                             self.oxblood)
+            self.assertEqual(self.cache.lookup(self.matcher, " OXBLOOD "),
+                             self.oxblood)
+            self.assertIsNone(self.cache.lookup(self.matcher, "unknown"))
+            self.assertIsNone(self.cache.lookup(self.matcher, "Unknown"))
+            self.assertEqual(lookup.call_count, 2)
+
+        stats = self.cache.stats()
+        self.assertEqual((stats.hits, stats.misses, stats.size), (2, 2, 2))
+        self.assertEqual(stats.hit_rate, 0.5)
+
+    def test_least_recently_used_is_evicted(self):
+        """Test that the oldest term is dropped when the cache is full."""
+        self.cache.lookup(self.matcher, "a")
+        self.cache.lookup(self.matcher, "b")
+        self.cache.lookup(self.matcher, "a")
+        self.cache.lookup(self.matcher, "c")
+
+        self.assertEqual(list(self.cache.entries), ["a", "c"])
+        self.assertEqual(self.cache.stats().evictions, 1)
+
+    def test_clear(self):
+        """Test that clearing forgets everything and is counted."""
+        self.cache.lookup(self.matcher, "oxblood")
+        self.cache.clear()
+
+        self.assertEqual(len(self.cache), 0)
+        self.assertEqual(self.cache.stats().invalidations, 1)
@@ -0,0 +1,77 @@
+"""Unittests for the persistent index of the Inkcyclopedia."""
+
+import os
+import tempfile
+import unittest
+
+from mrfreeze.cogs.inkcyclopedia import index, sync
+
+
+class IndexUnitTest(unittest.TestCase):
+    """Test loading and rebuilding of the ink index."""
+
+    def setUp(self):
+        """Write a small CSV file to build the index from."""
+        self.directory = tempfile.TemporaryDirectory()
+        self.csv_path = os.path.join(self.directory.name, "inks.csv")
+        self.index_path = os.path.join(self.directory.name, "inks.idx")
+        self.write_csv([
+            sync.InkRow("Diamine Oxblood", r"diamine\s*oxblood", "ox.jpg"),
+            sync.InkRow("Pilot Kon-peki", r"kon-?peki", "kon.jpg"),
+        ])
+
+    def tearDown(self):
+        """Remove the files."""
+        self.directory.cleanup()
+
+    def write_csv(self, rows):
+        """Replace the contents of the CSV file."""
+        sync.write_rows(self.csv_path, "utf-8-sig", rows)
+
+    def load(self, previous=None):
+        """Load the matcher through the index."""
+        return index.load_matcher(
+            self.index_path, self.csv_path, "utf-8-sig", previous)
+
+    def test_index_is_built_then_reused(self):
+        """Test that the index is only built the first time."""
+        _, first = self.load()
+        matcher, second = self.load()
+
+        self.assertTrue(first.rebuilt)
+        self.assertFalse(second.rebuilt)
+        self.assertEqual(second.size, os.path.getsize(self.index_path))
+        self.assertEqual(matcher.lookup("konpeki").name, "Pilot Kon-peki")
+
+    def test_loaded_index_compiles_lazily(self):
+        """Test that no regex is compiled until it's needed."""
+        self.load()
+        matcher, _ = self.load()
+        self.assertEqual(matcher.regexes, [None, None])
+
+        matcher.lookup("diamine oxblood")
+        self.assertIsNone(matcher.regexes[1])
+        self.assertIsNotNone(matcher.regexes[0])
+
+    def test_changed_csv_rebuilds_index(self):
+        """Test that the index is rebuilt when the CSV changes."""
+        old, _ = self.load()
+        old.lookup("diamine oxblood")
+        self.write_csv([
+            sync.InkRow("Diamine Oxblood", r"diamine\s*oxblood", "ox.jpg"),
+        ])
+        matcher, stats = self.load(previous=old)
+
+        self.assertTrue(stats.rebuilt)
+        self.assertEqual(len(matcher), 1)
+        self.assertIs(matcher.regexes[0], old.regexes[0])
+
+    def test_corrupt_index_is_rebuilt(self):
+        """Test that an unreadable index is rebuilt rather than used."""
+        self.load()
+        with open(self.index_path, "wb") as index_file:
+            index_file.write(b"garbage")
+        matcher, stats = self.load()
+
+        self.assertTrue(stats.rebuilt)
+        self.assertEqual(len(matcher), 2)
@@ -0,0 +1,126 @@
+"""Unittests for the replies of the Inkcyclopedia cog."""
+
+import asyncio
+import re
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from mrfreeze.cogs.inkcyclopedia import inkcyclopedia
+from mrfreeze.cogs.inkcyclopedia.matcher import InkMatcher, InkyTuple
+from mrfreeze.pipeline import Feature, MessagePipeline
+
+from tests import helpers
+
+
+def ink(name, regex):
+    """Create an ink with a picture named after it."""
+    return InkyTuple(name, f"https://i.imgur.com/{name[:3]}.jpg",
+                     re.compile(regex, re.IGNORECASE))
+
+
+class ResolveUnitTest(unittest.TestCase):
+    """Test looking up all the terms of a message at once."""
+
+    def setUp(self):
+        """Create a matcher with a few inks."""
+        self.oxblood = ink("Diamine Oxblood", r"diamine\s*ox\s*blood")
+        self.konpeki = ink("Iroshizuku Kon-peki", r"kon-?peki")
+        self.matcher = InkMatcher([self.oxblood, self.konpeki])
+
+    def test_every_term_is_resolved(self):
+        """Test that all inks are found, in the order they were given."""
+        inks, missed = inkcyclopedia.resolve(
+            self.matcher, ["Kon-peki", "unknown", "Diamine Oxblood"])
+        self.assertEqual([i.name for i in inks],
+                         ["Iroshizuku Kon-peki", "Diamine Oxblood"])
+        self.assertEqual(missed, ["unknown"])
+
+    def test_duplicates_are_removed(self):
+        """Test that terms and inks are only included once."""
+        inks, missed = inkcyclopedia.resolve(
+            self.matcher, ["konpeki", " KONPEKI ", "kon-peki", "x", "X"])
+        self.assertEqual([i.name for i in inks], ["Iroshizuku Kon-peki"])
+        self.assertEqual(missed, ["x"])
+
+    def test_embed(self):
+        """Test that several inks share one embed with one image."""
+        embed = inkcyclopedia.ink_embed([self.oxblood])
+        self.assertEqual(embed.image.url, self.oxblood.url)
+        self.assertEqual(len(embed.fields), 0)
+
+        embed = inkcyclopedia.ink_embed([self.oxblood, self.konpeki])
+        self.assertEqual(embed.image.url, self.oxblood.url)
+        self.assertEqual([f.name for f in embed.fields],
+                         ["Diamine Oxblood", "Iroshizuku Kon-peki"])
+
+    def test_join_names(self):
+        """Test listing names in a reply."""
+        self.assertEqual(inkcyclopedia.join_names(["A"]), "**A**")
+        self.assertEqual(inkcyclopedia.join_names(["A", "B", "C"], "or"),
+                         "**A**, **B** or **C**")
+
+
+class EditUnitTest(unittest.TestCase):
+    """Test replying to inks in edited messages."""
+
+    def setUp(self):
+        """Set up the cog and a message with an ink."""
+        quiet = patch("builtins.print")
+        quiet.start()
+        self.addCleanup(quiet.stop)
+
+        self.directory = tempfile.TemporaryDirectory()
+        self.bot = helpers.MockMrFreeze()
+        self.bot.db_prefix = self.directory.name
+        self.cog = inkcyclopedia.Inkcyclopedia(self.bot)
+        self.addCleanup(self.cog.search_conn.close)
+        self.cog.matcher = InkMatcher([
+            ink("Diamine Oxblood", r"diamine\s*ox\s*blood"),
+            ink("Iroshizuku Kon-peki", r"kon-?peki")])
+        self.message = helpers.MockMessage(content="try {diamine oxblood}")
+
+    def tearDown(self):
+        """Remove the search database."""
+        self.directory.cleanup()
+
+    def dispatch(self, before=None):
+        """Run the ink stage on the message, edited from before if given."""
+        view = MessagePipeline.build_view(
+            self.message, helpers.MockContext(), Feature.INK, before)
+        asyncio.run(self.cog.ink_stage(view))
+
+    def edit(self, content):
+        """Edit the message to content."""
+        before = self.message.content
+        self.message.content = content
+        self.dispatch(before)
+
+    def test_unchanged_edit_is_ignored(self):
+        """Test that an edit without new terms doesn't touch the reply."""
+        self.dispatch()
+        reply = self.message.channel.send.return_value
+        self.edit("try {Diamine Oxblood} today")
+        reply.edit.assert_not_called()
+        self.message.channel.send.assert_called_once()
+
+    def test_reply_is_edited(self):
+        """Test that a new term is added to the earlier reply."""
+        self.dispatch()
+        self.message.channel.send.assert_called_once()
+        reply = self.message.channel.send.return_value
+
+        self.edit("try {diamine oxblood} or {kon-peki}")
+        reply.edit.assert_called_once()
+        self.assertEqual(
+            reply.edit.call_args.kwargs["content"],
+            "Found a match for **Diamine Oxblood** and " +
+            "**Iroshizuku Kon-peki**!")
+        self.message.channel.send.assert_called_once()
+
+    def test_edit_without_earlier_reply(self):
+        """Test that only new terms are replied to without a reply."""
+        self.edit("try {diamine oxblood} or {kon-peki}")
+        self.message.channel.send.assert_called_once()
+        self.assertEqual(self.message.channel.send.call_args.args[0],
+                         "Found a match for **Iroshizuku Kon-peki**!")
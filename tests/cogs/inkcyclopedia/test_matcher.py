@@ -0,0 +1,78 @@
+"""Unittests for the combined ink matcher of the Inkcyclopedia."""
+
+import re
+import unittest
+
+from mrfreeze.cogs.inkcyclopedia import matcher
+from mrfreeze.cogs.inkcyclopedia.matcher import InkMatcher, InkyTuple
+
+
+def ink(name, regex):
+    """Create an InkyTuple the way update_db does."""
+    return InkyTuple(name, f"{name}.jpg", re.compile(regex, re.IGNORECASE))
+
+
+class LiteralPrefixUnitTest(unittest.TestCase):
+    """Test the extraction of literal prefixes from ink regexes."""
+
+    def test_separators_are_skipped(self):
+        """Test that whitespace and dashes don't end the prefix."""
+        self.assertEqual(
+            matcher.literal_prefix(r"diamine\s*ox-?blood"),
+            "diamineoxblood")
+        self.assertEqual(
+            matcher.literal_prefix(r"^\bsailor[-\s]+jentle"),
+            "sailorjentle")
+
+    def test_optional_characters_end_the_prefix(self):
+        """Test that the prefix stops before optional letters."""
+        self.assertEqual(matcher.literal_prefix(r"noodlers?\s*black"),
+                         "noodler")
+        self.assertEqual(matcher.literal_prefix(r"iro(shizuku)?"), "iro")
+
+    def test_no_prefix(self):
+        """Test patterns which don't start with any literal text."""
+        self.assertEqual(matcher.literal_prefix(r"\w+ink"), "")
+        self.assertEqual(matcher.literal_prefix(r"diamine|noodlers"), "")
+        self.assertEqual(matcher.literal_prefix(r"[a-z]+"), "")
+
+
+class InkMatcherUnitTest(unittest.TestCase):
+    """Test lookups in the combined ink matcher."""
+
+    def setUp(self):
+        """Create a small catalogue."""
+        self.inks = [
+            ink("Diamine Oxblood", r"diamine\s*ox\s*blood"),
+            ink("Diamine Oxford Blue", r"diamine\s*oxford\s*blue"),
+            ink("Iroshizuku Kon-peki", r"(iroshizuku\s*)?kon-?peki"),
+            ink("Any Oxblood", r"ox\s*blood"),
+        ]
+        self.matcher = InkMatcher(self.inks)
+
+    def test_lookup_finds_ink(self):
+        """Test that terms resolve to the right ink."""
+        self.assertEqual(self.matcher.lookup("Diamine Oxford Blue").name,
+                         "Diamine Oxford Blue")
+        self.assertEqual(self.matcher.lookup("konpeki").name,
+                         "Iroshizuku Kon-peki")
+
+    def test_lookup_miss(self):
+        """Test that unknown terms resolve to nothing."""
+        self.assertIsNone(self.matcher.lookup("pilot blue black"))
+
+    def test_lowest_index_wins(self):
+        """Test that the catalogue order decides between several hits."""
+        self.assertEqual(self.matcher.lookup("diamine oxblood").name,
+                         "Diamine Oxblood")
+        self.assertEqual(self.matcher.lookup("the ox blood").name,
+                         "Any Oxblood")
+
+    def test_agrees_with_looping_over_all_inks(self):
+        """Test that the matcher gives the same result as a plain loop."""
+        terms = ["diamine oxblood", "kon-peki", "oxblood", "nothing",
+                 "DIAMINE  OXFORD BLUE", "iroshizuku konpeki", "ox"]
+        for term in terms:
+            expected = next(
+                (i for i in self.inks if i.regex.search(term)), None)
+            self.assertEqual(self.matcher.lookup(term), expected, msg=term)
@@ -0,0 +1,140 @@
+"""Unittests for the screening of ink regexes."""
+
+import re
+import time
+import unittest
+
+from mrfreeze.cogs.inkcyclopedia import safety
+from mrfreeze.cogs.inkcyclopedia.matcher import InkMatcher
+
+
+class CheckPatternUnitTest(unittest.TestCase):
+    """Test the categorisation of ink regexes."""
+
+    def category(self, pattern):
+        """Get the category of pattern."""
+        return safety.check_pattern(pattern, re.IGNORECASE).category
+
+    def test_ordinary_patterns_are_safe(self):
+        """Test that typical ink regexes are considered safe."""
+        for pattern in (r"diamine\s*oxblood", r"iro(shizuku)?\s*kon-?peki",
+                        r"(?:\s|-)*sailor", r"a{1,5}b"):
+            self.assertEqual(self.category(pattern), safety.SAFE, pattern)
+
+    def test_nested_quantifiers_are_rejected(self):
+        """Test that exponential backtracking patterns are rejected."""
+        for pattern in (r"(a+)+b", r"(\w*\s?)*x", r"((ab)*c)*"):
+            self.assertEqual(self.category(pattern), safety.REJECTED, pattern)
+
+    def test_bounded_repeat_of_unbounded_is_rejected(self):
+        """Test that a counted repeat around a quantifier is nested too."""
+        for pattern in (r"(a+){10}$", r"(?:\s*x){2,5}", r"(a*b){2}"):
+            self.assertEqual(self.category(pattern), safety.REJECTED, pattern)
+        self.assertEqual(self.category(r"(?:ab){2}c+"), safety.SAFE)
+
+    def test_overlapping_alternatives_are_rejected(self):
+        """Test that alternatives starting alike under a repeat are out."""
+        for pattern in (r"(a|a)+$", r"(?:a|ab)*c", r"(ab|\wc)+y",
+                        r"(a|a){20}"):
+            self.assertEqual(self.category(pattern), safety.REJECTED, pattern)
+
+    def test_varying_repeat_inside_repeat_is_rejected(self):
+        """Test that an optional piece inside a repeat counts as nested."""
+        for pattern in (r"(x?\w)+y", r"(?:a\s?)*b", r"(?:ab?){3}"):
+            self.assertEqual(self.category(pattern), safety.REJECTED, pattern)
+        self.assertEqual(self.category(r"(?:ab{2})+c"), safety.SAFE)
+
+    def test_overlap_ignores_case(self):
+        """Test that alternatives differing only in case overlap."""
+        self.assertEqual(self.category(r"(?:ab|AB)+c"), safety.REJECTED)
+        self.assertEqual(safety.check_pattern(r"(?i)(?:ab|AB)+c").category,
+                         safety.REJECTED)
+        self.assertEqual(safety.check_pattern(r"(?:ab|AB)+c").category,
+                         safety.SAFE)
+        self.assertEqual(self.category(r"a*A*x"), safety.GUARDED)
+
+    def test_broken_patterns_are_rejected(self):
+        """Test that patterns which don't compile are rejected."""
+        verdict = safety.check_pattern(r"(unclosed")
+        self.assertEqual(verdict.category, safety.REJECTED)
+        self.assertIn("compile", verdict.reason)
+
+    def test_overlapping_quantifiers_are_guarded(self):
+        """Test that polynomial backtracking patterns are guarded."""
+        for pattern in (r"\s*\s*x", r".*.*=.*", r"a*a*a*a*a*a*b"):
+            self.assertEqual(self.category(pattern), safety.GUARDED, pattern)
+
+    def test_safe_patterns_have_a_term_limit(self):
+        """Test that safe patterns are limited to bracketed term length."""
+        verdict = safety.check_pattern(r"diamine\s*oxblood")
+        self.assertEqual(verdict.max_term, safety.MAX_TERM)
+
+    def test_term_limit_fits_the_budget(self):
+        """Test that guarded patterns are fast on the longest allowed term."""
+        for pattern in (r"\s*\s*x", r"a*a*a*a*b", r"a*a*a*a*a*a*b"):
+            verdict = safety.check_pattern(pattern)
+            self.assertLessEqual(verdict.max_term, safety.MAX_GUARDED_TERM)
+            term = " " * verdict.max_term if "s" in pattern \
+                else "a" * verdict.max_term
+            start = time.perf_counter()
+            re.search(pattern, term)
+            self.assertLess(time.perf_counter() - start,
+                            safety.SEARCH_BUDGET, pattern)
+        self.assertLess(safety.check_pattern(r"a*a*a*a*a*a*b").max_term,
+                        safety.check_pattern(r"\s*\s*x").max_term)
+
+
+class MatcherSafetyUnitTest(unittest.TestCase):
+    """Test how the matcher treats unsafe inks."""
+
+    def setUp(self):
+        """Create a matcher with one ink of each category."""
+        self.matcher = InkMatcher.from_rows([
+            ("Evil Ink", "evil.jpg", r"(e+)+vil"),
+            ("Slow Ink", "slow.jpg", r"slow.*.*ink"),
+            ("Safe Ink", "safe.jpg", r"safe\s*ink"),
+        ])
+
+    def test_rejected_inks_are_never_matched(self):
+        """Test that rejected inks are listed and left out of lookups."""
+        self.assertEqual([name for (name, _) in self.matcher.rejected],
+                         ["Evil Ink"])
+        self.assertIsNone(self.matcher.lookup("eeevil"))
+
+    def test_guarded_inks_only_match_short_terms(self):
+        """Test that guarded inks aren't run on long terms."""
+        self.assertEqual(self.matcher.lookup("slow ink").name, "Slow Ink")
+        long_term = "slow " + "x" * safety.MAX_GUARDED_TERM + " ink"
+        self.assertIsNone(self.matcher.lookup(long_term))
+        self.assertEqual(self.matcher.lookup("safe ink").name, "Safe Ink")
+
+    def test_slow_guarded_inks_are_not_run(self):
+        """Test that a guarded ink is skipped on terms it'd be slow on."""
+        matcher = InkMatcher.from_rows([
+            ("Slow Ink", "slow.jpg", r"a*a*a*a*a*a*b")])
+        start = time.perf_counter()
+        self.assertIsNone(matcher.lookup("a" * 30))
+        self.assertLess(time.perf_counter() - start, safety.SEARCH_BUDGET)
+        self.assertEqual(matcher.lookup("aab").name, "Slow Ink")
+
+    def test_case_insensitive_alternatives_are_never_run(self):
+        """Test that (?:ab|AB)+c can't block a lookup."""
+        matcher = InkMatcher.from_rows([("Case Ink", "c.jpg", r"(?:ab|AB)+c")])
+        start = time.perf_counter()
+        self.assertIsNone(matcher.lookup("ab" * 23 + "x"))
+        self.assertLess(time.perf_counter() - start, safety.SEARCH_BUDGET)
+        self.assertEqual([name for (name, _) in matcher.rejected],
+                         ["Case Ink"])
+
+    def test_long_terms_are_never_searched(self):
+        """Test that no ink is run on terms beyond its limit."""
+        self.assertEqual(self.matcher.lookup("safe ink").name, "Safe Ink")
+        long_term = "safe" + " " * safety.MAX_TERM + "ink"
+        self.assertIsNone(self.matcher.lookup(long_term))
+
+    def test_state_keeps_verdicts(self):
+        """Test that guarded and rejected inks survive a round trip."""
+        copy = InkMatcher.from_state(self.matcher.state())
+        self.assertEqual(copy.guarded, self.matcher.guarded)
+        self.assertEqual(copy.limits, self.matcher.limits)
+        self.assertEqual(copy.rejected, self.matcher.rejected)
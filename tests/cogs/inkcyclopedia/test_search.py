@@ -0,0 +1,51 @@
+"""Unittests for the full-text search of the Inkcyclopedia."""
+
+import unittest
+
+from mrfreeze.cogs.inkcyclopedia import search
+
+
+class SearchUnitTest(unittest.TestCase):
+    """Test building and querying the search table."""
+
+    def setUp(self):
+        """Build a search table in memory."""
+        self.conn = search.connect(":memory:")
+        self.rows = [
+            ("Diamine Oxblood", "oxblood.jpg"),
+            ("Diamine Oxford Blue", "oxford.jpg"),
+            ("Diamine Ancient Copper", "copper.jpg"),
+            ("Noodler's Oxblood", "noodler.jpg"),
+        ]
+        search.build_search(self.conn, self.rows, "hash")
+
+    def tearDown(self):
+        """Close the connection."""
+        self.conn.close()
+
+    def names(self, terms):
+        """Get the names of the search results for terms."""
+        return [result.name for result in search.search(self.conn, terms)]
+
+    def test_prefix_search(self):
+        """Test that the words of a query may be beginnings of words."""
+        self.assertEqual(sorted(self.names("diamine ox")),
+                         ["Diamine Oxblood", "Diamine Oxford Blue"])
+
+    def test_all_words_must_match(self):
+        """Test that every word of the query has to be found."""
+        self.assertEqual(self.names("noodler oxblood"), ["Noodler's Oxblood"])
+        self.assertEqual(self.names("diamine pink"), [])
+
+    def test_query_syntax_is_escaped(self):
+        """Test that FTS5 syntax in the query is treated as plain text."""
+        self.assertEqual(self.names('"ox* OR NEAR('), [])
+        self.assertEqual(self.names(""), [])
+
+    def test_rebuild_only_when_hash_changes(self):
+        """Test that the table is only rebuilt for a new CSV."""
+        self.assertFalse(search.build_search(self.conn, [], "hash"))
+        self.assertEqual(len(self.names("diamine")), 3)
+
+        self.assertTrue(search.build_search(self.conn, [], "new hash"))
+        self.assertEqual(self.names("diamine"), [])
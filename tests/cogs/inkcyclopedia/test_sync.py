@@ -0,0 +1,158 @@
+"""Unittests for syncing the Inkcyclopedia against a fake Airtable."""
+
+import csv
+import json
+import os
+import re
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from airtable.airtable import Airtable
+
+from mrfreeze.cogs.inkcyclopedia import sync
+
+
+class FakeAirtable(BaseHTTPRequestHandler):
+    """Serve the records of the server's table like Airtable would."""
+
+    def do_GET(self):  # noqa: N802
+        """Answer a list records request."""
+        query = parse_qs(urlparse(self.path).query)
+        records = self.server.records
+        self.server.requests.append(query)
+
+        if "filterByFormula" in query:
+            wanted = re.findall(r"RECORD_ID\(\)='(\w+)'",
+                                query["filterByFormula"][0])
+            records = [r for r in records if r["id"] in wanted]
+
+        if "fields[]" in query:
+            fields = query["fields[]"]
+            records = [
+                {"id": r["id"], "createdTime": r["createdTime"],
+                 "fields": {k: v for k, v in r["fields"].items()
+                            if k in fields}}
+                for r in records
+            ]
+
+        body = json.dumps({"records": records}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        """Keep the test output clean."""
+        pass
+
+
+def record(record_id, name, modified, url="https://i.imgur.com/ink.jpg"):
+    """Create an Airtable record of an ink."""
+    return {
+        "id": record_id,
+        "createdTime": "2020-01-01T00:00:00.000Z",
+        "fields": {
+            "Ink Name": name,
+            "RegEx": name.lower().replace(" ", r"\s*"),
+            "Inkbot version": url,
+            "Last Modified": modified}}
+
+
+class SyncUnitTest(unittest.TestCase):
+    """Test the incremental sync of the Inkcyclopedia."""
+
+    def setUp(self):
+        """Start a fake Airtable and point an Airtable instance at it."""
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), FakeAirtable)
+        self.server.records = [
+            record("rec1", "Diamine Oxblood", "1"),
+            record("rec2", "Sailor Jentle Yama-dori", "1"),
+            record("rec3", "Placeholder", "1", url="https://i.imgur.com/N38sjv2.jpg"),
+        ]
+        self.server.requests = list()
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.start()
+
+        host, port = self.server.server_address
+        self.airtable = Airtable("base", "table", api_key="key")
+        self.airtable.API_LIMIT = 0
+        self.airtable.url_table = f"http://{host}:{port}/v0/base/table"
+
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "inkcyclopedia.csv")
+
+    def tearDown(self):
+        """Stop the fake Airtable and remove the files."""
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+        self.airtable.session.close()
+        self.directory.cleanup()
+
+    def sync(self):
+        """Run a sync against the fake Airtable."""
+        return sync.sync(self.airtable, self.path, "utf-8-sig",
+                         "Last Modified")
+
+    def test_first_sync_fetches_everything(self):
+        """Test that a sync without a local file fetches all records."""
+        result = self.sync()
+        rows = sync.read_rows(self.path, "utf-8-sig")
+
+        self.assertEqual(result.fetched, 3)
+        self.assertEqual(result.total, 2)
+        self.assertEqual([row.name for row in rows if row.usable],
+                         ["Diamine Oxblood", "Sailor Jentle Yama-dori"])
+
+    def test_unchanged_sync_fetches_nothing(self):
+        """Test that a second sync only lists the records."""
+        self.sync()
+        self.server.requests.clear()
+        result = self.sync()
+
+        self.assertFalse(result.changed)
+        self.assertEqual(len(self.server.requests), 1)
+        self.assertIn("fields[]", self.server.requests[0])
+
+    def test_only_changed_records_are_fetched(self):
+        """Test that modified and new records are fetched by ID."""
+        self.sync()
+        self.server.records[0] = record("rec1", "Diamine Ox Blood", "2")
+        self.server.records.append(record("rec4", "Pilot Kon-peki", "1"))
+        self.server.requests.clear()
+        result = self.sync()
+
+        self.assertEqual(result.fetched, 2)
+        formula = self.server.requests[1]["filterByFormula"][0]
+        self.assertIn("rec1", formula)
+        self.assertIn("rec4", formula)
+        self.assertNotIn("rec2", formula)
+
+        names = [row.name for row in sync.read_rows(self.path, "utf-8-sig")]
+        self.assertEqual(names[0], "Diamine Ox Blood")
+        self.assertEqual(names[-1], "Pilot Kon-peki")
+
+    def test_deleted_records_are_removed(self):
+        """Test that records no longer in Airtable disappear locally."""
+        self.sync()
+        del self.server.records[1]
+        result = self.sync()
+
+        self.assertEqual(result.removed, 1)
+        ids = [row.record_id for row in sync.read_rows(self.path, "utf-8-sig")]
+        self.assertEqual(ids, ["rec1", "rec3"])
+
+    def test_failed_write_keeps_old_file(self):
+        """Test that the old file survives a failed write."""
+        sync.write_rows(self.path, "utf-8-sig",
+                        [sync.InkRow("Ink", "ink", "url")])
+        with self.assertRaises(csv.Error):
+            sync.write_rows(self.path, "utf-8-sig", [object()])
+
+        rows = sync.read_rows(self.path, "utf-8-sig")
+        self.assertEqual(rows, [sync.InkRow("Ink", "ink", "url")])
+        self.assertEqual(os.listdir(self.directory.name),
+                         ["inkcyclopedia.csv"])
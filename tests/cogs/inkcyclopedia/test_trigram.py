@@ -0,0 +1,55 @@
+"""Unittests for the trigram index of ink names."""
+
+import unittest
+
+from mrfreeze.cogs.inkcyclopedia import trigram
+from mrfreeze.cogs.inkcyclopedia.trigram import TrigramIndex
+
+
+class TrigramUnitTest(unittest.TestCase):
+    """Test suggesting ink names for terms that didn't match."""
+
+    def setUp(self):
+        """Index a few ink names."""
+        self.index = TrigramIndex([
+            "Diamine Oxblood",
+            "Diamine Oxford Blue",
+            "Pilot Iroshizuku Kon-peki",
+            "Sailor Jentle Yama-dori",
+        ])
+
+    def names(self, term, **kwargs):
+        """Get the names suggested for term."""
+        return [s.name for s in self.index.suggest(term, **kwargs)]
+
+    def test_trigrams(self):
+        """Test that words are padded, lower cased and stripped."""
+        self.assertEqual(trigram.trigrams("Ox-b"),
+                         {"  o", " ox", "oxb", "xb "})
+        self.assertEqual(trigram.trigrams("  - "), frozenset())
+
+    def test_misspelt_names_are_suggested(self):
+        """Test that the closest name comes first."""
+        self.assertEqual(self.names("diamine oxblod")[0], "Diamine Oxblood")
+        self.assertEqual(self.names("iroshizuku konpeki"),
+                         ["Pilot Iroshizuku Kon-peki"])
+
+    def test_suggestions_are_limited(self):
+        """Test the number of suggestions and the threshold."""
+        self.assertEqual(len(self.names("diamine ox", limit=1)), 1)
+        self.assertEqual(self.names("diamine ox", threshold=0.99), [])
+        self.assertEqual(self.names("completely unknown"), [])
+        self.assertEqual(self.names(""), [])
+
+    def test_similarity_is_dice(self):
+        """Test that an exact name is a perfect match."""
+        best = self.index.suggest("sailor jentle yama-dori")[0]
+        self.assertEqual(best, trigram.Suggestion(
+            "Sailor Jentle Yama-dori", 1.0))
+
+    def test_common_trigrams_hide_nothing(self):
+        """Test that the best name is found behind very common trigrams."""
+        names = [f"Abc Q{number}" for number in range(400)] + \
+            [f"Xyz R{number}" for number in range(410)] + ["Xyz"]
+        best = TrigramIndex(names).suggest("abc xyz", limit=1)
+        self.assertEqual(best, [trigram.Suggestion("Xyz", 8 / 12)])
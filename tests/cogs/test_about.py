@@ -2,9 +2,11 @@
 
 import asyncio
 import unittest
+from types import SimpleNamespace
 
 import discord
 
+from mrfreeze.assets import AssetCache
 from mrfreeze.cogs.about import About
 
 from tests import helpers
@@ -21,12 +23,26 @@ class AboutCogUnitTest(unittest.TestCase):
         self.bot.user.name = self.botname
         self.bot.user.id = self.bot_id
 
+        self.bot.assets = AssetCache()
         self.cog = About(self.bot)
 
         self.ctx = helpers.MockContext()
+        self.ctx.send.side_effect = self.uploaded
+
 
         self.mrfreeze_blue = discord.Color(0x00dee9)
 
+    @staticmethod
+    def uploaded(content=None, *, embed=None, file=None):
+        """Answer a send with a message holding the uploaded file, if any."""
+        attachments = list()
+        if file is not None:
+            attachments.append(SimpleNamespace(
+                filename=file.filename,
+                url="https://cdn.discordapp.com/attachments/1/2/" +
+                    file.filename))
+        return SimpleNamespace(id=1, attachments=attachments)
+
     def test_readme_embed_and_file(self):
         """Test !readme in the About cog."""
         # Run and assert that it doesn't return anything
@@ -79,6 +95,14 @@ class AboutCogUnitTest(unittest.TestCase):
         # Assert that the file is readable
         self.assertTrue(kwargs["file"].fp.readable())
 
+        # The second time the uploaded image is reused
+        asyncio.run(self.cog.readme.callback(self.cog, self.ctx))
+        _, kwargs = self.ctx.send.call_args
+        self.assertNotIn("file", kwargs)
+        self.assertEqual(
+            kwargs["embed"].thumbnail.url,
+            "https://cdn.discordapp.com/attachments/1/2/readme.png")
+
     def test_source_embed_and_file(self):
         """Test !source in the About cog."""
         # Run and assert that it doesn't return anything
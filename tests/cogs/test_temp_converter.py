@@ -0,0 +1,250 @@
+"""Unittests for the temperature converter."""
+
+import asyncio
+import unittest
+from unittest.mock import patch
+
+from mrfreeze.cogs import temp_converter
+from mrfreeze.cogs.temp_converter import TempStatement, TempUnit
+from mrfreeze.cogs.temp_converter import format_unit_roles, parse_unit_roles
+from mrfreeze.cogs.temp_converter import TemperatureConverter
+from mrfreeze.cogs.temp_converter import convert, scan_temperatures
+
+from tests import helpers
+
+
+class ScanTemperaturesUnitTest(unittest.TestCase):
+    """Test finding temperature statements in messages."""
+
+    def test_every_statement_is_found(self):
+        """Test that all statements are found, in order."""
+        self.assertEqual(
+            scan_temperatures("it was 20C this morning and 31,5 °F now"),
+            [TempStatement(20.0, TempUnit.C, None),
+             TempStatement(31.5, TempUnit.F, None)])
+
+    def test_conversion_is_asked_for(self):
+        """Test that "in/to/as <unit>" is picked up with the statement."""
+        # The unit has to end at whitespace, just like the statement.
+        statements = scan_temperatures("what's 300 kelvin as rankine?")
+        self.assertEqual(statements,
+                         [TempStatement(300.0, TempUnit.K, None)])
+
+        statements = scan_temperatures("what's 300 kelvin as rankine")
+        self.assertEqual(statements,
+                         [TempStatement(300.0, TempUnit.K, TempUnit.R)])
+        self.assertTrue(statements[0].manual)
+
+        statements = scan_temperatures("70 freedom units convert to c ok")
+        self.assertEqual(statements,
+                         [TempStatement(70.0, TempUnit.F, TempUnit.C)])
+
+    def test_negative_temperatures(self):
+        """Test that a minus sign has to start a word."""
+        self.assertEqual(scan_temperatures("-5c -7 f"),
+                         [TempStatement(-5.0, TempUnit.C, None),
+                          TempStatement(-7.0, TempUnit.F, None)])
+        self.assertEqual(scan_temperatures("a-5c"),
+                         [TempStatement(5.0, TempUnit.C, None)])
+
+    def test_kelvin_and_degrees(self):
+        """Test kelvin needing a space and degrees not having a unit."""
+        self.assertEqual(scan_temperatures("I paid 5k for it"), list())
+        self.assertEqual(scan_temperatures("it's 5 k"),
+                         [TempStatement(5.0, TempUnit.K, None)])
+        self.assertEqual(scan_temperatures("it's 25 degrees"),
+                         [TempStatement(25.0, None, None)])
+
+    def test_long_numbers(self):
+        """Test that numbers are read whole and long runs don't match."""
+        self.assertEqual(scan_temperatures("1,11,11c 123456 f"),
+                         [TempStatement(11.11, TempUnit.C, None),
+                          TempStatement(123456.0, TempUnit.F, None)])
+        self.assertEqual(scan_temperatures("9" * 5000), list())
+
+
+class ConvertUnitTest(unittest.TestCase):
+    """Test the conversions between units."""
+
+    def test_known_temperatures(self):
+        """Test some well known temperatures in every unit."""
+        known = [
+            {TempUnit.C: 0, TempUnit.F: 32, TempUnit.K: 273.15,
+             TempUnit.R: 491.67},
+            {TempUnit.C: 100, TempUnit.F: 212, TempUnit.K: 373.15,
+             TempUnit.R: 671.67},
+            {TempUnit.C: -40, TempUnit.F: -40, TempUnit.K: 233.15,
+             TempUnit.R: 419.67},
+        ]
+        for temperatures in known:
+            for origin, temperature in temperatures.items():
+                for destination, expected in temperatures.items():
+                    self.assertAlmostEqual(
+                        convert(temperature, origin, destination), expected,
+                        msg=f"{temperature}{origin} to {destination}")
+
+
+class TemperatureConverterUnitTest(unittest.TestCase):
+    """Test the replies of the temperature converter."""
+
+    def setUp(self):
+        """Set up the cog and a message in DMs."""
+        self.bot = helpers.MockMrFreeze()
+        self.cog = TemperatureConverter(self.bot)
+        self.ctx = helpers.MockContext()
+        self.ctx.guild = None
+        self.ctx.author.mention = "@user"
+
+    def test_every_statement_is_converted(self):
+        """Test that several statements are converted in one reply."""
+        self.ctx.message.content = "it was 20C this morning and 31C now"
+        conversions = self.cog.parse_request(self.ctx)
+        self.assertEqual([(c.destination, round(c.converted, 2))
+                          for c in conversions],
+                         [(TempUnit.F, 68.0), (TempUnit.F, 87.8)])
+
+        lines = [self.cog.describe(c, "@user") for c in conversions]
+        self.assertEqual(lines, ["20.0°C is around 68.0°F",
+                                 "31.0°C is around 87.8°F"])
+
+    def test_degrees_and_duplicates(self):
+        """Test that degrees are celsius in DMs and repeats are dropped."""
+        self.ctx.message.content = "25 degrees or 25 degrees and 10 f to k"
+        conversions = self.cog.parse_request(self.ctx)
+        self.assertEqual([(c.origin, c.destination, c.manual)
+                          for c in conversions],
+                         [(TempUnit.C, TempUnit.F, False),
+                          (TempUnit.F, TempUnit.K, True)])
+
+
+class UnitRolesUnitTest(unittest.TestCase):
+    """Test working out what unit someone means by degrees."""
+
+    def setUp(self):
+        """Set up a server with a couple of unit roles."""
+        self.celsius = helpers.MockRole(name="Celsius")
+        self.america = helpers.MockRole(name="North America")
+        self.guild = helpers.MockGuild(roles=[self.celsius, self.america])
+
+        self.bot = helpers.MockMrFreeze()
+        self.bot.read_server_setting.return_value = False
+        self.cog = TemperatureConverter(self.bot)
+
+        self.ctx = helpers.MockContext()
+        self.ctx.guild = self.guild
+        self.ctx.author = helpers.MockMember(roles=[self.america])
+
+    def test_default_roles(self):
+        """Test the roles used when a server hasn't picked its own."""
+        self.assertEqual(self.cog.degrees_unit(self.ctx), TempUnit.F)
+
+        self.ctx.author.roles.append(self.celsius)
+        self.cog.member_units.clear()
+        self.assertEqual(self.cog.degrees_unit(self.ctx), TempUnit.C)
+
+    def test_members_are_cached_until_roles_change(self):
+        """Test that a member is only resolved once per role change."""
+        before = helpers.MockMember(roles=[self.america])
+        before.guild = self.guild
+        after = self.ctx.author
+        after.guild = self.guild
+
+        self.assertEqual(self.cog.degrees_unit(self.ctx), TempUnit.F)
+        after.roles = [self.celsius]
+        self.assertEqual(self.cog.degrees_unit(self.ctx), TempUnit.F)
+
+        asyncio.run(self.cog.on_member_update(before, after))
+        self.assertEqual(self.cog.degrees_unit(self.ctx), TempUnit.C)
+
+    def test_server_setting(self):
+        """Test unit roles picked by the server."""
+        self.bot.read_server_setting.return_value = \
+            f"{self.america.id}:K,{self.celsius.id}:R"
+        self.assertEqual(self.cog.degrees_unit(self.ctx), TempUnit.K)
+
+        self.ctx.author = helpers.MockMember()
+        self.assertEqual(self.cog.degrees_unit(self.ctx), TempUnit.C)
+
+    def test_parse_and_format(self):
+        """Test reading and writing the setting, ignoring broken parts."""
+        unit_roles = parse_unit_roles("1:C, 2:f,x:C,3:Q,4")
+        self.assertEqual(unit_roles, [(1, TempUnit.C), (2, TempUnit.F)])
+        self.assertEqual(format_unit_roles(unit_roles), "1:C,2:F")
+
+
+class ThrottleUnitTest(unittest.TestCase):
+    """Test throttling of automatic replies."""
+
+    def setUp(self):
+        """Set up the cog with a budget of one reply per minute."""
+        self.bot = helpers.MockMrFreeze()
+        self.bot.read_server_setting.return_value = "1/60"
+        self.cog = TemperatureConverter(self.bot)
+        self.ctx = helpers.MockContext()
+        self.ctx.author.mention = "@user"
+
+    def convert(self, content):
+        """Get the conversions of content which make it through."""
+        self.ctx.message.content = content
+        return self.cog.throttle(self.ctx, self.cog.parse_request(self.ctx))
+
+    def test_repeats_are_dropped(self):
+        """Test that repeats are dropped, unless asked for."""
+        self.assertEqual(len(self.convert("it's 20c")), 1)
+        self.assertEqual(self.convert("still 20c"), list())
+        self.assertEqual(len(self.convert("20c in k")), 1)
+        self.assertEqual(len(self.convert("20c in k")), 1)
+
+    def test_over_budget_is_summarized(self):
+        """Test that replies over budget end up in a summary."""
+        self.assertEqual(len(self.convert("it's 20c")), 1)
+        self.assertEqual(self.convert("it's 25c"), list())
+        self.assertEqual(self.convert("it's 30c"), list())
+        self.bot.loop.create_task.assert_called_once()
+
+        with patch.object(temp_converter, "SUMMARY_DELAY", 0):
+            asyncio.run(self.cog.summarize(self.ctx.channel))
+        self.ctx.channel.send.assert_called_once_with(
+            "While I was catching my breath:\n" +
+            "25.0°C is around 77.0°F\n30.0°C is around 86.0°F")
+
+
+class EditUnitTest(unittest.TestCase):
+    """Test converting temperatures in edited messages."""
+
+    def setUp(self):
+        """Set up the cog and a message with a temperature."""
+        self.bot = helpers.MockMrFreeze()
+        self.bot.read_server_setting.return_value = False
+        self.cog = TemperatureConverter(self.bot)
+        self.ctx = helpers.MockContext()
+        self.ctx.author.mention = "@user"
+        self.ctx.message.content = "it's 20c"
+
+    def edit(self, content):
+        """Edit the message to content."""
+        before = self.ctx.message.content
+        self.ctx.message.content = content
+        asyncio.run(self.cog.temperatures(self.ctx, before))
+
+    def test_reply_is_edited(self):
+        """Test that new statements are added to the earlier reply."""
+        asyncio.run(self.cog.temperatures(self.ctx))
+        self.ctx.channel.send.assert_called_once_with(
+            "20.0°C is around 68.0°F")
+        reply = self.ctx.channel.send.return_value
+
+        self.edit("it's 20c today")
+        reply.edit.assert_not_called()
+
+        self.edit("it's 20c but was 10c")
+        reply.edit.assert_called_once_with(
+            content="20.0°C is around 68.0°F\n10.0°C is around 50.0°F")
+        self.ctx.channel.send.assert_called_once()
+
+    def test_edit_without_earlier_reply(self):
+        """Test that only new statements are converted without a reply."""
+        self.ctx.message.content = "it's 20cc"
+        self.edit("it's 20c")
+        self.ctx.channel.send.assert_called_once_with(
+            "20.0°C is around 68.0°F")
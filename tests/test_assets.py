@@ -0,0 +1,108 @@
+"""Unittests for the upload-once cache of static images."""
+
+import asyncio
+import os
+import tempfile
+import time
+import unittest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+from mrfreeze import assets
+from mrfreeze.bot import MrFreeze
+
+
+def channel(guild_id, url, message_id=100):
+    """Create a channel in a server, answering uploads with url."""
+    attachment = SimpleNamespace(filename="dog.gif", url=url)
+    message = SimpleNamespace(id=message_id, attachments=[attachment])
+    return SimpleNamespace(
+        id=1, guild=SimpleNamespace(id=guild_id),
+        send=AsyncMock(return_value=message))
+
+
+class AssetCacheUnitTest(unittest.TestCase):
+    """Test reading, uploading and reusing images."""
+
+    def setUp(self):
+        """Create a directory with an image in it."""
+        self.directory = tempfile.TemporaryDirectory()
+        with open(os.path.join(self.directory.name, "dog.gif"), "wb") as f:
+            f.write(b"GIF89a")
+        self.assets = assets.AssetCache(self.directory.name)
+
+    def tearDown(self):
+        """Remove the image."""
+        self.directory.cleanup()
+
+    def send(self, destination):
+        """Send the image to destination, return the kwargs of the send."""
+        asyncio.run(self.assets.send(destination, "hot!", name="dog.gif"))
+        _, kwargs = destination.send.call_args
+        return kwargs
+
+    def test_upload_once_per_server(self):
+        """Test that the second send in a server reuses the URL."""
+        url = "https://cdn.discordapp.com/attachments/1/2/dog.gif"
+        first = channel(10, url)
+        kwargs = self.send(first)
+        self.assertEqual(kwargs["file"].filename, "dog.gif")
+        self.assertEqual(kwargs["embed"].image.url, "attachment://dog.gif")
+
+        kwargs = self.send(first)
+        self.assertNotIn("file", kwargs)
+        self.assertEqual(kwargs["embed"].image.url, url)
+
+        # Another server gets its own upload, but the file isn't read again.
+        os.remove(os.path.join(self.directory.name, "dog.gif"))
+        kwargs = self.send(channel(20, url))
+        self.assertEqual(kwargs["file"].fp.read(), b"GIF89a")
+
+    def test_expired_url_is_uploaded_again(self):
+        """Test that URLs about to expire aren't used."""
+        soon = f"{int(time.time()) + 60:x}"
+        later = f"{int(time.time()) + 86400:x}"
+        self.assertIsNone(assets.expires("https://cdn/dog.gif"))
+        self.assertEqual(assets.expires(f"https://cdn/dog.gif?ex={soon}&is=1"),
+                         int(soon, 16))
+
+        expiring = channel(10, f"https://cdn/dog.gif?ex={soon}")
+        self.send(expiring)
+        self.assertIn("file", self.send(expiring))
+
+        lasting = channel(20, f"https://cdn/dog.gif?ex={later}")
+        self.send(lasting)
+        self.assertNotIn("file", self.send(lasting))
+
+    def test_deleted_upload_is_uploaded_again(self):
+        """Test that URLs of deleted messages aren't used."""
+        url = "https://cdn.discordapp.com/attachments/1/2/dog.gif"
+        first = channel(10, url, message_id=100)
+        second = channel(20, url, message_id=200)
+        self.send(first)
+        self.send(second)
+
+        self.assets.forget([100, 300])
+        self.assertIn("file", self.send(first))
+        self.assertNotIn("file", self.send(second))
+
+        # Bulk deletes forget every upload among them.
+        self.assets.forget({100, 200})
+        self.assertIn("file", self.send(first))
+        self.assertIn("file", self.send(second))
+
+    def test_bot_forgets_deleted_messages(self):
+        """Test that the bot passes deleted messages on to the cache."""
+        url = "https://cdn.discordapp.com/attachments/1/2/dog.gif"
+        first = channel(10, url, message_id=100)
+        second = channel(20, url, message_id=200)
+        self.send(first)
+        self.send(second)
+
+        bot = SimpleNamespace(assets=self.assets)
+        asyncio.run(MrFreeze.on_raw_message_delete(
+            bot, SimpleNamespace(message_id=100)))
+        self.assertIn("file", self.send(first))
+        asyncio.run(MrFreeze.on_raw_bulk_message_delete(
+            bot, SimpleNamespace(message_ids={100, 200})))
+        self.assertIn("file", self.send(second))
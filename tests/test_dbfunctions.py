@@ -0,0 +1,74 @@
+"""Unittests for the database helpers."""
+
+import sqlite3
+import tempfile
+import unittest
+
+from mrfreeze import dbfunctions
+from mrfreeze.dbfunctions import ConnectionManager
+
+
+class ConnectionManagerUnitTest(unittest.TestCase):
+    """Test keeping one connection per database."""
+
+    def setUp(self):
+        """Create a manager in a temporary directory."""
+        self.directory = tempfile.TemporaryDirectory()
+        self.databases = ConnectionManager(self.directory.name)
+        with self.databases.transaction("test") as conn:
+            conn.execute("CREATE TABLE things(id integer PRIMARY KEY)")
+
+    def tearDown(self):
+        """Close the connections and remove the directory."""
+        self.databases.close()
+        self.directory.cleanup()
+
+    def count(self):
+        """Count the rows of the test table."""
+        conn = self.databases.connect("test")
+        return conn.execute("SELECT COUNT(*) FROM things").fetchone()[0]
+
+    def test_connections_are_reused(self):
+        """Test that a database is only opened once, in WAL mode."""
+        conn = self.databases.connect("test")
+        self.assertIs(self.databases.connect("test"), conn)
+        self.assertEqual(
+            conn.execute("PRAGMA journal_mode").fetchone()[0], "wal")
+
+        self.databases.close("test")
+        self.assertIsNot(self.databases.connect("test"), conn)
+        with self.assertRaises(sqlite3.ProgrammingError):
+            conn.execute("SELECT 1")
+
+    def test_transaction(self):
+        """Test that a transaction is committed or rolled back as a whole."""
+        with self.databases.transaction("test") as conn:
+            conn.execute("INSERT INTO things VALUES(1)")
+            conn.execute("INSERT INTO things VALUES(2)")
+        self.assertEqual(self.count(), 2)
+
+        with self.assertRaises(sqlite3.IntegrityError):
+            with self.databases.transaction("test") as conn:
+                conn.execute("INSERT INTO things VALUES(3)")
+                conn.execute("INSERT INTO things VALUES(1)")
+        self.assertEqual(self.count(), 2)
+        self.assertFalse(self.databases.connect("test").in_transaction)
+
+    def test_nested_transaction(self):
+        """Test that an inner transaction only rolls back itself."""
+        with self.databases.transaction("test") as conn:
+            conn.execute("INSERT INTO things VALUES(1)")
+            with self.assertRaises(sqlite3.IntegrityError):
+                with self.databases.transaction("test") as inner:
+                    inner.execute("INSERT INTO things VALUES(2)")
+                    inner.execute("INSERT INTO things VALUES(1)")
+        self.assertEqual(self.count(), 1)
+
+    def test_bot_functions(self):
+        """Test the functions the bot exposes."""
+        bot = type("Bot", (), {"databases": self.databases})()
+        with dbfunctions.db_transaction(bot, "test") as conn:
+            conn.execute("INSERT INTO things VALUES(1)")
+        self.assertIs(dbfunctions.db_connect(bot, "test"),
+                      self.databases.connect("test"))
+        self.assertEqual(self.count(), 1)
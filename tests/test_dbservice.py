@@ -0,0 +1,78 @@
+"""Unittests for the database service."""
+
+import asyncio
+import sqlite3
+import tempfile
+import threading
+import unittest
+
+from mrfreeze.dbfunctions import ConnectionManager
+from mrfreeze.dbservice import DatabaseServices
+
+
+class DatabaseServiceUnitTest(unittest.TestCase):
+    """Test running queries on the worker of a database."""
+
+    def setUp(self):
+        """Create a database with an empty table."""
+        self.directory = tempfile.TemporaryDirectory()
+        self.databases = ConnectionManager(self.directory.name)
+        self.services = DatabaseServices(self.databases, maxsize=1)
+        with self.databases.transaction("test") as conn:
+            conn.execute("CREATE TABLE things(id integer PRIMARY KEY)")
+
+    def tearDown(self):
+        """Stop the workers and remove the directory."""
+        self.services.close()
+        self.databases.close()
+        self.directory.cleanup()
+
+    def test_queries(self):
+        """Test executing statements and querying rows."""
+        async def queries():
+            service = self.services["test"]
+            self.assertIs(self.services["test"], service)
+            await service.executemany(
+                "INSERT INTO things VALUES(?)", [(1,), (2,), (3,)])
+            self.assertEqual(
+                await service.execute("DELETE FROM things WHERE id > ?", (1,)),
+                2)
+            return await service.query("SELECT id FROM things")
+
+        self.assertEqual(asyncio.run(queries()), [(1,)])
+
+    def test_failed_transaction(self):
+        """Test that errors reach the caller and roll back the transaction."""
+        def insert_twice(conn):
+            conn.execute("INSERT INTO things VALUES(1)")
+            conn.execute("INSERT INTO things VALUES(1)")
+
+        async def failed_transaction():
+            service = self.services["test"]
+            with self.assertRaises(sqlite3.IntegrityError):
+                await service.transaction(insert_twice)
+            return await service.query("SELECT id FROM things")
+
+        self.assertEqual(asyncio.run(failed_transaction()), list())
+
+    def test_backpressure(self):
+        """Test that jobs beyond maxsize wait before reaching the worker."""
+        release = threading.Event()
+
+        def blocked(conn):
+            release.wait(5)
+            return "blocked"
+
+        async def backpressure():
+            service = self.services["test"]
+            first = asyncio.ensure_future(service.call(blocked))
+            second = asyncio.ensure_future(service.query("SELECT 1"))
+            await asyncio.sleep(0.05)
+            # Only the first job has been handed to the worker.
+            self.assertEqual(service.queued, 1)
+            self.assertFalse(second.done())
+
+            release.set()
+            return await asyncio.gather(first, second)
+
+        self.assertEqual(asyncio.run(backpressure()), ["blocked", [(1,)]])
@@ -0,0 +1,234 @@
+"""Unittests for the message pipeline."""
+
+import asyncio
+import random
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+
+from mrfreeze import pipeline
+from mrfreeze.cogs import temp_converter
+
+
+class PipelineUnitTest(unittest.TestCase):
+    """Test the message pipeline."""
+
+    def setUp(self):
+        """Set up a pipeline and a view to dispatch."""
+        self.pipeline = pipeline.MessagePipeline()
+        self.message = MagicMock()
+        self.message.content = "content"
+        self.ctx = MagicMock()
+        self.view = self.pipeline.build_view(self.message, self.ctx)
+
+    def test_build_view_shares_context_and_content(self):
+        """Test that the view carries the message's context and content."""
+        self.assertIs(self.view.ctx, self.ctx)
+        self.assertEqual(self.view.content, "content")
+        self.assertIs(self.view.author, self.message.author)
+
+    def test_view_is_immutable(self):
+        """Test that stages can't reassign fields of the view."""
+        with self.assertRaises(AttributeError):
+            self.view.content = "something else"
+
+    def test_dispatch_runs_every_stage_with_same_view(self):
+        """Test that all stages receive the very same view object."""
+        seen = list()
+
+        async def stage(view):
+            seen.append(view)
+
+        self.pipeline.add_stage("first", stage)
+        self.pipeline.add_stage("second", stage)
+        asyncio.run(self.pipeline.dispatch(self.view))
+
+        self.assertEqual(len(seen), 2)
+        self.assertIs(seen[0], self.view)
+        self.assertIs(seen[1], self.view)
+
+    def test_dispatch_records_timings(self):
+        """Test that every run of a stage is timed."""
+        async def stage(view):
+            pass
+
+        self.pipeline.add_stage("stage", stage)
+        asyncio.run(self.pipeline.dispatch(self.view))
+        asyncio.run(self.pipeline.dispatch(self.view))
+
+        self.assertEqual(self.pipeline.timings["stage"].calls, 2)
+        self.assertGreaterEqual(self.pipeline.timings["stage"].worst, 0)
+
+    def test_timings_exclude_awaits(self):
+        """Test that only time spent on the event loop is counted."""
+        async def sleeping(view):
+            await asyncio.sleep(0.1)
+
+        async def busy(view):
+            await asyncio.sleep(0)
+            start = time.perf_counter()
+            while time.perf_counter() - start < 0.05:
+                pass
+
+        self.pipeline.add_stage("sleeping", sleeping)
+        self.pipeline.add_stage("busy", busy)
+        asyncio.run(self.pipeline.dispatch(self.view))
+
+        self.assertLess(self.pipeline.timings["sleeping"].total, 0.02)
+        self.assertGreaterEqual(self.pipeline.timings["busy"].total, 0.05)
+        self.assertLess(self.pipeline.timings["busy"].total, 0.09)
+
+    def test_timed_stage_can_be_cancelled(self):
+        """Test that cancelling a timed stage cancels what it awaits."""
+        cancelled = list()
+
+        async def stage(view):
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.append(view)
+                raise
+
+        async def cancel():
+            task = asyncio.ensure_future(
+                self.pipeline.run_stage("stage", stage, self.view))
+            await asyncio.sleep(0)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+
+        asyncio.run(cancel())
+        self.assertEqual(cancelled, [self.view])
+        self.assertEqual(self.pipeline.timings["stage"].calls, 1)
+
+    def test_failing_stage_does_not_stop_others(self):
+        """Test that an exception in one stage doesn't affect the others."""
+        seen = list()
+
+        async def broken(view):
+            raise ValueError("broken")
+
+        async def working(view):
+            seen.append(view)
+
+        self.pipeline.add_stage("broken", broken)
+        self.pipeline.add_stage("working", working)
+        with patch("traceback.print_exc"):
+            asyncio.run(self.pipeline.dispatch(self.view))
+
+        self.assertEqual(seen, [self.view])
+        self.assertEqual(self.pipeline.timings["broken"].calls, 1)
+
+    def test_removed_stage_is_not_run(self):
+        """Test that removing a stage stops it from being dispatched."""
+        seen = list()
+
+        async def stage(view):
+            seen.append(view)
+
+        self.pipeline.add_stage("stage", stage)
+        self.pipeline.remove_stage("stage")
+        asyncio.run(self.pipeline.dispatch(self.view))
+
+        self.assertEqual(seen, [])
+
+    def test_stage_is_skipped_without_its_feature(self):
+        """Test that gated stages only run for matching messages."""
+        seen = list()
+
+        async def stage(view):
+            seen.append(view)
+
+        self.pipeline.add_stage("ink", stage, pipeline.Feature.INK)
+        asyncio.run(self.pipeline.dispatch(self.view))
+        inky = self.view._replace(features=pipeline.Feature.INK)
+        asyncio.run(self.pipeline.dispatch(inky))
+
+        self.assertEqual(seen, [inky])
+        self.assertEqual(self.pipeline.timings["ink"].calls, 1)
+        self.assertEqual(self.pipeline.timings["ink"].skipped, 1)
+
+
+class RecentRepliesUnitTest(unittest.TestCase):
+    """Test the cache of recent message fingerprints."""
+
+    def test_edited_view(self):
+        """Test that only views with the old content count as edited."""
+        message = MagicMock()
+        self.assertFalse(pipeline.MessagePipeline.build_view(
+            message, MagicMock()).edited)
+        self.assertTrue(pipeline.MessagePipeline.build_view(
+            message, MagicMock(), before="old").edited)
+
+    def test_oldest_message_is_forgotten(self):
+        """Test that the cache stays within its size."""
+        replies = pipeline.RecentReplies(maxsize=2)
+        replies.put(1, frozenset({"a"}))
+        replies.put(2, frozenset({"b"}), reply="reply")
+        replies.put(1, frozenset({"a", "c"}))
+        replies.put(3, frozenset())
+
+        self.assertEqual(len(replies), 2)
+        self.assertIsNone(replies.get(2))
+        self.assertEqual(replies.get(1),
+                         pipeline.Fingerprint(frozenset({"a", "c"}), None))
+
+
+class ClassifyUnitTest(unittest.TestCase):
+    """Test the message pre-classification."""
+
+    def test_plain_message_has_no_features(self):
+        """Test that ordinary chatter isn't tagged with anything."""
+        features = pipeline.classify("hello there, how are you?", ("!",), 1)
+        self.assertEqual(features, pipeline.Feature.NONE)
+
+    def test_temperature_statements(self):
+        """Test that digits followed by units are tagged as temperatures."""
+        for text in ("it's 20C", "20 °F outside", "300 K", "5 degrees"):
+            features = pipeline.classify(text, ("!",), 1)
+            self.assertIn(pipeline.Feature.TEMPERATURE, features, msg=text)
+
+    def test_every_scanned_temperature_is_tagged(self):
+        """Test that nothing the temperature scanner finds is ruled out."""
+        rng = random.Random(1)
+        pieces = ["20", "-5", "3,5", " ", "  ", "°", "c", "f", "k", "r",
+                  "deg", "kelvin", " in ", "x"]
+        for _ in range(5000):
+            text = "".join(rng.choice(pieces) for _ in range(6))
+            if temp_converter.scan_temperatures(text):
+                features = pipeline.classify(text, ("!",), 1)
+                self.assertIn(pipeline.Feature.TEMPERATURE, features,
+                              msg=repr(text))
+        self.assertIn(pipeline.Feature.TEMPERATURE,
+                      pipeline.classify("it's 20  k", ("!",), 1))
+
+    def test_number_without_unit_is_not_temperature(self):
+        """Test that a number on its own isn't tagged as a temperature."""
+        features = pipeline.classify("I have 20 pens", ("!",), 1)
+        self.assertNotIn(pipeline.Feature.TEMPERATURE, features)
+
+    def test_ink_lookup(self):
+        """Test that bracketed terms are tagged as ink lookups."""
+        features = pipeline.classify("look {diamine oxblood}", ("!",), 1)
+        self.assertIn(pipeline.Feature.INK, features)
+
+        features = pipeline.classify("just a { brace", ("!",), 1)
+        self.assertNotIn(pipeline.Feature.INK, features)
+
+    def test_command_prefix(self):
+        """Test that messages starting with a prefix are tagged as commands."""
+        features = pipeline.classify("!temp", ("!",), 1)
+        self.assertEqual(features, pipeline.Feature.COMMAND)
+
+    def test_unknown_prefix_is_always_possible_command(self):
+        """Test that all messages are possible commands if prefix is unknown."""
+        features = pipeline.classify("hello", None, 1)
+        self.assertIn(pipeline.Feature.COMMAND, features)
+
+    def test_bot_mention(self):
+        """Test that only mentions of the bot itself are tagged."""
+        features = pipeline.classify("hi <@!1234>", ("!",), 1234)
+        self.assertIn(pipeline.Feature.MENTION, features)
+
+        features = pipeline.classify("hi <@5678>", ("!",), 1234)
+        self.assertNotIn(pipeline.Feature.MENTION, features)
@@ -0,0 +1,40 @@
+"""Unittests for the throttling building blocks."""
+
+import unittest
+
+from mrfreeze.throttle import Budget, RecentSet, TokenBucket
+
+
+class ThrottleUnitTest(unittest.TestCase):
+    """Test budgets, token buckets and sliding windows."""
+
+    def test_budget_parse(self):
+        """Test parsing budgets, including broken ones."""
+        self.assertEqual(Budget.parse(" 3/60 "), Budget(3, 60.0))
+        self.assertEqual(str(Budget(3, 60.0)), "3/60")
+        for broken in ["", "3", "a/60", "0/60", "3/0", "3/-1"]:
+            self.assertIsNone(Budget.parse(broken), msg=broken)
+
+    def test_token_bucket(self):
+        """Test that a bucket allows a burst, then refills steadily."""
+        bucket = TokenBucket(Budget(2, 60), now=0)
+        self.assertEqual([bucket.take(now=0) for _ in range(3)],
+                         [True, True, False])
+        self.assertFalse(bucket.take(now=29))
+        self.assertTrue(bucket.take(now=30))
+        self.assertFalse(bucket.take(now=30))
+
+        # Never more than a full bucket, however long it's been.
+        self.assertEqual([bucket.take(now=1000) for _ in range(3)],
+                         [True, True, False])
+
+    def test_recent_set(self):
+        """Test that repeats within the window are caught."""
+        recent = RecentSet(window=10)
+        self.assertFalse(recent.check("20c", now=0))
+        self.assertTrue(recent.check("20c", now=5))
+        self.assertFalse(recent.check("30c", now=5))
+        self.assertFalse(recent.check("20c", now=10))
+
+        recent.expire(now=19)
+        self.assertEqual(list(recent.seen), ["20c"])
@@ -472,3 +472,72 @@ class TimeUnitTest(unittest.TestCase):
 
     #     self.assertTrue(isinstance(first, datetime.timedelta))
     #     self.assertEqual(second, should_be)
+
+
+class DurationUnitTest(unittest.TestCase):
+    """Test the Duration type and its parser."""
+
+    def test_compound_and_fractional_durations(self):
+        """Test "1h30m" and "1.5h" style durations."""
+        self.assertEqual(time.parse_duration(("1h30m",)),
+                         time.Duration(minutes=30, hours=1))
+        self.assertEqual(time.parse_duration(("1.5h",)).timedelta,
+                         datetime.timedelta(minutes=90))
+        self.assertEqual(time.parse_duration(("2", "days", "3d")).days, 5)
+
+    def test_units_end_at_word_boundary(self):
+        """Test that a single letter unit can't be the start of a word."""
+        self.assertEqual(time.parse_duration(("1", "mon"), False),
+                         time.Duration(months=1))
+        self.assertTrue(time.parse_duration(("5", "mangoes"), False).empty)
+
+    def test_numbers_start_with_their_digits(self):
+        """Test that long numbers and mentions are read whole."""
+        self.assertEqual(time.parse_duration(("123456789m", "1.25.5h")),
+                         time.Duration(minutes=123456789, hours=25.5))
+        self.assertTrue(
+            time.parse_duration(("<@123456789012345678>",), False).empty)
+        self.assertTrue(time.parse_duration(("9" * 5000,), False).empty)
+
+    def test_parses_are_memoized(self):
+        """Test that parsing the same arguments again hits the cache."""
+        time.parse_args.cache_clear()
+        first = time.parse_duration(["2", "weeks"])
+        second = time.parse_duration(("2", "weeks"))
+        self.assertIs(first, second)
+        self.assertEqual(time.parse_args.cache_info().hits, 1)
+
+    def test_add_and_span(self):
+        """Test adding to a duration and getting its end."""
+        start = datetime.datetime(2020, 1, 1)
+        duration = time.Duration().add(weeks=1)
+        self.assertEqual(duration.span(start),
+                         (datetime.timedelta(weeks=1),
+                          datetime.datetime(2020, 1, 8)))
+        self.assertEqual(time.Duration().span(start), (None, None))
+
+
+class ParseTimedeltasUnitTest(unittest.TestCase):
+    """Test humanizing many timedeltas at once."""
+
+    def test_batch(self):
+        """Test that the batch matches parse_timedelta one by one."""
+        deltas = [
+            datetime.timedelta(days=400, hours=1, seconds=1),
+            None,
+            datetime.timedelta(),
+            datetime.timedelta(weeks=2, minutes=2),
+        ]
+        self.assertEqual(time.parse_timedeltas(deltas), [
+            "1 year, 1 month, 5 days, 1 hour and 1 second",
+            "an eternity",
+            "",
+            "2 weeks and 2 minutes",
+        ])
+        self.assertEqual(time.parse_timedeltas(deltas),
+                         [time.parse_timedelta(delta) for delta in deltas])
+
+    def test_decompose(self):
+        """Test splitting a timedelta into units."""
+        self.assertEqual(time.decompose(372, 3661, 600000),
+                         (1, 0, 1, 0, 1, 1, 2))